@@ -0,0 +1,34 @@
+"""widen the connection/status history index for retention
+
+Revision ID: 0b9d4e2f7a61
+Revises: f3a7d1c9b842
+Create Date: 2026-10-17 17:31:12.540118
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0b9d4e2f7a61'
+down_revision: Union[str, None] = 'f3a7d1c9b842'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Same leading columns plus the retention window's ORDER BY, so it
+    # replaces the narrower index for the history filters as well
+    op.create_index(
+        'idx_backup_history_user_connection_status_created', 'backup_history',
+        ['user_id', 'connection_id', 'status', sa.literal_column('created_at DESC'), sa.literal_column('id DESC')],
+        unique=False
+    )
+    op.drop_index('idx_backup_history_user_connection_status', table_name='backup_history')
+
+def downgrade() -> None:
+    op.create_index(
+        'idx_backup_history_user_connection_status', 'backup_history',
+        ['user_id', 'connection_id', 'status'],
+        unique=False
+    )
+    op.drop_index('idx_backup_history_user_connection_status_created', table_name='backup_history')
@@ -0,0 +1,22 @@
+"""add phase timings to backup history
+
+Revision ID: 2e8f6b0c4a17
+Revises: 7c3e5a1f9d20
+Create Date: 2026-10-17 19:12:08.664310
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '2e8f6b0c4a17'
+down_revision: Union[str, None] = '7c3e5a1f9d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('backup_history', sa.Column('phase_timings', sa.JSON(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('backup_history', 'phase_timings')
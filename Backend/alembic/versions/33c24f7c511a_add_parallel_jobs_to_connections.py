@@ -0,0 +1,22 @@
+"""add parallel_jobs to connections
+
+Revision ID: 33c24f7c511a
+Revises: 543dc236aa2c
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '33c24f7c511a'
+down_revision: Union[str, None] = '543dc236aa2c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('database_connections', sa.Column('parallel_jobs', sa.Integer(), nullable=False, server_default='1'))
+
+def downgrade() -> None:
+    op.drop_column('database_connections', 'parallel_jobs')
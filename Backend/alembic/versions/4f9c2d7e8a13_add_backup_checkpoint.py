@@ -0,0 +1,22 @@
+"""add backup checkpoint
+
+Revision ID: 4f9c2d7e8a13
+Revises: d8f1b6a3c920
+Create Date: 2026-10-17 20:58:12.341776
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '4f9c2d7e8a13'
+down_revision: Union[str, None] = 'd8f1b6a3c920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('backup_history', sa.Column('checkpoint', sa.JSON(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('backup_history', 'checkpoint')
@@ -0,0 +1,22 @@
+"""add secondary checksum to history
+
+Revision ID: 5d0a8c3e9f14
+Revises: c81f3a9d5e27
+Create Date: 2026-10-17 11:58:33.916402
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0a8c3e9f14'
+down_revision: Union[str, None] = 'c81f3a9d5e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('backup_history', sa.Column('secondary_checksum', sa.Text(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('backup_history', 'secondary_checksum')
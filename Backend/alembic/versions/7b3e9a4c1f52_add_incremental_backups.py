@@ -0,0 +1,43 @@
+"""add incremental backups
+
+Revision ID: 7b3e9a4c1f52
+Revises: 4f9c2d7e8a13
+Create Date: 2026-10-17 21:34:09.118452
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3e9a4c1f52'
+down_revision: Union[str, None] = '4f9c2d7e8a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # ADD VALUE can't run inside a transaction block before PostgreSQL 12
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE backuptype ADD VALUE IF NOT EXISTS 'incremental'")
+
+    op.add_column('backup_history', sa.Column('parent_backup_id', sa.UUID(), nullable=True))
+    op.add_column('backup_history', sa.Column('base_backup_id', sa.UUID(), nullable=True))
+    op.add_column('backup_history', sa.Column('chain_manifest', sa.JSON(), nullable=True))
+    op.create_foreign_key(
+        'backup_history_parent_backup_id_fkey', 'backup_history', 'backup_history',
+        ['parent_backup_id'], ['id'], ondelete='SET NULL'
+    )
+    op.create_foreign_key(
+        'backup_history_base_backup_id_fkey', 'backup_history', 'backup_history',
+        ['base_backup_id'], ['id'], ondelete='SET NULL'
+    )
+    op.create_index('idx_backup_history_parent', 'backup_history', ['parent_backup_id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('idx_backup_history_parent', table_name='backup_history')
+    op.drop_constraint('backup_history_base_backup_id_fkey', 'backup_history', type_='foreignkey')
+    op.drop_constraint('backup_history_parent_backup_id_fkey', 'backup_history', type_='foreignkey')
+    op.drop_column('backup_history', 'chain_manifest')
+    op.drop_column('backup_history', 'base_backup_id')
+    op.drop_column('backup_history', 'parent_backup_id')
+    # PostgreSQL can't drop a value from an enum type; 'incremental' stays in backuptype
@@ -0,0 +1,32 @@
+"""add backup progress columns
+
+Revision ID: 7c3e5a1f9d20
+Revises: 0b9d4e2f7a61
+Create Date: 2026-10-17 18:05:41.227603
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e5a1f9d20'
+down_revision: Union[str, None] = '0b9d4e2f7a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('backup_history', sa.Column('progress_table', sa.Text(), nullable=True))
+    op.add_column('backup_history', sa.Column('progress_rows', sa.BigInteger(), nullable=True))
+    op.add_column('backup_history', sa.Column('progress_bytes', sa.BigInteger(), nullable=True))
+    op.add_column('backup_history', sa.Column('progress_percent', sa.Float(), nullable=True))
+    op.add_column('backup_history', sa.Column('progress_eta_seconds', sa.Integer(), nullable=True))
+    op.add_column('backup_history', sa.Column('progress_updated_at', sa.DateTime(timezone=True), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('backup_history', 'progress_updated_at')
+    op.drop_column('backup_history', 'progress_eta_seconds')
+    op.drop_column('backup_history', 'progress_percent')
+    op.drop_column('backup_history', 'progress_bytes')
+    op.drop_column('backup_history', 'progress_rows')
+    op.drop_column('backup_history', 'progress_table')
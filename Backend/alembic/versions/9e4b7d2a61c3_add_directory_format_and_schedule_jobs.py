@@ -0,0 +1,27 @@
+"""add directory backup format and schedule parallel_jobs
+
+Revision ID: 9e4b7d2a61c3
+Revises: 33c24f7c511a
+Create Date: 2026-10-17 10:04:51.730916
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b7d2a61c3'
+down_revision: Union[str, None] = '33c24f7c511a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # ALTER TYPE ... ADD VALUE cannot run inside a transaction block on older Postgres
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE backupformat ADD VALUE IF NOT EXISTS 'directory'")
+
+    op.add_column('backup_schedules', sa.Column('parallel_jobs', sa.Integer(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('backup_schedules', 'parallel_jobs')
+    # Postgres cannot drop a single enum value; 'directory' is left in place.
@@ -0,0 +1,37 @@
+"""add backup table stats
+
+Revision ID: a5d2c7e1b398
+Revises: 2e8f6b0c4a17
+Create Date: 2026-10-17 19:48:27.115902
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d2c7e1b398'
+down_revision: Union[str, None] = '2e8f6b0c4a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table('backup_table_stats',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('backup_id', sa.UUID(), nullable=False),
+    sa.Column('table_name', sa.Text(), nullable=False),
+    sa.Column('row_count', sa.BigInteger(), nullable=True),
+    sa.Column('bytes', sa.BigInteger(), nullable=True),
+    sa.Column('duration_seconds', sa.Float(), nullable=True),
+    sa.Column('checksum', sa.Text(), nullable=True),
+    sa.Column('is_estimate', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['backup_id'], ['backup_history.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_backup_table_stats_backup', 'backup_table_stats', ['backup_id'], unique=False)
+    op.create_index('idx_backup_table_stats_table_backup', 'backup_table_stats', ['table_name', 'backup_id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('idx_backup_table_stats_table_backup', table_name='backup_table_stats')
+    op.drop_index('idx_backup_table_stats_backup', table_name='backup_table_stats')
+    op.drop_table('backup_table_stats')
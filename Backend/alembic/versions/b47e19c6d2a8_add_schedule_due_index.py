@@ -0,0 +1,25 @@
+"""add partial index for due schedules
+
+Revision ID: b47e19c6d2a8
+Revises: 5d0a8c3e9f14
+Create Date: 2026-10-17 13:40:12.602918
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b47e19c6d2a8'
+down_revision: Union[str, None] = '5d0a8c3e9f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_backup_schedules_due', 'backup_schedules', ['next_run_at'],
+        postgresql_where=sa.text('is_active IS true')
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_backup_schedules_due', table_name='backup_schedules')
@@ -0,0 +1,51 @@
+"""add backup chunk store
+
+Revision ID: c2e8d4f6a9b1
+Revises: 7b3e9a4c1f52
+Create Date: 2026-10-17 22:41:53.604187
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e8d4f6a9b1'
+down_revision: Union[str, None] = '7b3e9a4c1f52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table('backup_chunks',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('storage_id', sa.UUID(), nullable=True),
+    sa.Column('digest', sa.Text(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('location', sa.Text(), nullable=False),
+    sa.Column('deleting', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('last_used_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['storage_id'], ['storage_configurations.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_backup_chunks_storage_digest', 'backup_chunks', ['storage_id', 'digest'], unique=False)
+    op.create_index('idx_backup_chunks_last_used', 'backup_chunks', ['last_used_at'], unique=False)
+    op.create_table('backup_chunk_refs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('backup_id', sa.UUID(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('chunk_id', sa.UUID(), nullable=False),
+    sa.ForeignKeyConstraint(['backup_id'], ['backup_history.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['chunk_id'], ['backup_chunks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_backup_chunk_refs_backup_seq', 'backup_chunk_refs', ['backup_id', 'seq'], unique=False)
+    op.create_index('idx_backup_chunk_refs_chunk', 'backup_chunk_refs', ['chunk_id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('idx_backup_chunk_refs_chunk', table_name='backup_chunk_refs')
+    op.drop_index('idx_backup_chunk_refs_backup_seq', table_name='backup_chunk_refs')
+    op.drop_table('backup_chunk_refs')
+    op.drop_index('idx_backup_chunks_last_used', table_name='backup_chunks')
+    op.drop_index('idx_backup_chunks_storage_digest', table_name='backup_chunks')
+    op.drop_table('backup_chunks')
@@ -0,0 +1,32 @@
+"""add compression codec columns
+
+Revision ID: c81f3a9d5e27
+Revises: 9e4b7d2a61c3
+Create Date: 2026-10-17 11:20:07.402518
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f3a9d5e27'
+down_revision: Union[str, None] = '9e4b7d2a61c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('backup_schedules', sa.Column('compression_codec', sa.Text(), nullable=True, server_default='gzip'))
+    op.add_column('backup_schedules', sa.Column('compression_level', sa.Integer(), nullable=True))
+
+    op.add_column('backup_history', sa.Column('compression_codec', sa.Text(), nullable=True))
+    op.add_column('backup_history', sa.Column('compression_ratio', sa.Float(), nullable=True))
+    op.add_column('backup_history', sa.Column('uncompressed_size_bytes', sa.BigInteger(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('backup_history', 'uncompressed_size_bytes')
+    op.drop_column('backup_history', 'compression_ratio')
+    op.drop_column('backup_history', 'compression_codec')
+
+    op.drop_column('backup_schedules', 'compression_level')
+    op.drop_column('backup_schedules', 'compression_codec')
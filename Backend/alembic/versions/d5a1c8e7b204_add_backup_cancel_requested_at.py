@@ -0,0 +1,22 @@
+"""add backup cancel_requested_at
+
+Revision ID: d5a1c8e7b204
+Revises: c2e8d4f6a9b1
+Create Date: 2026-10-17 23:18:26.407915
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a1c8e7b204'
+down_revision: Union[str, None] = 'c2e8d4f6a9b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('backup_history', sa.Column('cancel_requested_at', sa.DateTime(timezone=True), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('backup_history', 'cancel_requested_at')
@@ -0,0 +1,26 @@
+"""add schedule table filters
+
+Revision ID: d8f1b6a3c920
+Revises: a5d2c7e1b398
+Create Date: 2026-10-17 20:21:44.508317
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f1b6a3c920'
+down_revision: Union[str, None] = 'a5d2c7e1b398'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('backup_schedules', sa.Column('excluded_schemas', sa.ARRAY(sa.Text()), nullable=True))
+    op.add_column('backup_schedules', sa.Column('excluded_tables', sa.ARRAY(sa.Text()), nullable=True))
+    op.add_column('backup_schedules', sa.Column('schema_only_tables', sa.ARRAY(sa.Text()), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('backup_schedules', 'schema_only_tables')
+    op.drop_column('backup_schedules', 'excluded_tables')
+    op.drop_column('backup_schedules', 'excluded_schemas')
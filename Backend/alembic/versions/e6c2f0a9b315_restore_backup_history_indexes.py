@@ -0,0 +1,34 @@
+"""restore backup_history indexes for paginated listing
+
+Revision ID: e6c2f0a9b315
+Revises: b47e19c6d2a8
+Create Date: 2026-10-17 14:22:07.381560
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6c2f0a9b315'
+down_revision: Union[str, None] = 'b47e19c6d2a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # 543dc236aa2c dropped the single-column idx_backup_history_* indexes;
+    # these composites cover the list query (keyset on created_at, id) and its filters
+    op.create_index(
+        'idx_backup_history_user_created', 'backup_history',
+        ['user_id', sa.literal_column('created_at DESC'), sa.literal_column('id DESC')],
+        unique=False
+    )
+    op.create_index(
+        'idx_backup_history_user_connection_status', 'backup_history',
+        ['user_id', 'connection_id', 'status'],
+        unique=False
+    )
+
+def downgrade() -> None:
+    op.drop_index('idx_backup_history_user_connection_status', table_name='backup_history')
+    op.drop_index('idx_backup_history_user_created', table_name='backup_history')
@@ -0,0 +1,22 @@
+"""add user tokens_valid_after
+
+Revision ID: e9b3f7a2c615
+Revises: d5a1c8e7b204
+Create Date: 2026-10-17 23:52:40.281736
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b3f7a2c615'
+down_revision: Union[str, None] = 'd5a1c8e7b204'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('tokens_valid_after', sa.DateTime(timezone=True), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('users', 'tokens_valid_after')
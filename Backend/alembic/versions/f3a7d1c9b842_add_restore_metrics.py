@@ -0,0 +1,42 @@
+"""add restore options and throughput metrics
+
+Revision ID: f3a7d1c9b842
+Revises: e6c2f0a9b315
+Create Date: 2026-10-17 16:05:41.902317
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a7d1c9b842'
+down_revision: Union[str, None] = 'e6c2f0a9b315'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('restore_history', sa.Column('clean_target', sa.Boolean(), nullable=True))
+    op.add_column('restore_history', sa.Column('parallel_jobs', sa.Integer(), nullable=True))
+    op.add_column('restore_history', sa.Column('retry_count', sa.Integer(), nullable=True))
+    op.add_column('restore_history', sa.Column('bytes_restored', sa.BigInteger(), nullable=True))
+    op.add_column('restore_history', sa.Column('rows_restored', sa.BigInteger(), nullable=True))
+    op.add_column('restore_history', sa.Column('tables_restored', sa.Integer(), nullable=True))
+    op.add_column('restore_history', sa.Column('duration_seconds', sa.Float(), nullable=True))
+    op.add_column('restore_history', sa.Column('throughput_bytes_per_sec', sa.Float(), nullable=True))
+    op.create_index(
+        'idx_restore_history_user_created', 'restore_history',
+        ['user_id', sa.literal_column('created_at DESC')],
+        unique=False
+    )
+
+def downgrade() -> None:
+    op.drop_index('idx_restore_history_user_created', table_name='restore_history')
+    op.drop_column('restore_history', 'throughput_bytes_per_sec')
+    op.drop_column('restore_history', 'duration_seconds')
+    op.drop_column('restore_history', 'tables_restored')
+    op.drop_column('restore_history', 'rows_restored')
+    op.drop_column('restore_history', 'bytes_restored')
+    op.drop_column('restore_history', 'retry_count')
+    op.drop_column('restore_history', 'parallel_jobs')
+    op.drop_column('restore_history', 'clean_target')
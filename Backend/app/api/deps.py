@@ -1,13 +1,16 @@
-from typing import Generator
+import calendar
+from typing import Generator, Optional
+from uuid import UUID
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 
+from app.core.auth_cache import Principal, principal_cache
 from app.core.config import settings
 from app.core import security
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal, SessionLocal
 from app.models.user import User
 from app.schemas.token import TokenPayload
 
@@ -23,10 +26,35 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db), 
-    token: str = Depends(reusable_oauth2)
-) -> User:
+async def _load_principal(user_id: UUID) -> Optional[Principal]:
+    # Own short session, only on a cache miss
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(select(User).where(User.id == user_id))
+        return Principal.from_user(user) if user else None
+
+async def get_principal(user_id: UUID) -> Optional[Principal]:
+    """
+    The user as a Principal, from principal_cache or (on a miss) the
+    metadata DB; None if the user doesn't exist.
+    """
+    principal = principal_cache.get(str(user_id))
+    if principal is None:
+        principal = await _load_principal(user_id)
+        if principal:
+            principal_cache.put(principal)
+    return principal
+
+def is_revoked(principal: Principal, issued_at: Optional[int]) -> bool:
+    # Tokens issued before the user's last logout-all (or without iat)
+    revoked_before = principal.tokens_valid_after
+    return revoked_before is not None and (issued_at or 0) < calendar.timegm(revoked_before.utctimetuple())
+
+async def get_current_user(token: str = Depends(reusable_oauth2)) -> Principal:
+    """
+    The caller as a Principal (id, email). Served from principal_cache,
+    so only a cache miss costs a metadata-DB query, made on the async
+    engine: neither a hit nor a miss takes a threadpool slot.
+    """
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -37,9 +65,27 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
+    if payload.get("scope"):
+        # e.g. a download token: valid only on its own endpoint
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
     
-    user = db.query(User).filter(User.id == token_data.sub).first()
-    if not user:
+    try:
+        user_id = UUID(token_data.sub)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    principal = await get_principal(user_id)
+    if not principal:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    return user
\ No newline at end of file
+
+    if is_revoked(principal, token_data.iat):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+        )
+    return principal
\ No newline at end of file
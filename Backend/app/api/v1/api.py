@@ -1,9 +1,10 @@
 from fastapi import APIRouter
-from app.api.v1 import auth, connections, schedules, history
+from app.api.v1 import auth, connections, schedules, history, restores
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(connections.router, prefix="/connections", tags=["connections"])
 api_router.include_router(schedules.router, prefix="/schedules", tags=["schedules"])
-api_router.include_router(history.router, prefix="/history", tags=["history"])
\ No newline at end of file
+api_router.include_router(history.router, prefix="/history", tags=["history"])
+api_router.include_router(restores.router, prefix="/restores", tags=["restores"])
\ No newline at end of file
@@ -1,12 +1,15 @@
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.core import security
+from app.core.auth_cache import Principal
 from app.core.config import settings
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models.user import User, Profile, UserRole
 from app.schemas import user as user_schema
 from app.schemas import token as token_schema
@@ -14,18 +17,19 @@ from app.schemas import token as token_schema
 router = APIRouter()
 
 @router.post("/signup", response_model=user_schema.User)
-def create_user(obj_in: user_schema.UserCreate, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == obj_in.email).first()
+async def create_user(obj_in: user_schema.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == obj_in.email))
     if user:
         raise HTTPException(status_code=400, detail="User already exists")
     
     # Create User
     new_user = User(
         email=obj_in.email,
-        hashed_password=security.get_password_hash(obj_in.password)
+        # bcrypt is deliberately slow: keep it off the event loop
+        hashed_password=await run_in_threadpool(security.get_password_hash, obj_in.password)
     )
     db.add(new_user)
-    db.flush() 
+    await db.flush()
 
     # Create Profile & Default Role
     profile = Profile(user_id=new_user.id, email=obj_in.email, full_name=obj_in.full_name)
@@ -33,18 +37,18 @@ def create_user(obj_in: user_schema.UserCreate, db: Session = Depends(get_db)):
     db.add(profile)
     db.add(role)
     
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @router.post("/login", response_model=token_schema.Token)
-def login(
-    db: Session = Depends(get_db), 
+async def login(
+    db: AsyncSession = Depends(get_async_db), 
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await db.scalar(select(User).where(User.email == form_data.username))
     
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    if not user or not await run_in_threadpool(security.verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
             detail="Incorrect email or password"
@@ -58,11 +62,28 @@ def login(
 
 # --- ADD THIS ROUTE TO FIX THE 404 ---
 @router.get("/me", response_model=user_schema.User)
-def get_user_me(
-    current_user: User = Depends(deps.get_current_user)
+async def get_user_me(
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Fetch the currently authenticated user's profile.
     The 'deps.get_current_user' handles the token validation.
     """
-    return current_user
\ No newline at end of file
+    return current_user
+
+@router.post("/logout-all")
+async def logout_everywhere(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Revokes every access token issued to the caller so far, this one
+    included. This process stops accepting them at once (the cached user
+    is dropped on commit), other API processes within AUTH_CACHE_TTL_SECONDS.
+    """
+    user = await db.get(User, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user.tokens_valid_after = datetime.now(timezone.utc)
+    await db.commit()
+    return {"success": True, "message": "All sessions signed out"}
\ No newline at end of file
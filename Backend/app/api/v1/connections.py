@@ -1,11 +1,13 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 import psycopg2 
 import pymssql  # <--- NEW: Lightweight SQL Server driver
 
 from app.api import deps
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models.connection import DatabaseConnection
 from app.schemas import connection as conn_schema
 from app.services import crypto_service
@@ -13,20 +15,20 @@ from app.services import crypto_service
 router = APIRouter()
 
 @router.get("/", response_model=List[conn_schema.Connection])
-def read_connections(
+async def read_connections(
     db_type: Optional[str] = Query(None), # Filter by postgresql or sqlserver
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user = Depends(deps.get_current_user)
 ):
-    query = db.query(DatabaseConnection).filter(DatabaseConnection.user_id == current_user.id)
+    query = select(DatabaseConnection).where(DatabaseConnection.user_id == current_user.id)
     if db_type:
-        query = query.filter(DatabaseConnection.db_type == db_type)
-    return query.all()
+        query = query.where(DatabaseConnection.db_type == db_type)
+    return (await db.scalars(query)).all()
 
 @router.post("/", response_model=conn_schema.Connection)
-def create_connection(
+async def create_connection(
     obj_in: conn_schema.ConnectionCreate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user = Depends(deps.get_current_user)
 ):
     encrypted_pw = crypto_service.encrypt(obj_in.password)
@@ -36,10 +38,11 @@ def create_connection(
         user_id=current_user.id
     )
     db.add(db_obj)
-    db.commit()
-    db.refresh(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
     return db_obj
 
+# Plain def on purpose: the blocking driver connect runs in the threadpool, not on the event loop
 @router.post("/test")
 def test_connection(obj_in: conn_schema.ConnectionTest):
     # SQL SERVER TEST LOGIC
@@ -75,10 +78,13 @@ def test_connection(obj_in: conn_schema.ConnectionTest):
             return {"success": False, "message": str(e)}
 
 @router.delete("/{id}")
-def delete_connection(id: str, db: Session = Depends(get_db), current_user = Depends(deps.get_current_user)):
-    conn = db.query(DatabaseConnection).filter(DatabaseConnection.id == id, DatabaseConnection.user_id == current_user.id).first()
+async def delete_connection(id: str, db: AsyncSession = Depends(get_async_db), current_user = Depends(deps.get_current_user)):
+    # Schedules are deleted with it (ORM cascade): load them up front, async sessions can't lazy-load
+    conn = await db.scalar(select(DatabaseConnection).options(
+        selectinload(DatabaseConnection.schedules)
+    ).where(DatabaseConnection.id == id, DatabaseConnection.user_id == current_user.id))
     if not conn:
         raise HTTPException(status_code=404, detail="Connection not found")
-    db.delete(conn)
-    db.commit()
+    await db.delete(conn)
+    await db.commit()
     return {"status": "deleted"}
\ No newline at end of file
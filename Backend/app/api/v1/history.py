@@ -150,106 +150,515 @@
 #     db.commit()
 #     return {"status": "success"}
 
+import base64
+import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from jose import JWTError
+from sqlalchemy import literal, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
-from app.db.session import get_db
-from app.models.history import BackupHistory
+from app.core import security
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, get_async_db
+from app.models.history import BackupHistory, BackupStatus, BackupTableStat
 from app.models.schedule import BackupSchedule
 from app.models.connection import DatabaseConnection 
-from app.models.user import User                     
+from app.models.storage import StorageConfiguration
 from app.schemas import history as history_schema
-from app.worker.tasks import run_backup_task # Now a standard function
+from app.services.backup_service import BackupService
+from app.services.checkpoint_service import ExportCheckpoint
+from app.services.progress_service import TERMINAL_STATUSES, latest_progress, publish_progress, subscribe_progress
+from app.services.schedule_service import ScheduleService
+from app.services.storage_service import StorageService
+from app.worker.queue import enqueue_backup
 
 router = APIRouter()
 
-@router.get("/", response_model=List[history_schema.History])
-def read_history(
+# Columns the history list view renders; full rows come from GET /history/{id}
+LIST_COLUMNS = (
+    BackupHistory.id,
+    BackupHistory.user_id,
+    BackupHistory.connection_id,
+    BackupHistory.schedule_id,
+    BackupHistory.status,
+    BackupHistory.backup_type,
+    BackupHistory.backup_format,
+    BackupHistory.file_name,
+    BackupHistory.file_size_bytes,
+    BackupHistory.compression_codec,
+    BackupHistory.started_at,
+    BackupHistory.completed_at,
+    BackupHistory.error_message,
+    BackupHistory.tables_backed_up,
+    BackupHistory.progress_percent,
+    BackupHistory.progress_eta_seconds,
+    BackupHistory.created_at,
+)
+
+def _as_utc(value: datetime) -> datetime:
+    # asyncpg would read a naive datetime as host-local time
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def _encode_cursor(created_at: datetime, id) -> str:
+    raw = f"{created_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, id = raw.split("|")
+        return _as_utc(datetime.fromisoformat(created_at)), UUID(id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/", response_model=List[history_schema.HistoryListItem])
+async def read_history(
+    response: Response,
     connection_id: Optional[str] = Query(None), 
     status: Optional[str] = Query(None), 
-    db: Session = Depends(get_db), 
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_async_db), 
     current_user = Depends(deps.get_current_user)
 ):
-    query = db.query(
-        BackupHistory,
-        DatabaseConnection.name.label("connection_name"),
-        User.email.label("user_email")
-    ).join(
-        User, BackupHistory.user_id == User.id
+    """
+    Newest first, keyset-paginated on (created_at, id). When more rows
+    exist the response carries an X-Next-Cursor header to pass back as
+    ?cursor= for the next page.
+    """
+    query = select(
+        *LIST_COLUMNS,
+        DatabaseConnection.name.label("connection_name")
     ).outerjoin(
         DatabaseConnection, BackupHistory.connection_id == DatabaseConnection.id
-    ).filter(BackupHistory.user_id == current_user.id)
+    ).where(BackupHistory.user_id == current_user.id)
 
     if connection_id:
-        query = query.filter(BackupHistory.connection_id == connection_id)
+        query = query.where(BackupHistory.connection_id == connection_id)
     if status:
-        query = query.filter(BackupHistory.status == status)
+        query = query.where(BackupHistory.status == status)
+    if created_from:
+        query = query.where(BackupHistory.created_at >= _as_utc(created_from))
+    if created_to:
+        query = query.where(BackupHistory.created_at < _as_utc(created_to))
+    if cursor:
+        after_created_at, after_id = _decode_cursor(cursor)
+        # Row-value comparison so Postgres can seek straight into the index
+        query = query.where(
+            tuple_(BackupHistory.created_at, BackupHistory.id) < tuple_(
+                literal(after_created_at, BackupHistory.created_at.type),
+                literal(after_id, BackupHistory.id.type)
+            )
+        )
 
-    return [
-        row[0].__dict__ | {"connection_name": row.connection_name, "user_email": row.user_email} 
-        for row in query.order_by(BackupHistory.created_at.desc()).all()
-    ]
+    rows = (await db.execute(query.order_by(
+        BackupHistory.created_at.desc(), BackupHistory.id.desc()
+    ).limit(limit + 1))).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    # Every row belongs to the caller, so no join on users is needed for the email
+    return [row._asdict() | {"user_email": current_user.email} for row in rows]
 
 @router.post("/run/{schedule_id}")
 async def run_manual_backup(
     schedule_id: str, 
-    background_tasks: BackgroundTasks, # Inject BackgroundTasks
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user = Depends(deps.get_current_user)
 ):
-    schedule = db.query(BackupSchedule).filter(
+    schedule = await db.scalar(select(BackupSchedule).where(
         BackupSchedule.id == schedule_id, 
         BackupSchedule.user_id == current_user.id
-    ).first()
+    ))
     
     if not schedule:
         raise HTTPException(status_code=404, detail="Schedule not found")
 
     # Create record immediately so UI sees it as 'pending/running'
-    new_history = BackupHistory(
-        user_id=current_user.id,
-        connection_id=schedule.connection_id,
-        schedule_id=schedule.id,
-        backup_type=schedule.backup_type,
-        backup_format=schedule.backup_format,
-        status="pending",
-        created_at=datetime.utcnow()
-    )
+    new_history = ScheduleService.build_history(schedule, current_user.id)
     db.add(new_history)
-    db.commit()
-    db.refresh(new_history)
+    await db.commit()
+    await db.refresh(new_history)
+
+    # Hand off to the worker pool; the row stays 'pending' until a worker claims it.
+    # Enqueueing talks to Redis (or starts the local pool), so not on the event loop.
+    await run_in_threadpool(enqueue_backup, new_history.id, new_history.connection_id)
+
+    return {"success": True, "message": "Backup job queued", "history_id": new_history.id}
+
+@router.post("/{id}/cancel")
+async def cancel_backup(id: UUID, db: AsyncSession = Depends(get_async_db), current_user = Depends(deps.get_current_user)):
+    """
+    A pending backup is cancelled on the spot (no worker will claim it),
+    along with the export checkpoint of a retry waiting to run. A running
+    one is flagged: its worker notices within BACKUP_CANCEL_POLL_SECONDS,
+    kills pg_dump's process group (or stops the MSSQL export), discards the
+    partial artifact, frees its slot and marks the row cancelled.
+    """
+    now = datetime.now(timezone.utc)
+    owned = (BackupHistory.id == id, BackupHistory.user_id == current_user.id)
+    # A retry waiting out its backoff still has its export checkpoint (locked, so no worker claims it meanwhile)
+    checkpoint = await db.scalar(select(BackupHistory.checkpoint).where(
+        *owned, BackupHistory.status == BackupStatus.pending
+    ).with_for_update())
+    cancelled = (await db.execute(update(BackupHistory).where(
+        *owned, BackupHistory.status == BackupStatus.pending
+    ).values(
+        status=BackupStatus.cancelled,
+        cancel_requested_at=now,
+        completed_at=now,
+        error_message="Cancelled by user",
+        checkpoint=None
+    ).execution_options(synchronize_session=False))).rowcount
+    requested = cancelled or (await db.execute(update(BackupHistory).where(
+        *owned, BackupHistory.status == BackupStatus.running
+    ).values(cancel_requested_at=now).execution_options(synchronize_session=False))).rowcount
+    await db.commit()
 
-    # ADD TO BACKGROUND TASKS
-    # This executes run_backup_task(history_id) in a background thread
-    background_tasks.add_task(run_backup_task, str(new_history.id))
+    if cancelled and checkpoint:
+        # Nothing will resume the segments now
+        await run_in_threadpool(BackupService.discard_checkpoint, ExportCheckpoint(checkpoint))
+    if cancelled:
+        # No worker will publish a final event for it, so the API does
+        rows = await _progress_rows(current_user.id, id)
+        if rows:
+            await run_in_threadpool(publish_progress, _row_event(rows[0]))
+        return {"success": True, "message": "Backup cancelled", "history_id": id}
+    if requested:
+        return {"success": True, "message": "Cancellation requested", "history_id": id}
 
-    return {"success": True, "message": "Backup task initialized in background", "history_id": new_history.id}
+    exists = await db.scalar(select(BackupHistory.id).where(*owned))
+    if not exists:
+        raise HTTPException(status_code=404, detail="Backup not found")
+    raise HTTPException(status_code=409, detail="Backup has already finished")
 
-@router.get("/{id}/download-url")
-def get_download_url(id: str, db: Session = Depends(get_db), current_user = Depends(deps.get_current_user)):
-    backup = db.query(BackupHistory).filter(BackupHistory.id == id, BackupHistory.user_id == current_user.id).first()
+PROGRESS_COLUMNS = (
+    BackupHistory.id,
+    BackupHistory.user_id,
+    BackupHistory.status,
+    BackupHistory.progress_table,
+    BackupHistory.progress_rows,
+    BackupHistory.progress_bytes,
+    BackupHistory.progress_percent,
+    BackupHistory.progress_eta_seconds,
+    BackupHistory.progress_updated_at,
+    BackupHistory.error_message,
+)
+
+async def _progress_rows(user_id, history_id=None):
+    # Short session of its own: event streams outlive the request's session
+    query = select(*PROGRESS_COLUMNS).where(BackupHistory.user_id == user_id)
+    if history_id is not None:
+        query = query.where(BackupHistory.id == history_id)
+    else:
+        query = query.where(BackupHistory.status.in_([BackupStatus.pending, BackupStatus.running]))
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(query)).all()
+
+def _row_event(row) -> dict:
+    """
+    Progress event from the last snapshot persisted on the row.
+    """
+    event = {
+        "history_id": str(row.id),
+        "user_id": str(row.user_id),
+        "status": row.status.value,
+        "table": row.progress_table,
+        "rows": row.progress_rows,
+        "bytes": row.progress_bytes,
+        "percent": row.progress_percent,
+        "eta_seconds": row.progress_eta_seconds,
+        "updated_at": row.progress_updated_at.isoformat() if row.progress_updated_at else None,
+    }
+    if row.error_message:
+        event["error_message"] = row.error_message
+    return event
+
+def _sse(event: dict) -> str:
+    return f"event: progress\ndata: {json.dumps(event)}\n\n"
+
+async def _progress_stream(request: Request, user_id, history_id: Optional[str] = None):
+    """
+    Server-sent events: the current state of the job(s) first, then every
+    published update. A single-job stream ends with the job's final event;
+    it also re-checks the row on each keep-alive, in case the worker died
+    without publishing one.
+    """
+    async with subscribe_progress(user_id) as receive:
+        rows = await _progress_rows(user_id, history_id)
+        for row in rows:
+            live = None if row.status.value in TERMINAL_STATUSES else await latest_progress(row.id)
+            yield _sse(live or _row_event(row))
+            if history_id is not None and row.status.value in TERMINAL_STATUSES:
+                return
+
+        while not await request.is_disconnected():
+            event = await receive(settings.PROGRESS_HEARTBEAT_SECONDS)
+            if event is None:
+                if history_id is not None:
+                    rows = await _progress_rows(user_id, history_id)
+                    if not rows or rows[0].status.value in TERMINAL_STATUSES:
+                        if rows:
+                            yield _sse(_row_event(rows[0]))
+                        return
+                yield ": keep-alive\n\n"
+                continue
+            if history_id is not None and event["history_id"] != history_id:
+                continue
+            yield _sse(event)
+            if history_id is not None and event["status"] in TERMINAL_STATUSES:
+                return
+
+def _event_response(stream) -> StreamingResponse:
+    return StreamingResponse(stream, media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # Tell nginx not to buffer the stream
+        "X-Accel-Buffering": "no",
+    })
+
+@router.get("/events")
+async def stream_progress(request: Request, current_user = Depends(deps.get_current_user)):
+    """
+    Live progress of all the caller's pending/running backups, so the
+    dashboard can stop polling the history list.
+    """
+    return _event_response(_progress_stream(request, current_user.id))
+
+@router.get("/{id}/events")
+async def stream_backup_progress(
+    id: UUID,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(deps.get_current_user)
+):
+    exists = await db.scalar(select(BackupHistory.id).where(
+        BackupHistory.id == id, BackupHistory.user_id == current_user.id
+    ))
+    if not exists:
+        raise HTTPException(status_code=404, detail="Backup not found")
+    return _event_response(_progress_stream(request, current_user.id, str(id)))
+
+TABLE_STAT_ORDER = {
+    "bytes": BackupTableStat.bytes.desc().nulls_last(),
+    "duration": BackupTableStat.duration_seconds.desc().nulls_last(),
+    "rows": BackupTableStat.row_count.desc().nulls_last(),
+    "name": BackupTableStat.table_name.asc(),
+}
+
+@router.get("/tables/trend", response_model=List[history_schema.TableStatPoint])
+async def read_table_trend(
+    connection_id: UUID,
+    table_name: str,
+    limit: int = Query(30, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    A table's rows, bytes and duration over the connection's newest backups.
+    """
+    rows = (await db.execute(select(
+        BackupTableStat, BackupHistory.created_at
+    ).join(
+        BackupHistory, BackupTableStat.backup_id == BackupHistory.id
+    ).where(
+        BackupTableStat.table_name == table_name,
+        BackupHistory.connection_id == connection_id,
+        BackupHistory.user_id == current_user.id,
+        BackupHistory.status == BackupStatus.completed
+    ).order_by(BackupHistory.created_at.desc()).limit(limit))).all()
+    return [
+        history_schema.TableStat.model_validate(stat).model_dump() | {"backup_id": stat.backup_id, "created_at": created_at}
+        for stat, created_at in rows
+    ]
+
+@router.get("/{id}/tables", response_model=List[history_schema.TableStat])
+async def read_backup_tables(
+    id: UUID,
+    order_by: str = Query("bytes", pattern="^(bytes|duration|rows|name)$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    Per-table statistics recorded by the backup, largest first by default.
+    """
+    backup = await db.scalar(select(BackupHistory.id).where(BackupHistory.id == id, BackupHistory.user_id == current_user.id))
+    if not backup:
+        raise HTTPException(status_code=404, detail="Backup not found")
+    return (await db.scalars(select(BackupTableStat).where(
+        BackupTableStat.backup_id == id
+    ).order_by(TABLE_STAT_ORDER[order_by], BackupTableStat.table_name))).all()
+
+@router.get("/{id}", response_model=history_schema.History)
+async def read_history_record(id: str, db: AsyncSession = Depends(get_async_db), current_user = Depends(deps.get_current_user)):
+    row = (await db.execute(select(
+        BackupHistory,
+        DatabaseConnection.name.label("connection_name")
+    ).outerjoin(
+        DatabaseConnection, BackupHistory.connection_id == DatabaseConnection.id
+    ).where(BackupHistory.id == id, BackupHistory.user_id == current_user.id))).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Backup not found")
+    return row[0].__dict__ | {"connection_name": row.connection_name, "user_email": current_user.email}
+
+async def _storage_for(db: AsyncSession, backup: BackupHistory):
+    if not backup.storage_id:
+        return None
+    return await db.get(StorageConfiguration, backup.storage_id)
+
+def _parse_range(range_header: str, size: int):
+    """
+    (start, end) for a single "bytes=" range, or None to serve the whole
+    file (multi-range or unknown units). Raises 416 when unsatisfiable.
+    """
+    units, _, spec = range_header.partition("=")
+    if units.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _accel_redirect(path: str) -> Optional[str]:
+    if not (settings.DOWNLOAD_ACCEL_PREFIX and settings.DOWNLOAD_ACCEL_ROOT):
+        return None
+    root = os.path.realpath(settings.DOWNLOAD_ACCEL_ROOT)
+    path = os.path.realpath(path)
+    if not path.startswith(root + os.sep):
+        return None
+    relative = os.path.relpath(path, root).replace(os.sep, "/")
+    return settings.DOWNLOAD_ACCEL_PREFIX.rstrip("/") + "/" + quote(relative)
+
+async def _serve_backup(request: Request, db: AsyncSession, backup: BackupHistory):
+    """
+    Streams a backup with Range/If-Range support. The ETag is the backup's
+    SHA-256, so a resumed download can't silently splice two different files.
+    """
+    if not backup.file_path:
+        raise HTTPException(status_code=404, detail="File not found")
+    etag = f'"{backup.checksum}"' if backup.checksum else None
+    disposition = f"attachment; filename*=utf-8''{quote(backup.file_name or 'backup')}"
+
+    # Deduplicated and encrypted backups are reassembled/decrypted as they stream, wherever they are stored
+    if not StorageService.is_readable_in_place(backup.file_path):
+        storage = await _storage_for(db, backup)
+        # S3 HEAD request: in the threadpool; iter_chunks below is a sync
+        # generator, which StreamingResponse iterates there too
+        if not await run_in_threadpool(StorageService.exists, storage, backup.file_path):
+            raise HTTPException(status_code=404, detail="File not found")
+        headers = {"Accept-Ranges": "bytes", "Content-Disposition": disposition}
+        if etag:
+            headers["ETag"] = etag
+        size = backup.file_size_bytes
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        byte_range = None
+        if range_header and size is not None and (if_range is None or if_range == etag):
+            byte_range = _parse_range(range_header, size)
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                StorageService.iter_chunks(storage, backup.file_path, start, end),
+                status_code=206, media_type='application/octet-stream', headers=headers
+            )
+        if size is not None:
+            headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            StorageService.iter_chunks(storage, backup.file_path),
+            media_type='application/octet-stream', headers=headers
+        )
+
+    if not os.path.exists(backup.file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    accel = _accel_redirect(backup.file_path)
+    if accel:
+        # nginx serves the bytes (sendfile, Range) from its internal location
+        return Response(
+            media_type='application/octet-stream',
+            headers={"X-Accel-Redirect": accel, "Content-Disposition": disposition}
+        )
+
+    # FileResponse answers Range/If-Range itself (against our ETag) and uses
+    # the ASGI pathsend extension for zero-copy sends where the server has it
+    return FileResponse(
+        path=backup.file_path, filename=backup.file_name, media_type='application/octet-stream',
+        headers={"etag": etag} if etag else None
+    )
+
+@router.get("/{id}/download-url", response_model=history_schema.HistoryDownload)
+async def get_download_url(id: str, request: Request, db: AsyncSession = Depends(get_async_db), current_user = Depends(deps.get_current_user)):
+    backup = await db.scalar(select(BackupHistory).where(BackupHistory.id == id, BackupHistory.user_id == current_user.id))
     if not backup or not backup.file_path:
         raise HTTPException(status_code=404, detail="Backup file not found")
-    return {"url": f"http://localhost:8000/api/v1/history/download/{backup.id}", "filename": backup.file_name}
+    expires_in = settings.DOWNLOAD_TOKEN_EXPIRE_SECONDS
+    token = security.create_download_token(backup.id, current_user.id, timedelta(seconds=expires_in))
+    return {
+        "download_url": str(request.url_for("download_signed_backup", token=token)),
+        "file_name": backup.file_name,
+        "expires_in": expires_in
+    }
 
-@router.get("/download/{id}")
-def download_backup_file(id: str, db: Session = Depends(get_db), current_user = Depends(deps.get_current_user)):
-    backup = db.query(BackupHistory).filter(BackupHistory.id == id, BackupHistory.user_id == current_user.id).first()
-    if not backup or not backup.file_path or not os.path.exists(backup.file_path):
+@router.get("/download/signed/{token}", name="download_signed_backup")
+async def download_signed_backup(token: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Token-authorized download (see /{id}/download-url). Every range request
+    costs one primary-key lookup on backup_history; the owner comes from
+    principal_cache, so links issued before a logout-all stop working.
+    """
+    try:
+        claims = security.decode_download_token(token)
+        history_id, user_id = UUID(claims["sub"]), UUID(claims["uid"])
+    except (JWTError, KeyError, ValueError):
+        raise HTTPException(status_code=403, detail="Download link is invalid or has expired")
+    principal = await deps.get_principal(user_id)
+    if not principal or deps.is_revoked(principal, claims.get("iat")):
+        raise HTTPException(status_code=401, detail="Download link has been revoked")
+    backup = await db.scalar(select(BackupHistory).where(
+        BackupHistory.id == history_id, BackupHistory.user_id == user_id
+    ))
+    if not backup:
         raise HTTPException(status_code=404, detail="File not found")
+    return await _serve_backup(request, db, backup)
 
-    return FileResponse(path=backup.file_path, filename=backup.file_name, media_type='application/octet-stream')
+@router.get("/download/{id}")
+async def download_backup_file(id: str, request: Request, db: AsyncSession = Depends(get_async_db), current_user = Depends(deps.get_current_user)):
+    backup = await db.scalar(select(BackupHistory).where(BackupHistory.id == id, BackupHistory.user_id == current_user.id))
+    if not backup:
+        raise HTTPException(status_code=404, detail="File not found")
+    return await _serve_backup(request, db, backup)
 
 @router.delete("/{id}")
-def delete_history_record(id: str, db: Session = Depends(get_db), current_user = Depends(deps.get_current_user)):
-    record = db.query(BackupHistory).filter(BackupHistory.id == id, BackupHistory.user_id == current_user.id).first()
+async def delete_history_record(id: str, db: AsyncSession = Depends(get_async_db), current_user = Depends(deps.get_current_user)):
+    record = await db.scalar(select(BackupHistory).where(BackupHistory.id == id, BackupHistory.user_id == current_user.id))
+    if record and await db.scalar(select(BackupHistory.id).where(BackupHistory.parent_backup_id == record.id)):
+        raise HTTPException(status_code=409, detail="Incremental backups build on this backup; delete them first")
     if record:
-        if record.file_path and os.path.exists(record.file_path):
-            os.remove(record.file_path)
-        db.delete(record)
-        db.commit()
+        await run_in_threadpool(StorageService.delete, await _storage_for(db, record), record.file_path)
+        await db.delete(record)
+        await db.commit()
     return {"status": "success"}
\ No newline at end of file
@@ -0,0 +1,78 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.db.session import get_async_db
+from app.models.history import BackupHistory, BackupStatus, RestoreHistory
+from app.models.connection import DatabaseConnection
+from app.schemas import history as history_schema
+from app.worker.queue import enqueue_restore
+
+router = APIRouter()
+
+@router.get("/", response_model=List[history_schema.Restore])
+async def read_restores(
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(deps.get_current_user)
+):
+    return (await db.scalars(select(RestoreHistory).where(
+        RestoreHistory.user_id == current_user.id
+    ).order_by(RestoreHistory.created_at.desc()).limit(limit))).all()
+
+@router.get("/{id}", response_model=history_schema.Restore)
+async def read_restore(id: str, db: AsyncSession = Depends(get_async_db), current_user = Depends(deps.get_current_user)):
+    restore = await db.scalar(select(RestoreHistory).where(
+        RestoreHistory.id == id,
+        RestoreHistory.user_id == current_user.id
+    ))
+    if not restore:
+        raise HTTPException(status_code=404, detail="Restore not found")
+    return restore
+
+@router.post("/", response_model=history_schema.Restore)
+async def create_restore(
+    obj_in: history_schema.RestoreCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(deps.get_current_user)
+):
+    backup = await db.scalar(select(BackupHistory).where(
+        BackupHistory.id == obj_in.backup_id,
+        BackupHistory.user_id == current_user.id
+    ))
+    if not backup:
+        raise HTTPException(status_code=404, detail="Backup not found")
+    if backup.status != BackupStatus.completed or not backup.file_path:
+        raise HTTPException(status_code=400, detail="Only completed backups can be restored")
+
+    connection_id = obj_in.connection_id or backup.connection_id
+    target = await db.scalar(select(DatabaseConnection).where(
+        DatabaseConnection.id == connection_id,
+        DatabaseConnection.user_id == current_user.id
+    ))
+    if not target:
+        raise HTTPException(status_code=404, detail="Target connection not found")
+
+    source = await db.scalar(select(DatabaseConnection).where(DatabaseConnection.id == backup.connection_id))
+    if source and source.db_type != target.db_type:
+        raise HTTPException(status_code=400, detail="Target connection is a different database type than the backup")
+
+    restore = RestoreHistory(
+        user_id=current_user.id,
+        backup_id=backup.id,
+        connection_id=target.id,
+        clean_target=obj_in.clean,
+        parallel_jobs=obj_in.parallel_jobs or target.parallel_jobs or 1,
+        status=BackupStatus.pending
+    )
+    db.add(restore)
+    await db.commit()
+    await db.refresh(restore)
+
+    # Same pool and per-connection slots as backups; the row stays 'pending' until claimed.
+    # Enqueueing talks to Redis (or starts the local pool), so not on the event loop.
+    await run_in_threadpool(enqueue_restore, restore.id, restore.connection_id)
+    return restore
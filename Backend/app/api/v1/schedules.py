@@ -1,62 +1,85 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.db.session import get_db
-from app.models.schedule import BackupSchedule
-from app.models.connection import DatabaseConnection # Imported for the join
+from app.db.session import get_async_db
+from app.models.schedule import BackupSchedule, BackupType
+from app.models.connection import DatabaseConnection, DBType # Imported for the join
 from app.schemas import schedule as sched_schema
+from app.services.schedule_service import ScheduleService
+from app.services.table_filter import TableFilter
 
 router = APIRouter()
 
 @router.get("/", response_model=List[sched_schema.Schedule])
-def read_schedules(
+async def read_schedules(
     db_type: Optional[str] = None, # Added filtering parameter
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user = Depends(deps.get_current_user)
 ):
     # Join schedules with connections to see the type of the parent database
-    query = db.query(BackupSchedule).join(
+    query = select(BackupSchedule).join(
         DatabaseConnection, BackupSchedule.connection_id == DatabaseConnection.id
-    ).filter(BackupSchedule.user_id == current_user.id)
+    ).where(BackupSchedule.user_id == current_user.id)
 
     if db_type:
-        query = query.filter(DatabaseConnection.db_type == db_type)
+        query = query.where(DatabaseConnection.db_type == db_type)
         
-    return query.all()
+    return (await db.scalars(query)).all()
 
 @router.post("/", response_model=sched_schema.Schedule)
-def create_schedule(obj_in: sched_schema.ScheduleCreate, db: Session = Depends(get_db), current_user = Depends(deps.get_current_user)):
+async def create_schedule(obj_in: sched_schema.ScheduleCreate, db: AsyncSession = Depends(get_async_db), current_user = Depends(deps.get_current_user)):
+    try:
+        next_run_at = ScheduleService.next_run_at(obj_in.frequency, obj_in.cron_expression)
+        TableFilter.from_schedule(obj_in)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if obj_in.backup_type == BackupType.incremental:
+        connection = await db.scalar(select(DatabaseConnection).where(
+            DatabaseConnection.id == obj_in.connection_id,
+            DatabaseConnection.user_id == current_user.id
+        ))
+        if connection and connection.db_type != DBType.sqlserver:
+            raise HTTPException(status_code=400, detail="Incremental backups are only supported for SQL Server connections")
+
     db_obj = BackupSchedule(
         **obj_in.dict(),
-        user_id=current_user.id
+        user_id=current_user.id,
+        next_run_at=next_run_at
     )
     db.add(db_obj)
-    db.commit()
-    db.refresh(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
     return db_obj
 
 @router.patch("/{id}/toggle")
-def toggle_schedule(id: str, is_active: bool, db: Session = Depends(get_db), current_user = Depends(deps.get_current_user)):
-    db_obj = db.query(BackupSchedule).filter(
+async def toggle_schedule(id: str, is_active: bool, db: AsyncSession = Depends(get_async_db), current_user = Depends(deps.get_current_user)):
+    db_obj = await db.scalar(select(BackupSchedule).where(
         BackupSchedule.id == id, 
         BackupSchedule.user_id == current_user.id
-    ).first()
+    ))
     if not db_obj:
         raise HTTPException(status_code=404, detail="Schedule not found")
     db_obj.is_active = is_active
-    db.commit()
+    # Re-plan from now so a re-enabled schedule doesn't fire for the time it was off
+    if is_active:
+        db_obj.next_run_at = ScheduleService.next_run_at(
+            db_obj.frequency, db_obj.cron_expression, anchor_day=ScheduleService.anchor_day(db_obj)
+        )
+    await db.commit()
     return {"is_active": is_active}
 
 @router.delete("/{id}")
-def delete_schedule(id: str, db: Session = Depends(get_db), current_user = Depends(deps.get_current_user)):
-    db_obj = db.query(BackupSchedule).filter(
+async def delete_schedule(id: str, db: AsyncSession = Depends(get_async_db), current_user = Depends(deps.get_current_user)):
+    db_obj = await db.scalar(select(BackupSchedule).where(
         BackupSchedule.id == id, 
         BackupSchedule.user_id == current_user.id
-    ).first()
+    ))
     if not db_obj:
         raise HTTPException(status_code=404, detail="Schedule not found")
-    db.delete(db_obj)
-    db.commit()
+    await db.delete(db_obj)
+    await db.commit()
     return {"status": "deleted"}
\ No newline at end of file
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.user import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    What authenticated endpoints know about their caller. Immutable and
+    detached from any session, so one instance can serve many requests.
+    """
+    id: UUID
+    email: str
+    # Access tokens issued before this are revoked (NULL: none are)
+    tokens_valid_after: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, email=user.email, tokens_valid_after=user.tokens_valid_after)
+
+
+class PrincipalCache:
+    """
+    Bounded per-process cache of principals by user id: entries expire
+    AUTH_CACHE_TTL_SECONDS after they were loaded and the least recently
+    used one goes once AUTH_CACHE_MAX_USERS are held. A user row updated
+    or deleted through the ORM is dropped when its transaction commits;
+    other API processes see the change when their entry expires.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            principal, expires = entry
+            if time.monotonic() >= expires:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal: Principal):
+        ttl = settings.AUTH_CACHE_TTL_SECONDS
+        if ttl <= 0:
+            return
+        key = str(principal.id)
+        with self._lock:
+            self._entries[key] = (principal, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(1, settings.AUTH_CACHE_MAX_USERS):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+_PENDING_KEY = "auth_cache_invalidate"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    # Dropped on commit, not now: a request in between would cache the old row again
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(str(target.id))
+    else:
+        principal_cache.invalidate(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        principal_cache.invalidate(user_id)
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_init
 from app.core.config import settings
 
 celery_app = Celery(
@@ -13,6 +14,17 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Global limit: backups run in this many worker processes (prefork pool)
+    worker_concurrency=settings.WORKER_CONCURRENCY,
+    # Backups are long; don't let one worker reserve jobs another could start
+    worker_prefetch_multiplier=1,
     # This ensures Celery finds your backup tasks
     include=["app.worker.tasks"]
-)
\ No newline at end of file
+)
+
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    # Workers on other hosts than the API serve their own /metrics
+    if settings.METRICS_ENABLED and settings.METRICS_WORKER_PORT:
+        from app.core.metrics import start_exporter
+        start_exporter(settings.METRICS_WORKER_PORT)
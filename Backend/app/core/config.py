@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import Dict, List, Optional, Union
 from pydantic import AnyHttpUrl, validator
 from pydantic_settings import BaseSettings
 
@@ -10,17 +10,180 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 1 week
+    # Signed backup download links
+    DOWNLOAD_TOKEN_EXPIRE_SECONDS: int = 15 * 60
+    # Authenticated users are cached per API process for this long (0 = look
+    # up every request), at most AUTH_CACHE_MAX_USERS of them. Changes made
+    # through another process, and revocations, apply there within the TTL.
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_USERS: int = 10000
+
+    # Zero-copy downloads through a reverse proxy: when set, local backups
+    # under DOWNLOAD_ACCEL_ROOT are handed to nginx with
+    # "X-Accel-Redirect: <DOWNLOAD_ACCEL_PREFIX>/<relative path>" (an
+    # internal location aliased to that root), which serves them with
+    # sendfile and handles Range itself
+    DOWNLOAD_ACCEL_PREFIX: Optional[str] = None
+    DOWNLOAD_ACCEL_ROOT: Optional[str] = None
 
     # Encryption key for Database Credentials
     # MUST be the same as the one used in Supabase Edge Functions
     ENCRYPTION_KEY: str
+    # Key rotation: when set, new ciphertexts are written as "<id>:<base64>"
+    # (leave unset while the Deno function must read them)
+    ENCRYPTION_KEY_ID: Optional[str] = None
+    # Previous keys still accepted for decryption, as JSON: {"<id>": "<secret>"}
+    ENCRYPTION_RETIRED_KEYS: Dict[str, str] = {}
 
     # Database
     DATABASE_URL: str
+    # Async URL the API handlers use; derived from DATABASE_URL when unset
+    # (postgresql+psycopg2 -> postgresql+asyncpg, sqlite -> sqlite+aiosqlite)
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Connection pool of each engine (sync for workers/scheduler, async for
+    # the API), per process: size the server's max_connections accordingly
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    # Seconds a request waits for a free pooled connection before failing
+    DATABASE_POOL_TIMEOUT: int = 30
+    # Reconnect pooled connections older than this (-1: never)
+    DATABASE_POOL_RECYCLE_SECONDS: int = 1800
+    # Behind PgBouncer in transaction mode (e.g. Supabase port 6543): no
+    # client-side pool (NullPool, the bouncer pools) and no prepared
+    # statements, which don't survive a server switch between transactions
+    DATABASE_PGBOUNCER: bool = False
 
     # Redis / Celery
     REDIS_URL: str = "redis://localhost:6379/0"
 
+    # Backup job dispatch: "celery" (Redis broker + separate worker) or
+    # "local" (process pool owned by the API process; single API instance only)
+    JOB_QUEUE_BACKEND: str = "local"
+    # Backups running at once across the whole worker pool
+    WORKER_CONCURRENCY: int = 4
+    # Backups running at once against the same database connection
+    WORKER_PER_CONNECTION_LIMIT: int = 1
+    # Celery: delay before a job that found its connection busy tries again
+    WORKER_SLOT_RETRY_SECONDS: int = 15
+    # Celery: lease on a connection slot, renewed every third of it while the
+    # job runs; a slot not renewed for this long was leaked by a dead worker
+    WORKER_SLOT_TTL_SECONDS: int = 5 * 60
+
+    # Scheduler: run the loop as a thread inside the API process. Turn off
+    # when running `python -m app.worker.scheduler` as its own service.
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_TICK_SECONDS: int = 30
+    # Due schedules claimed per transaction
+    SCHEDULER_BATCH_SIZE: int = 500
+
+    # Retention: pruning pass run every RETENTION_INTERVAL_SECONDS by the
+    # scheduler service (or a thread in the API process, see SCHEDULER_ENABLED).
+    # Per connection keeps the newest max_backups successful backups
+    # (RETENTION_KEEP_SUCCESSFUL for connections without schedules) and the
+    # newest RETENTION_KEEP_FAILED failed runs; schedules' retention_days apply on top.
+    RETENTION_ENABLED: bool = True
+    RETENTION_INTERVAL_SECONDS: int = 60 * 60
+    RETENTION_KEEP_SUCCESSFUL: int = 3
+    RETENTION_KEEP_FAILED: int = 3
+    # Rows selected/deleted per transaction
+    RETENTION_BATCH_SIZE: int = 1000
+
+    # Live progress of running backups: events to SSE subscribers at most
+    # every PROGRESS_PUBLISH_SECONDS, snapshots to backup_history at most
+    # every PROGRESS_DB_WRITE_SECONDS
+    PROGRESS_PUBLISH_SECONDS: float = 0.5
+    PROGRESS_DB_WRITE_SECONDS: float = 10
+    # Keep-alive comment on idle event streams (proxies drop silent connections)
+    PROGRESS_HEARTBEAT_SECONDS: float = 15
+
+    # Prometheus metrics at /metrics. Celery workers on other hosts can
+    # serve their own on METRICS_WORKER_PORT
+    METRICS_ENABLED: bool = True
+    METRICS_WORKER_PORT: Optional[int] = None
+
+    # MSSQL scripter: rows pulled per fetchmany() round-trip.
+    # Peak worker memory is bounded by this, not by table size.
+    MSSQL_FETCH_BATCH_SIZE: int = 5000
+    # Rows per multi-row INSERT (1 = one statement per row, max 1000)
+    MSSQL_INSERT_BATCH_ROWS: int = 1000
+    # Tables with a primary key are read in keyset chunks of this many rows
+    # (one short query each), and every chunk is checkpointed on the history
+    # row, so a failed export resumes after the last chunk instead of from
+    # scratch. 0 = one query per table, checkpoints at table boundaries only
+    MSSQL_CHECKPOINT_ROWS: int = 100000
+
+    # Incremental schedules (SQL Server) export only what changed since the
+    # previous backup of their chain; after this many increments the next
+    # run takes a new full base instead, which bounds restore replay time
+    MSSQL_INCREMENTAL_MAX_CHAIN: int = 7
+
+    # Checkpointed MSSQL exports that fail on a transient error are re-queued
+    # up to BACKUP_MAX_RETRIES times, after BACKUP_RETRY_BACKOFF_SECONDS
+    # doubling up to the max (no worker or connection slot held meanwhile)
+    BACKUP_MAX_RETRIES: int = 3
+    BACKUP_RETRY_BACKOFF_SECONDS: float = 30
+    BACKUP_RETRY_BACKOFF_MAX_SECONDS: float = 600
+
+    # Dump tools (pg_dump) are killed, process group and all, after running
+    # BACKUP_PROCESS_TIMEOUT_SECONDS in total or BACKUP_PROCESS_STALL_SECONDS
+    # without producing output, log lines or (directory format) files;
+    # 0 turns a limit off. SIGKILL follows SIGTERM after the grace period.
+    BACKUP_PROCESS_TIMEOUT_SECONDS: int = 6 * 60 * 60
+    BACKUP_PROCESS_STALL_SECONDS: int = 30 * 60
+    BACKUP_PROCESS_KILL_GRACE_SECONDS: float = 10
+    # Running jobs check whether POST /history/{id}/cancel was called this often
+    BACKUP_CANCEL_POLL_SECONDS: float = 2
+
+    # Restores: MSSQL scripts are replayed this many statements (each up to
+    # MSSQL_INSERT_BATCH_ROWS rows) per round trip, committing every
+    # MSSQL_RESTORE_COMMIT_STATEMENTS. Postgres restores use the target
+    # connection's parallel_jobs for pg_restore --jobs.
+    MSSQL_RESTORE_BATCH_STATEMENTS: int = 20
+    MSSQL_RESTORE_COMMIT_STATEMENTS: int = 200
+    # Where remote dumps are downloaded / directory archives unpacked for
+    # pg_restore (default: the system temp dir)
+    RESTORE_SCRATCH_DIR: Optional[str] = None
+
+    # Object storage uploads: multipart part size and parts uploaded at once.
+    # Upload memory per backup is roughly part size * (concurrency + 1).
+    STORAGE_PART_SIZE_MB: int = 16
+    STORAGE_UPLOAD_CONCURRENCY: int = 4
+    # Key prefix ("folder") for backups in S3/GCS buckets
+    STORAGE_KEY_PREFIX: str = "backups"
+
+    # Deduplicated storage: backups are cut into content-defined chunks
+    # (FastCDC) and each chunk is stored once per storage target, under
+    # chunks/; a backup is a manifest listing its chunks. Formats that
+    # compress per table or per segment (custom/directory dumps, MSSQL
+    # exports) or are not compressed dedupe well; a plain dump compressed
+    # as one stream only shares the chunks before its first change.
+    # `pip install fastcdc` for the compiled chunker (the built-in one is
+    # pure Python, a few MB/s)
+    BACKUP_DEDUP_ENABLED: bool = False
+    BACKUP_DEDUP_MIN_CHUNK_KB: int = 256
+    BACKUP_DEDUP_AVG_CHUNK_KB: int = 1024
+    BACKUP_DEDUP_MAX_CHUNK_KB: int = 4096
+    # Chunks are looked up and recorded in batches of about this size (two
+    # metadata-DB transactions per batch); memory per backup is roughly
+    # batch size * (STORAGE_UPLOAD_CONCURRENCY + 1)
+    BACKUP_DEDUP_BATCH_MB: int = 16
+    # Chunks no backup refers to are deleted by the retention pass once
+    # unused for this long (must exceed the longest backup run)
+    BACKUP_DEDUP_GC_GRACE_HOURS: int = 48
+
+    # Schedules with encryption_enabled store their backups AES-256-GCM
+    # encrypted (a key per file, derived from ENCRYPTION_KEY), sealed in
+    # segments of this many bytes; ranged downloads decrypt whole segments.
+    # Encrypted backups are not deduplicated
+    BACKUP_ENCRYPTION_SEGMENT_KB: int = 1024
+
+    # Optional second digest computed alongside SHA-256 while the backup is
+    # written, e.g. "blake2b" or "xxh3_128" (needs the xxhash package)
+    BACKUP_SECONDARY_DIGEST: Optional[str] = None
+    # Per-table digest stored in backup_table_stats (same names as above);
+    # unset to skip hashing table data
+    BACKUP_TABLE_DIGEST: Optional[str] = "sha256"
+
     # CORS
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
 
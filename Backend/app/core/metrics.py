@@ -0,0 +1,149 @@
+"""
+Prometheus metrics for jobs, backup phases (see PhaseTimer) and the DB pool.
+
+Backups run in worker processes (the local process pool or Celery's
+prefork children), so counters are kept in prometheus_client's
+multiprocess mode: every process writes to files under
+PROMETHEUS_MULTIPROC_DIR and /metrics aggregates them. When the variable
+is not set, a fresh directory is created here, before prometheus_client
+is imported, and inherited by the spawned/forked workers. With several
+API processes (uvicorn --workers N) set it yourself to one shared, empty
+directory so they all report the same totals.
+"""
+import os
+import tempfile
+from typing import Optional
+
+from app.core.config import settings
+from app.core.timing import PhaseTimer
+
+if settings.METRICS_ENABLED and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="dbbackup-metrics-")
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess, start_http_server
+)
+from prometheus_client.core import GaugeMetricFamily  # noqa: E402
+
+# Backups run from seconds to hours
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400, 43200)
+PHASE_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600, 14400)
+
+JOBS = Counter(
+    "dbbackup_jobs_total", "Finished jobs", ["kind", "engine", "status"]
+)
+FAILURES = Counter(
+    "dbbackup_job_failures_total", "Failed jobs by the phase they failed in", ["kind", "engine", "phase"]
+)
+JOB_DURATION = Histogram(
+    "dbbackup_job_duration_seconds", "Job run time, claim to finish", ["kind", "engine"],
+    buckets=DURATION_BUCKETS
+)
+QUEUE_WAIT = Histogram(
+    "dbbackup_queue_wait_seconds", "Time from queueing to a worker claiming the job", ["kind"],
+    buckets=DURATION_BUCKETS
+)
+PHASE_DURATION = Histogram(
+    "dbbackup_backup_phase_duration_seconds", "Time one backup spent in each phase", ["engine", "phase"],
+    buckets=PHASE_BUCKETS
+)
+BACKUP_BYTES = Counter(
+    "dbbackup_backup_bytes_total",
+    "Backup bytes: stored (after compression), uncompressed, and deduplicated (stored bytes that were "
+    "already in the chunk store)",
+    ["engine", "stage"]
+)
+BACKUP_ROWS = Counter(
+    "dbbackup_backup_rows_total", "Rows exported by backups", ["engine"]
+)
+
+
+def engine_label(db_type: Optional[str]) -> str:
+    return "postgresql" if "postgres" in str(db_type or "").lower() else "mssql"
+
+
+def record_job(kind: str, engine: str, status: str, duration: Optional[float] = None,
+               queue_wait: Optional[float] = None, failed_phase: Optional[str] = None):
+    if not settings.METRICS_ENABLED:
+        return
+    try:
+        JOBS.labels(kind, engine, status).inc()
+        if duration is not None:
+            JOB_DURATION.labels(kind, engine).observe(duration)
+        if queue_wait is not None:
+            QUEUE_WAIT.labels(kind).observe(max(queue_wait, 0))
+        if status == "failed":
+            FAILURES.labels(kind, engine, failed_phase or "unknown").inc()
+    except Exception as e:
+        print(f"!!! Could not record metrics: {e} !!!")
+
+
+def record_backup(engine: str, timer: PhaseTimer, bytes_stored: Optional[int] = None,
+                  bytes_uncompressed: Optional[int] = None, rows: Optional[int] = None,
+                  bytes_deduplicated: Optional[int] = None):
+    """
+    Per-backup totals, observed once when the job ends rather than per chunk.
+    """
+    if not settings.METRICS_ENABLED:
+        return
+    try:
+        for phase, seconds in timer.as_dict().items():
+            PHASE_DURATION.labels(engine, phase).observe(seconds)
+        if bytes_stored:
+            BACKUP_BYTES.labels(engine, "stored").inc(bytes_stored)
+        if bytes_uncompressed:
+            BACKUP_BYTES.labels(engine, "uncompressed").inc(bytes_uncompressed)
+        if rows:
+            BACKUP_ROWS.labels(engine).inc(rows)
+        if bytes_deduplicated:
+            BACKUP_BYTES.labels(engine, "deduplicated").inc(bytes_deduplicated)
+    except Exception as e:
+        print(f"!!! Could not record metrics: {e} !!!")
+
+
+class DBPoolCollector:
+    """
+    Live SQLAlchemy pool usage of the process serving /metrics, per engine
+    ({"sync": engine, "async": async_engine.sync_engine}). A NullPool
+    (DATABASE_PGBOUNCER) has nothing to report.
+    """
+
+    def __init__(self, engines: dict):
+        self.engines = engines
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "dbbackup_db_pool_connections", "Metadata DB pool connections by state",
+            labels=["pool", "state"]
+        )
+        for name, engine in self.engines.items():
+            for state in ("size", "checkedin", "checkedout", "overflow"):
+                reader = getattr(engine.pool, state, None)
+                if reader is not None:
+                    # QueuePool.overflow() counts up from -size until the pool is full
+                    gauge.add_metric([name, state], max(reader(), 0))
+        yield gauge
+
+
+def _registry(db_engines: dict = None) -> CollectorRegistry:
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    if db_engines:
+        registry.register(DBPoolCollector(db_engines))
+    return registry
+
+
+def render(db_engines: dict = None):
+    """
+    (body, content type) for a /metrics response.
+    """
+    return generate_latest(_registry(db_engines)), CONTENT_TYPE_LATEST
+
+
+def start_exporter(port: int):
+    """
+    Standalone /metrics listener, for Celery workers on hosts the API's
+    /metrics can't see.
+    """
+    start_http_server(port, registry=_registry())
+    print(f"--- METRICS EXPORTER LISTENING ON :{port} ---")
@@ -1,15 +1,11 @@
-import base64
-import os
 from datetime import datetime, timedelta
 from typing import Any, Union
 
-from jose import jwt
+from jose import jwt, JWTError
 from passlib.context import CryptContext
-from Crypto.Cipher import AES
-from Crypto.Protocol.KDF import PBKDF2
-from Crypto.Hash import SHA256
 
 from app.core.config import settings
+from app.services import crypto_service
 
 # --- MODERN PASSWD CONTEXT FIX ---
 # We explicitly set the bcrypt 'ident' and handle potential errors
@@ -21,16 +17,40 @@ pwd_context = CryptContext(
 
 # --- JWT Logic ---
 
+# Access tokens carry no scope; scoped tokens are only valid for their own endpoint
+DOWNLOAD_SCOPE = "download"
+
 def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode = {"exp": expire, "sub": str(subject)}
+    # iat lets a user revoke every token issued before a point in time
+    to_encode = {"exp": expire, "iat": datetime.utcnow(), "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def create_download_token(history_id: Union[str, Any], user_id: Union[str, Any], expires_delta: timedelta = None) -> str:
+    """
+    Short-lived token that authorizes downloading one backup, so download
+    managers can issue many range requests without the user's bearer token.
+    """
+    expire = datetime.utcnow() + (expires_delta or timedelta(seconds=settings.DOWNLOAD_TOKEN_EXPIRE_SECONDS))
+    # iat: a logout-all revokes links already handed out, like access tokens
+    to_encode = {"exp": expire, "iat": datetime.utcnow(), "sub": str(history_id), "uid": str(user_id), "scope": DOWNLOAD_SCOPE}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def decode_download_token(token: str) -> dict:
+    """
+    Claims of a valid download token; raises JWTError if it is expired,
+    forged, or not a download token.
+    """
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    if payload.get("scope") != DOWNLOAD_SCOPE:
+        raise JWTError("Not a download token")
+    return payload
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     # Bcrypt limit check: if someone enters a password > 72 chars, 
     # we use the first 72 to stay compatible with the algorithm
@@ -41,36 +61,9 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password[:72])
 
 # --- AES-GCM Encryption (Compatible with Supabase Deno Function) ---
+# Kept for existing callers; the implementation (and its key cache) lives
+# in app.services.crypto_service.
 
-def get_encryption_key():
-    salt = b"pg-backup-salt"
-    # settings.ENCRYPTION_KEY should be a string from .env
-    key_material = settings.ENCRYPTION_KEY.encode('utf-8')
-    return PBKDF2(
-        key_material, 
-        salt, 
-        dkLen=32, 
-        count=100000, 
-        hmac_hash_module=SHA256
-    )
-
-def encrypt_data(plaintext: str) -> str:
-    key = get_encryption_key()
-    nonce = os.urandom(12)
-    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
-    ciphertext, tag = cipher.encrypt_and_digest(plaintext.encode('utf-8'))
-    
-    combined = nonce + ciphertext + tag
-    return base64.b64encode(combined).decode('utf-8')
-
-def decrypt_data(base64_ciphertext: str) -> str:
-    key = get_encryption_key()
-    data = base64.b64decode(base64_ciphertext)
-    
-    nonce = data[:12]
-    tag = data[-16:]
-    ciphertext = data[12:-16]
-    
-    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
-    decrypted = cipher.decrypt_and_verify(ciphertext, tag)
-    return decrypted.decode('utf-8')
\ No newline at end of file
+get_encryption_key = crypto_service.get_derived_key
+encrypt_data = crypto_service.encrypt
+decrypt_data = crypto_service.decrypt
@@ -0,0 +1,55 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PhaseTimer:
+    """
+    Accumulates wall time per named phase of one job:
+
+        with timer.phase("fetch"):
+            rows = cursor.fetchmany(n)
+
+    Phases are exclusive: entering a nested phase pauses the enclosing one,
+    so the totals add up to the job's run time instead of double counting
+    (e.g. "compress" inside "write"). Thread-safe; the parallel exporter's
+    threads add up, so phases can exceed the wall clock there. A couple of
+    perf_counter() calls per chunk, so cheap enough to leave on.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.failed_phase = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def phase(self, name: str):
+        stack = self._local.__dict__.setdefault("stack", [])
+        now = time.perf_counter()
+        if stack:
+            parent, started = stack[-1]
+            self._add(parent, now - started)
+        stack.append((name, now))
+        try:
+            yield
+        except BaseException:
+            if self.failed_phase is None:
+                self.failed_phase = name
+            raise
+        finally:
+            now = time.perf_counter()
+            self._add(name, now - stack.pop()[1])
+            if stack:
+                stack[-1] = (stack[-1][0], now)
+
+    def add(self, name: str, seconds: float):
+        self._add(name, seconds)
+
+    def _add(self, name: str, seconds: float):
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {name: round(seconds, 3) for name, seconds in self.totals.items()}
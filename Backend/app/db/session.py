@@ -1,22 +1,70 @@
+from uuid import uuid4
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from typing import Generator
+from sqlalchemy.pool import NullPool
+from typing import AsyncGenerator, Generator
 
 from app.core.config import settings
 
-# pool_pre_ping=True is highly recommended for Supabase/Cloud DBs 
-# to automatically reconnect if the connection times out.
-engine = create_engine(
-    settings.DATABASE_URL, 
-    pool_pre_ping=True,
-    # If using Supabase transaction bouncer (port 6543), 
-    # keep the pool size small or managed.
-    pool_size=5,
-    max_overflow=10
-)
+def _pool_options() -> dict:
+    if settings.DATABASE_PGBOUNCER:
+        # Supabase transaction bouncer (port 6543): it does the pooling, and a
+        # connection held here would pin one of its server connections
+        return {"poolclass": NullPool}
+    # pool_pre_ping=True is highly recommended for Supabase/Cloud DBs
+    # to automatically reconnect if the connection times out.
+    return {
+        "pool_pre_ping": True,
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE_SECONDS,
+    }
+
+def async_database_url(url: str):
+    """
+    The async-driver form of a sync DATABASE_URL.
+    """
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        query = dict(url.query)
+        # asyncpg takes libpq's sslmode as "ssl"
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return url.set(drivername="postgresql+asyncpg", query=query)
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    return url
+
+def _async_connect_args(url) -> dict:
+    if not (settings.DATABASE_PGBOUNCER and url.get_driver_name() == "asyncpg"):
+        return {}
+    # A transaction-mode bouncer may hand each transaction another server
+    # connection, where a cached prepared statement doesn't exist (or a
+    # different one has the same name)
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+# Workers, scheduler and retention threads
+engine = create_engine(settings.DATABASE_URL, **_pool_options())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# API request handlers: they run on the event loop, so they must not block it
+_async_url = make_url(settings.ASYNC_DATABASE_URL) if settings.ASYNC_DATABASE_URL else async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(_async_url, connect_args=_async_connect_args(_async_url), **_pool_options())
+
+# expire_on_commit=False: attributes stay readable after commit without
+# another (implicit, impossible in async) load
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db() -> Generator:
@@ -28,4 +76,11 @@ def get_db() -> Generator:
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async counterpart of get_db, used by the API routers.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
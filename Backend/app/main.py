@@ -37,15 +37,46 @@
 #     return {"message": "Welcome to PG Backup Pro API", "docs": "/docs"}
 
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.api import api_router
+from app.core import metrics
 from app.core.config import settings
 from app.db import base 
+from app.db.session import async_engine, engine
+from app.worker.key_rotation import run_key_rotation
+from app.worker.queue import recover_pending_jobs, shutdown_queue
+from app.worker.retention import start_retention_thread
+from app.worker.scheduler import start_scheduler_thread
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Jobs still pending (or orphaned mid-run) when the last process stopped
+    try:
+        recover_pending_jobs()
+    except Exception as e:
+        print(f"!!! Could not recover queued backups: {e} !!!")
+    # Credentials still under a retired key (ENCRYPTION_KEY_ID changed)
+    try:
+        run_key_rotation()
+    except Exception as e:
+        print(f"!!! Could not re-encrypt stored credentials: {e} !!!")
+    if settings.SCHEDULER_ENABLED:
+        start_scheduler_thread()
+        if settings.RETENTION_ENABLED:
+            start_retention_thread()
+    try:
+        yield
+    finally:
+        shutdown_queue()
+        await async_engine.dispose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # CORS matches your frontend port 8080
@@ -60,13 +91,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "mode": "BackgroundTasks"}
+    return {"status": "healthy", "mode": settings.JOB_QUEUE_BACKEND}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    body, content_type = metrics.render({"sync": engine, "async": async_engine.sync_engine})
+    return Response(content=body, media_type=content_type)
 
 @app.get("/")
 def read_root():
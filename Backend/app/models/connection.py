@@ -31,6 +31,10 @@ class DatabaseConnection(Base):
     # 2. FIXED THIS LINE: Changed enum.Enum(DBType) to Enum(DBType)
     db_type = Column(Enum(DBType), default=DBType.postgresql, nullable=False)
 
+    # Max concurrent export workers/connections against this server.
+    # Keep at 1 for shared hosts with Query Governor or login limits.
+    parallel_jobs = Column(Integer, default=1, server_default="1", nullable=False)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
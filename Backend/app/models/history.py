@@ -1,6 +1,6 @@
 import uuid
 import enum
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Enum, BigInteger
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Enum, BigInteger, Float, Index, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -30,7 +30,11 @@ class BackupHistory(Base):
     file_path = Column(Text)
     file_size_bytes = Column(BigInteger)
     checksum = Column(Text)
+    secondary_checksum = Column(Text)  # "<algorithm>:<hex>", see BACKUP_SECONDARY_DIGEST
     compression_enabled = Column(Boolean, default=False)
+    compression_codec = Column(Text)
+    compression_ratio = Column(Float)
+    uncompressed_size_bytes = Column(BigInteger)
     encryption_enabled = Column(Boolean, default=False)
     
     started_at = Column(DateTime(timezone=True))
@@ -38,8 +42,42 @@ class BackupHistory(Base):
     error_message = Column(Text)
     tables_backed_up = Column(Integer)
     retry_count = Column(Integer, default=0)
+    # Set by POST /history/{id}/cancel; the running worker polls it and stops
+    cancel_requested_at = Column(DateTime(timezone=True))
+
+    # Last progress snapshot of a running job, written at most every PROGRESS_DB_WRITE_SECONDS
+    progress_table = Column(Text)
+    progress_rows = Column(BigInteger)
+    progress_bytes = Column(BigInteger)
+    progress_percent = Column(Float)
+    progress_eta_seconds = Column(Integer)
+    progress_updated_at = Column(DateTime(timezone=True))
+    # Seconds per phase ("connect", "fetch", "encode", "compress", "store", "queue_wait", ...)
+    phase_timings = Column(JSON)
+    # Resumable MSSQL export state while the job runs, see ExportCheckpoint
+    checkpoint = Column(JSON)
+    # Incremental chains: the backup this one applies on top of and the
+    # chain's full base (both NULL on the base itself)
+    parent_backup_id = Column(UUID(as_uuid=True), ForeignKey("backup_history.id", ondelete="SET NULL"))
+    base_backup_id = Column(UUID(as_uuid=True), ForeignKey("backup_history.id", ondelete="SET NULL"))
+    # {"base_backup_id", "parent_backup_id", "sequence", "change_state", "changes"}
+    chain_manifest = Column(JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # History list: WHERE user_id = ? ORDER BY created_at DESC, id DESC (keyset pages)
+        Index("idx_backup_history_user_created", user_id, created_at.desc(), id.desc()),
+        # History filters by connection / status, and the retention window of
+        # completed backups (ROW_NUMBER over user/connection ORDER BY
+        # created_at DESC, id DESC WHERE status = 'completed')
+        Index(
+            "idx_backup_history_user_connection_status_created",
+            user_id, connection_id, status, created_at.desc(), id.desc()
+        ),
+        # Chain lookups: does any backup still build on this one?
+        Index("idx_backup_history_parent", parent_backup_id),
+    )
+
 class RestoreHistory(Base):
     __tablename__ = "restore_history"
 
@@ -49,9 +87,85 @@ class RestoreHistory(Base):
     connection_id = Column(UUID(as_uuid=True), ForeignKey("database_connections.id", ondelete="SET NULL"))
     
     status = Column(Enum(BackupStatus), default=BackupStatus.pending, nullable=False)
+    clean_target = Column(Boolean, default=False)  # drop/empty existing objects first
+    parallel_jobs = Column(Integer)  # pg_restore --jobs actually used
     started_at = Column(DateTime(timezone=True))
     completed_at = Column(DateTime(timezone=True))
     error_message = Column(Text)
+    retry_count = Column(Integer, default=0)
+
+    # Throughput of the finished restore
+    bytes_restored = Column(BigInteger)  # stored (compressed) bytes read
+    rows_restored = Column(BigInteger)  # MSSQL replay only
+    tables_restored = Column(Integer)
+    duration_seconds = Column(Float)
+    throughput_bytes_per_sec = Column(Float)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-# REMOVED THE NOTIFICATION CLASS FROM HERE
\ No newline at end of file
+    __table_args__ = (
+        Index("idx_restore_history_user_created", user_id, created_at.desc()),
+    )
+
+class BackupTableStat(Base):
+    """
+    One row per table per backup, bulk-inserted when the job completes.
+    """
+    __tablename__ = "backup_table_stats"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    backup_id = Column(UUID(as_uuid=True), ForeignKey("backup_history.id", ondelete="CASCADE"), nullable=False)
+    table_name = Column(Text, nullable=False)  # "schema.table"
+    row_count = Column(BigInteger)
+    bytes = Column(BigInteger)  # uncompressed script/COPY bytes, or on-disk size when estimated
+    duration_seconds = Column(Float)
+    checksum = Column(Text)  # "<algorithm>:<hex>" of the table's data, see BACKUP_TABLE_DIGEST
+    is_estimate = Column(Boolean, default=False)  # catalog statistics, not counted from the dump
+
+    __table_args__ = (
+        Index("idx_backup_table_stats_backup", backup_id),
+        Index("idx_backup_table_stats_table_backup", table_name, backup_id),
+    )
+
+# REMOVED THE NOTIFICATION CLASS FROM HERE
+class BackupChunk(Base):
+    """
+    One stored chunk of deduplicated backups (see ChunkStoreWriter), shared
+    by every backup whose manifest lists it. The same content can be stored
+    twice (two backups adding it at once, or a copy re-added while the old
+    one is being collected); each copy is its own object and row.
+    """
+    __tablename__ = "backup_chunks"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # NULL = the worker's local backup folder
+    storage_id = Column(UUID(as_uuid=True), ForeignKey("storage_configurations.id", ondelete="CASCADE"))
+    digest = Column(Text, nullable=False)  # SHA-256 of the chunk
+    size = Column(BigInteger, nullable=False)
+    location = Column(Text, nullable=False)
+    deleting = Column(Boolean, default=False, nullable=False)  # claimed by garbage collection
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Touched whenever a backup reuses the chunk; collection waits BACKUP_DEDUP_GC_GRACE_HOURS after it
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_backup_chunks_storage_digest", storage_id, digest),
+        Index("idx_backup_chunks_last_used", last_used_at),
+    )
+
+class BackupChunkRef(Base):
+    """
+    A deduplicated backup's manifest: its chunks in order, bulk-inserted
+    when the job completes. Deleting the backup drops them; chunks nothing
+    refers to any more are collected by retention.
+    """
+    __tablename__ = "backup_chunk_refs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    backup_id = Column(UUID(as_uuid=True), ForeignKey("backup_history.id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    chunk_id = Column(UUID(as_uuid=True), ForeignKey("backup_chunks.id", ondelete="CASCADE"), nullable=False)
+
+    __table_args__ = (
+        Index("idx_backup_chunk_refs_backup_seq", backup_id, seq),
+        Index("idx_backup_chunk_refs_chunk", chunk_id),
+    )
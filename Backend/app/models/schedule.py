@@ -1,6 +1,6 @@
 import uuid
 import enum
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Enum, ARRAY
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Enum, ARRAY, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -18,11 +18,13 @@ class BackupType(str, enum.Enum):
     full = "full"
     schema = "schema"
     tables = "tables"
+    incremental = "incremental"  # SQL Server only: changes since the previous backup, see IncrementalService
 
 class BackupFormat(str, enum.Enum):
     sql = "sql"
     dump = "dump"
     backup = "backup"
+    directory = "directory"
 
 class BackupSchedule(Base):
     __tablename__ = "backup_schedules"
@@ -39,11 +41,21 @@ class BackupSchedule(Base):
     backup_format = Column(Enum(BackupFormat), default=BackupFormat.sql, nullable=False)
     
     compression_enabled = Column(Boolean, default=True)
+    compression_codec = Column(Text, default="gzip")  # gzip | zstd | lz4
+    compression_level = Column(Integer)  # None = codec default
     encryption_enabled = Column(Boolean, default=False)
+    # Table filters, see TableFilter: "schema.table" or "table" entries,
+    # "*" and "?" wildcards
     selected_schemas = Column(ARRAY(Text))
     selected_tables = Column(ARRAY(Text))
+    excluded_schemas = Column(ARRAY(Text))
+    excluded_tables = Column(ARRAY(Text))
+    # Definition only, no rows (big log/audit tables)
+    schema_only_tables = Column(ARRAY(Text))
     retention_days = Column(Integer, default=30)
     max_backups = Column(Integer, default=10)
+    # Overrides DatabaseConnection.parallel_jobs for this schedule's runs
+    parallel_jobs = Column(Integer)
     is_active = Column(Boolean, default=True)
     
     next_run_at = Column(DateTime(timezone=True))
@@ -51,4 +63,13 @@ class BackupSchedule(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
-    connection = relationship("DatabaseConnection", back_populates="schedules")
\ No newline at end of file
+    connection = relationship("DatabaseConnection", back_populates="schedules")
+
+    __table_args__ = (
+        # Scheduler tick: is_active AND next_run_at <= now ORDER BY next_run_at
+        Index(
+            "ix_backup_schedules_due", "next_run_at",
+            postgresql_where=(is_active.is_(True)),
+            sqlite_where=(is_active.is_(True))
+        ),
+    )
\ No newline at end of file
@@ -27,6 +27,7 @@ class BackupFormat(str, enum.Enum):
     sql = "sql"
     dump = "dump"
     backup = "backup"
+    directory = "directory"
 
 class ScheduleFrequency(str, enum.Enum):
     manual = "manual"
@@ -43,6 +44,8 @@ class User(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    # Access tokens issued (iat) before this are rejected, see /auth/logout-all
+    tokens_valid_after = Column(DateTime(timezone=True))
     
     profile = relationship("Profile", back_populates="user", uselist=False)
     roles = relationship("UserRole", back_populates="user")
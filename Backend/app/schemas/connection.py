@@ -1,5 +1,5 @@
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
 from app.models.connection import DBType 
@@ -12,6 +12,7 @@ class ConnectionBase(BaseModel):
     username: str
     ssl_mode: Optional[str] = "require"
     db_type: DBType = DBType.postgresql 
+    parallel_jobs: int = Field(1, ge=1, le=16)
 
 class ConnectionCreate(ConnectionBase):
     password: str 
@@ -26,6 +27,7 @@ class ConnectionUpdate(BaseModel):
     ssl_mode: Optional[str] = None
     is_active: Optional[bool] = None
     db_type: Optional[DBType] = None 
+    parallel_jobs: Optional[int] = Field(None, ge=1, le=16)
 
 class ConnectionTest(ConnectionBase):
     password: str
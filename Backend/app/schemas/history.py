@@ -1,5 +1,5 @@
-from typing import Optional
-from pydantic import BaseModel
+from typing import Dict, Optional
+from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
 from app.models.history import BackupStatus
@@ -23,16 +23,99 @@ class History(HistoryBase):
     file_path: Optional[str] = None
     file_size_bytes: Optional[int] = None
     checksum: Optional[str] = None
+    secondary_checksum: Optional[str] = None
+    compression_codec: Optional[str] = None
+    compression_ratio: Optional[float] = None
+    uncompressed_size_bytes: Optional[int] = None
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
     tables_backed_up: Optional[int] = None
+    retry_count: Optional[int] = None
+    cancel_requested_at: Optional[datetime] = None
+    progress_table: Optional[str] = None
+    progress_rows: Optional[int] = None
+    progress_bytes: Optional[int] = None
+    progress_percent: Optional[float] = None
+    progress_eta_seconds: Optional[int] = None
+    progress_updated_at: Optional[datetime] = None
+    phase_timings: Optional[Dict[str, float]] = None
+    parent_backup_id: Optional[UUID] = None
+    base_backup_id: Optional[UUID] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class HistoryListItem(HistoryBase):
+    """
+    Projection served by the paginated history list.
+    """
+    id: UUID
+    user_id: UUID
+    connection_id: Optional[UUID]
+    schedule_id: Optional[UUID]
+    connection_name: Optional[str] = None
+    user_email: Optional[str] = None
+    file_name: Optional[str] = None
+    file_size_bytes: Optional[int] = None
+    compression_codec: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    error_message: Optional[str] = None
+    tables_backed_up: Optional[int] = None
+    progress_percent: Optional[float] = None
+    progress_eta_seconds: Optional[int] = None
+    created_at: datetime
+
+class TableStat(BaseModel):
+    table_name: str
+    row_count: Optional[int] = None
+    bytes: Optional[int] = None
+    duration_seconds: Optional[float] = None
+    checksum: Optional[str] = None
+    is_estimate: bool = False
+
+    class Config:
+        from_attributes = True
+
+class TableStatPoint(TableStat):
+    """
+    One backup's figures for a table, for growth/duration trends.
+    """
+    backup_id: UUID
+    created_at: datetime
+
 class HistoryDownload(BaseModel):
     download_url: str
     file_name: str
-    expires_in: int
\ No newline at end of file
+    expires_in: int
+
+class RestoreCreate(BaseModel):
+    backup_id: UUID
+    # Target database; defaults to the connection the backup was taken from
+    connection_id: Optional[UUID] = None
+    clean: bool = False
+    # pg_restore --jobs; defaults to the target connection's parallel_jobs
+    parallel_jobs: Optional[int] = Field(None, ge=1, le=16)
+
+class Restore(BaseModel):
+    id: UUID
+    user_id: UUID
+    backup_id: Optional[UUID]
+    connection_id: Optional[UUID]
+    status: BackupStatus
+    clean_target: Optional[bool] = None
+    parallel_jobs: Optional[int] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    error_message: Optional[str] = None
+    bytes_restored: Optional[int] = None
+    rows_restored: Optional[int] = None
+    tables_restored: Optional[int] = None
+    duration_seconds: Optional[float] = None
+    throughput_bytes_per_sec: Optional[float] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,5 @@
-from typing import Optional, List
-from pydantic import BaseModel
+from typing import Literal, Optional, List
+from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
 from app.models.schedule import ScheduleFrequency, BackupType, BackupFormat
@@ -10,12 +10,18 @@ class ScheduleBase(BaseModel):
     backup_type: BackupType
     backup_format: BackupFormat
     compression_enabled: bool = True
+    compression_codec: Literal["gzip", "zstd", "lz4"] = "gzip"
+    compression_level: Optional[int] = Field(None, ge=0, le=22)
     encryption_enabled: bool = False
     retention_days: int = 30
     max_backups: int = 10
     cron_expression: Optional[str] = None
     selected_schemas: Optional[List[str]] = None
     selected_tables: Optional[List[str]] = None
+    excluded_schemas: Optional[List[str]] = None
+    excluded_tables: Optional[List[str]] = None
+    schema_only_tables: Optional[List[str]] = None
+    parallel_jobs: Optional[int] = Field(None, ge=1, le=16)
 
 class ScheduleCreate(ScheduleBase):
     connection_id: UUID
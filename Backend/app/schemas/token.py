@@ -7,4 +7,5 @@ class Token(BaseModel):
     token_type: str
 
 class TokenPayload(BaseModel):
-    sub: Optional[str] = None # sub is typically the user ID (UUID)
\ No newline at end of file
+    sub: Optional[str] = None # sub is typically the user ID (UUID)
+    iat: Optional[int] = None # issued at (unix time); older tokens have none
\ No newline at end of file
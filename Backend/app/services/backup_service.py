@@ -125,41 +125,144 @@
 #         return sha256_hash.hexdigest()
 
 
-import subprocess
 import os
 import hashlib
 from datetime import datetime
 import platform
+import queue
+import shutil
+import tarfile
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import psycopg2
 import pymssql 
 
+from app.core.config import settings
+from app.core.timing import PhaseTimer
+from app.services.compression_service import CompressionService
+from app.services.checkpoint_service import ExportCheckpoint, decode_key
+from app.services.incremental_service import TABLE, UNCHANGED, IncrementalService
+from app.services.mssql_scripter import MSSQLScripter, quote_ident, table_header
+from app.services.output_service import BackupOutput, new_digest
+from app.services.pg_copy_parser import CopyStatsParser
+from app.services.pg_dump_log import PgDumpLogParser
+from app.services.process_runner import ProcessRunner
+from app.services.table_filter import TableFilter
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class MSSQLConnectionPool:
+    """
+    Small fixed-size pool of pymssql connections for the parallel exporter.
+    Connections are opened lazily, so a pool of N never holds more than N
+    logins against hosts with tight connection/Query Governor limits.
+    Time spent opening or waiting for a connection is the "connect" phase.
+    """
+
+    def __init__(self, conn_details: dict, size: int, timer: PhaseTimer = None):
+        self.conn_details = conn_details
+        self.size = max(1, size)
+        self.timer = timer or PhaseTimer()
+        self._idle = queue.LifoQueue()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        with self.timer.phase("connect"):
+            conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._opened) < self.size:
+                conn = BackupService._connect_mssql(self.conn_details)
+                self._opened.append(conn)
+                return conn
+        return self._idle.get()
+
+    def close(self):
+        with self._lock:
+            for conn in self._opened:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._opened = []
+
+
 class BackupService:
     @staticmethod
     def _get_pg_dump_path():
+        return BackupService._get_pg_tool_path("pg_dump")
+
+    @staticmethod
+    def _get_pg_tool_path(tool: str = "pg_dump"):
         """
-        Helper to find the best pg_dump binary.
+        Helper to find the best pg_dump (or pg_restore/psql) binary.
         Prioritizes newer versions on macOS Homebrew.
         """
         if platform.system() == "Darwin":  # macOS
             # Common Homebrew paths for newer PostgreSQL versions
             paths = [
-                "/opt/homebrew/opt/postgresql@18/bin/pg_dump",
-                "/opt/homebrew/opt/postgresql@17/bin/pg_dump",
-                "/opt/homebrew/opt/postgresql@16/bin/pg_dump",
-                "/opt/homebrew/bin/pg_dump", # Latest symlink
-                "/usr/local/bin/pg_dump"     # Intel Mac path
+                f"/opt/homebrew/opt/postgresql@18/bin/{tool}",
+                f"/opt/homebrew/opt/postgresql@17/bin/{tool}",
+                f"/opt/homebrew/opt/postgresql@16/bin/{tool}",
+                f"/opt/homebrew/bin/{tool}", # Latest symlink
+                f"/usr/local/bin/{tool}"     # Intel Mac path
             ]
             for path in paths:
                 if os.path.exists(path):
                     return path
         
         # Fallback for Windows/Linux or if no Homebrew path found
-        return "pg_dump"
+        return tool
 
     @staticmethod
-    def run_pg_dump(conn_details: dict, output_path: str, backup_type: str, format: str):
+    def run_pg_dump(conn_details: dict, output_path: str, backup_type: str, format: str,
+                    compression: str = None, compression_level: int = None, sink=None, progress=None,
+                    timer: PhaseTimer = None, table_filter: TableFilter = None,
+                    cancel: threading.Event = None):
         """
         Executes PostgreSQL dump logic using the best available pg_dump binary.
+
+        Plain SQL is streamed from pg_dump's stdout through the compression
+        codec straight into output_path. Custom and directory formats use
+        pg_dump's own per-table compression with the same codec, so the
+        archive stays restorable by pg_restore as-is. The "directory" format
+        dumps with --jobs=N and is packaged into a single tar at output_path.
+
+        With a `sink` (StorageWriter) the artifact is streamed there instead
+        and output_path only names the local scratch space.
+
+        A `progress` (ProgressReporter) gets the bytes pg_dump has streamed.
+        Plain dumps also count COPY lines as rows against pg_class.reltuples;
+        custom archives are compressed by pg_dump, so they only report bytes.
+
+        A `timer` (PhaseTimer) records "metadata", "dump" (pg_dump itself:
+        waiting on its output), "package" for directory archives, and the
+        artifact's "compress"/"checksum"/"store".
+
+        A `table_filter` (TableFilter) narrows the dump with -t/-n/-T/-N and
+        --exclude-table-data.
+
+        pg_dump runs under ProcessRunner: setting `cancel` (or hitting
+        BACKUP_PROCESS_TIMEOUT_SECONDS / BACKUP_PROCESS_STALL_SECONDS) kills
+        it and raises. Archive formats run with --verbose, whose log tells
+        `progress` which table is being dumped.
         """
+        codec = CompressionService.validate(compression)
+        timer = timer or PhaseTimer()
         env = os.environ.copy()
         env["PGPASSWORD"] = conn_details['password']
 
@@ -176,102 +279,711 @@ class BackupService:
         # Use -w to ensure it doesn't prompt for password (uses env instead)
         cmd.append("-w")
 
+        if backup_type == "schema":
+            cmd.append("-s")
+
+        if table_filter is not None:
+            cmd.extend(table_filter.pg_dump_args())
+
+        if format in ("dump", "directory"):
+            cmd.extend(["-Z", BackupService._pg_compress_spec(codec, compression_level)])
+            # Plain dumps get their table progress from the COPY blocks, and
+            # --verbose would put timestamps into the script
+            cmd.append("--verbose")
+
+        # Plain dumps are measured table by table as they stream past; archives
+        # can't be read on the fly, so they record the catalog's estimates
+        plain = format not in ("dump", "directory")
+        catalog = []
+        if backup_type != "schema" and (not plain or progress is not None):
+            with timer.phase("metadata"):
+                catalog = BackupService._pg_table_catalog(conn_details, table_filter)
+            if progress is not None:
+                progress.set_estimates(
+                    rows_total=sum(t["row_count"] for t in catalog) if plain else None,
+                    tables_total=len(catalog)
+                )
+
+        if format == "directory":
+            out = BackupService._run_pg_dump_directory(
+                cmd, env, conn_details, output_path, sink, timer, progress, cancel
+            )
+            return BackupService._result(out, codec, table_stats=catalog)
+
         if format == "dump":
             cmd.extend(["-Fc"]) 
-        elif format == "sql":
+            stream_codec = None
+        else:
             cmd.extend(["-Fp"])
+            stream_codec = codec
 
-        if backup_type == "schema":
-            cmd.append("-s")
-            
-        with open(output_path, "wb") as f:
-            process = subprocess.run(
-                cmd, 
-                env=env, 
-                stdout=f, 
-                stderr=subprocess.PIPE, 
-                text=True
+        parser = CopyStatsParser(settings.BACKUP_TABLE_DIGEST, progress) if plain else None
+        log = PgDumpLogParser(None if plain else progress)
+
+        with BackupService._open_artifact(output_path, stream_codec, compression_level, sink, timer) as out:
+            def on_stdout(chunk: bytes):
+                out.write(chunk)
+                rows = 0
+                if parser is not None:
+                    # Row counts and table digests from the COPY stream
+                    with timer.phase("parse"):
+                        rows = parser.rows
+                        parser.feed(chunk)
+                        rows = parser.rows - rows
+                if progress is not None:
+                    progress.advance(rows, len(chunk))
+
+            # Writes nest their own phases, so "dump" is the time spent waiting on pg_dump
+            with timer.phase("dump"):
+                returncode, stderr = BackupService._run_dump_tool(cmd, env, log, cancel, on_stdout=on_stdout)
+            log.close()
+            BackupService._check_pg_dump_result(returncode, log.error_text(stderr))
+
+        # -Fc compresses inside pg_dump, so the pipeline never sees the raw size
+        bytes_in = out.bytes_in if stream_codec == codec else None
+        return BackupService._result(out, codec, bytes_in, parser.table_stats if parser else catalog)
+
+    @staticmethod
+    def _pg_compress_spec(codec: str, level: int = None) -> str:
+        """
+        Value for pg_dump -Z. gzip keeps the plain "-Z <level>" form every
+        pg_dump understands; zstd/lz4 need pg_dump 16+ ("-Z zstd:3").
+        """
+        if not codec:
+            return "0"
+        if codec == "gzip":
+            return str(level if level is not None else CompressionService.default_level(codec))
+        return codec if level is None else f"{codec}:{level}"
+
+    @staticmethod
+    def _run_dump_tool(cmd: list, env: dict, log: PgDumpLogParser, cancel: threading.Event = None,
+                       on_stdout=None, activity=None):
+        return ProcessRunner.run(
+            cmd, env, on_stdout=on_stdout, on_stderr_line=log.feed, cancel=cancel,
+            timeout=settings.BACKUP_PROCESS_TIMEOUT_SECONDS,
+            stall_timeout=settings.BACKUP_PROCESS_STALL_SECONDS,
+            activity=activity
+        )
+
+    @staticmethod
+    def _run_pg_dump_directory(cmd: list, env: dict, conn_details: dict, output_path: str, sink=None,
+                               timer: PhaseTimer = None, progress=None,
+                               cancel: threading.Event = None) -> BackupOutput:
+        """
+        pg_dump -Fd --jobs=N into a scratch directory next to output_path,
+        then tar it up so history/checksum/download see one artifact.
+        pg_dump needs jobs + 1 server connections for a parallel dump.
+        The directory's growth is the dump's byte progress, and keeps a
+        long table from looking like a stall.
+        """
+        jobs = max(1, int(conn_details.get('parallel_jobs') or 1))
+        scratch_dir = tempfile.mkdtemp(prefix=".pg_dump_", dir=os.path.dirname(output_path) or None)
+        dump_dir = os.path.join(scratch_dir, "dump")
+
+        cmd = cmd + ["-Fd", f"--jobs={jobs}", "-f", dump_dir]
+
+        timer = timer or PhaseTimer()
+        log = PgDumpLogParser(progress, parallel=jobs > 1)
+        reported = 0
+
+        def dump_bytes() -> int:
+            nonlocal reported
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(dump_dir) if entry.is_file())
+            except FileNotFoundError:
+                size = 0
+            if progress is not None and size > reported:
+                progress.advance(0, size - reported)
+                reported = size
+            return size
+
+        try:
+            with timer.phase("dump"):
+                returncode, stderr = BackupService._run_dump_tool(cmd, env, log, cancel, activity=dump_bytes)
+                log.close()
+                BackupService._check_pg_dump_result(returncode, log.error_text(stderr))
+
+            # Table files are already compressed by pg_dump; the tar is just packaging
+            with timer.phase("package"):
+                with BackupService._open_artifact(output_path, sink=sink, timer=timer) as out:
+                    with tarfile.open(fileobj=out, mode="w|") as tar:
+                        tar.add(dump_dir, arcname="dump")
+            return out
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    @staticmethod
+    def _pg_table_catalog(conn_details: dict, table_filter: TableFilter = None) -> list:
+        """
+        Per-table planner statistics (pg_class.reltuples, pg_table_size) as
+        estimated table stats, for the tables whose data the dump includes.
+        Free to read, but only as fresh as the last ANALYZE; empty when
+        unavailable.
+        """
+        try:
+            conn = psycopg2.connect(
+                host=conn_details['host'],
+                port=conn_details['port'],
+                user=conn_details['username'],
+                password=conn_details['password'],
+                dbname=conn_details['database_name'],
+                connect_timeout=15
             )
-            
-        if process.returncode != 0:
+            try:
+                with conn.cursor() as cursor:
+                    # Leaf tables only: partitioned parents hold no rows of their own
+                    cursor.execute("""
+                        SELECT n.nspname, c.relname,
+                               GREATEST(c.reltuples, 0)::bigint,
+                               pg_table_size(c.oid)
+                        FROM pg_class c
+                        JOIN pg_namespace n ON n.oid = c.relnamespace
+                        WHERE c.relkind IN ('r', 'm')
+                          AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+                          AND n.nspname NOT LIKE 'pg_toast%'
+                        ORDER BY n.nspname, c.relname
+                    """)
+                    return [
+                        {
+                            "table_name": f"{schema}.{table}",
+                            "row_count": rows,
+                            "bytes": size,
+                            "duration_seconds": None,
+                            "checksum": None,
+                            "is_estimate": True,
+                        }
+                        for schema, table, rows, size in cursor.fetchall()
+                        if table_filter is None or table_filter.includes_data(schema, table)
+                    ]
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"!!! Could not read table statistics: {e} !!!")
+            return []
+
+    @staticmethod
+    def _check_pg_dump_result(returncode: int, stderr: str):
+        if returncode != 0:
             # Check if it's still a version mismatch error to give a better hint
-            if "version mismatch" in process.stderr:
+            if "version mismatch" in stderr:
                 raise Exception(f"Postgres Version Mismatch: Your local pg_dump is too old. "
                                 f"Please run 'brew install postgresql@18' on your Mac. "
-                                f"Details: {process.stderr}")
-            raise Exception(f"pg_dump failed: {process.stderr}")
+                                f"Details: {stderr}")
+            raise Exception(f"pg_dump failed: {stderr}")
+
+    @staticmethod
+    def _connect_mssql(conn_details: dict):
+        return pymssql.connect(
+            server=conn_details['host'],
+            port=conn_details['port'],
+            user=conn_details['username'],
+            password=conn_details['password'],
+            database=conn_details['database_name'],
+            login_timeout=15
+        )
 
-        return BackupService._generate_checksum(output_path)
+    @staticmethod
+    def _list_mssql_tables(cursor, conn_details: dict, table_filter: TableFilter = None):
+        """
+        (schema, table) of every base table to script, narrowed by the
+        filter in the query itself.
+        """
+        where, params = table_filter.mssql_where() if table_filter is not None else ("", [])
+        cursor.execute(f"""
+            SELECT TABLE_SCHEMA, TABLE_NAME 
+            FROM INFORMATION_SCHEMA.TABLES 
+            WHERE TABLE_TYPE = 'BASE TABLE' AND TABLE_CATALOG = %s{where}
+            ORDER BY TABLE_SCHEMA, TABLE_NAME
+        """, tuple([conn_details['database_name']] + params))
+        return [(row[0], row[1]) for row in cursor.fetchall()]
 
     @staticmethod
-    def run_mssql_backup(conn_details: dict, output_path: str):
+    def _mssql_primary_keys(cursor) -> dict:
+        """
+        (schema, table) -> primary-key columns in key order, for keyset chunking.
+        """
+        try:
+            cursor.execute("""
+                SELECT SCHEMA_NAME(t.schema_id), t.name, c.name
+                FROM sys.tables t
+                JOIN sys.indexes i ON i.object_id = t.object_id AND i.is_primary_key = 1
+                JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+                JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+                WHERE ic.key_ordinal > 0
+                ORDER BY t.schema_id, t.name, ic.key_ordinal
+            """)
+            keys = {}
+            for schema, table, column in cursor.fetchall():
+                keys.setdefault((schema, table), []).append(column)
+            return keys
+        except Exception as e:
+            print(f"!!! Could not read primary keys, tables will be exported whole: {e} !!!")
+            return {}
+
+    @staticmethod
+    def _mssql_insertable_columns(cursor) -> dict:
+        """
+        (schema, table) -> the columns an INSERT may name, for tables with
+        rowversion or computed columns (SQL Server rejects explicit values
+        for those). Other tables are scripted with every column.
+        """
+        try:
+            cursor.execute("""
+                SELECT SCHEMA_NAME(t.schema_id), t.name, c.name,
+                       CASE WHEN c.is_computed = 1 OR c.system_type_id = 189 THEN 0 ELSE 1 END
+                FROM sys.tables t
+                JOIN sys.columns c ON c.object_id = t.object_id
+                WHERE t.object_id IN (
+                    SELECT object_id FROM sys.columns WHERE is_computed = 1 OR system_type_id = 189
+                )
+                ORDER BY t.schema_id, t.name, c.column_id
+            """)
+            columns = {}
+            for schema, table, column, insertable in cursor.fetchall():
+                names = columns.setdefault((schema, table), [])
+                if insertable:
+                    names.append(column)
+            return columns
+        except Exception as e:
+            print(f"!!! Could not read computed/rowversion columns: {e} !!!")
+            return {}
+
+    @staticmethod
+    def _estimate_mssql_rows(cursor, tables: list = None):
+        """
+        Row counts from sys.partitions (heap or clustered index only), the
+        metadata SSMS shows: no table scans. Summed over `tables` ((schema,
+        table) pairs) when given. None when unavailable.
+        """
+        try:
+            cursor.execute("""
+                SELECT SCHEMA_NAME(t.schema_id), t.name, SUM(p.rows)
+                FROM sys.partitions p
+                JOIN sys.tables t ON t.object_id = p.object_id
+                WHERE p.index_id IN (0, 1) AND t.is_ms_shipped = 0
+                GROUP BY t.schema_id, t.name
+            """)
+            wanted = set(tables) if tables is not None else None
+            total = sum(
+                int(rows or 0) for schema, table, rows in cursor.fetchall()
+                if wanted is None or (schema, table) in wanted
+            )
+            return total or None
+        except Exception as e:
+            print(f"!!! Could not estimate row count: {e} !!!")
+            return None
+
+    @staticmethod
+    def _write_mssql_header(f, conn_details: dict):
+        f.write(f"-- SQL Server Lightweight Backup\n")
+        f.write(f"-- Database: {conn_details['database_name']}\n")
+        f.write(f"-- Generated: {datetime.now()}\n\n")
+
+    @staticmethod
+    def run_mssql_backup(conn_details: dict, output_path: str, batch_size: int = None,
+                         compression: str = None, compression_level: int = None, sink=None, progress=None,
+                         timer: PhaseTimer = None, table_filter: TableFilter = None,
+                         checkpoint: ExportCheckpoint = None, track_changes: bool = False):
         """
         Lightweight SQL Server Backup for Shared Hosting (Site4Now).
         Bypasses 'Query Governor' cost limits by manually scripting data.
+        Rows are streamed in chunks of `batch_size` (MSSQL_FETCH_BATCH_SIZE by default)
+        through the compression codec into output_path.
+        Connections with parallel_jobs > 1 export several tables at once.
+        With a `sink` (StorageWriter) the script is streamed there instead.
+        A `progress` (ProgressReporter) follows tables and rows against the
+        sys.partitions row counts; a `timer` (PhaseTimer) records "connect",
+        "metadata", the scripter's phases and the artifact's. A `table_filter`
+        (TableFilter) picks the tables; schema-only ones are skipped, as the
+        script holds data only. With a `checkpoint` (ExportCheckpoint) the
+        export is resumable, see _run_mssql_segmented. With `track_changes`
+        the tables' change state is captured first and returned as
+        "change_state", making this the base of an incremental chain.
         """
+        batch_size = batch_size or settings.MSSQL_FETCH_BATCH_SIZE
+        timer = timer or PhaseTimer()
+        jobs = max(1, int(conn_details.get('parallel_jobs') or 1))
         try:
-            conn = pymssql.connect(
-                server=conn_details['host'],
-                port=conn_details['port'],
-                user=conn_details['username'],
-                password=conn_details['password'],
-                database=conn_details['database_name'],
-                login_timeout=15
-            )
-            cursor = conn.cursor(as_dict=True)
-
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(f"-- SQL Server Lightweight Backup\n")
-                f.write(f"-- Database: {conn_details['database_name']}\n")
-                f.write(f"-- Generated: {datetime.now()}\n\n")
-
-                cursor.execute("""
-                    SELECT TABLE_NAME 
-                    FROM INFORMATION_SCHEMA.TABLES 
-                    WHERE TABLE_TYPE = 'BASE TABLE' AND TABLE_CATALOG = %s
-                """, (conn_details['database_name'],))
-                
-                tables = [row['TABLE_NAME'] for row in cursor.fetchall()]
+            codec = CompressionService.validate(compression)
+            if jobs > 1 or checkpoint is not None:
+                return BackupService._run_mssql_segmented(
+                    conn_details, output_path, batch_size, jobs, codec, compression_level, sink, progress, timer,
+                    table_filter, checkpoint, track_changes
+                )
 
-                for table in tables:
-                    print(f"DEBUG: Scripting table: {table}")
-                    f.write(f"\n-- Data for table: {table}\n")
-                    
-                    cursor.execute(f"SELECT * FROM [{table}]")
-                    rows = cursor.fetchall()
-                    
-                    if not rows:
-                        continue
+            with timer.phase("connect"):
+                conn = BackupService._connect_mssql(conn_details)
+            cursor = conn.cursor()
 
-                    columns = rows[0].keys()
-                    col_names = ", ".join([f"[{c}]" for c in columns])
-                    
-                    for row in rows:
-                        values = []
-                        for col in columns:
-                            val = row[col]
-                            if val is None:
-                                values.append("NULL")
-                            elif isinstance(val, (int, float, bool)):
-                                values.append(str(int(val) if isinstance(val, bool) else val))
-                            else:
-                                clean_val = str(val).replace("'", "''")
-                                values.append(f"N'{clean_val}'")
-                        
-                        f.write(f"INSERT INTO [{table}] ({col_names}) VALUES ({', '.join(values)});\n")
+            with BackupService._open_artifact(output_path, codec, compression_level, sink, timer) as out:
+                f = out.text()
+                BackupService._write_mssql_header(f, conn_details)
+
+                with timer.phase("metadata"):
+                    tables = BackupService._list_mssql_tables(cursor, conn_details, table_filter)
+                    columns = BackupService._mssql_insertable_columns(cursor)
+                    change_state = None
+                    if track_changes:
+                        change_state = IncrementalService.capture(
+                            cursor, tables, BackupService._mssql_primary_keys(cursor)
+                        )
+                    if progress is not None:
+                        progress.set_estimates(
+                            rows_total=BackupService._estimate_mssql_rows(cursor, tables), tables_total=len(tables)
+                        )
+                scripter = MSSQLScripter(
+                    cursor, f,
+                    batch_size=batch_size,
+                    rows_per_insert=settings.MSSQL_INSERT_BATCH_ROWS,
+                    progress=progress,
+                    timer=timer,
+                    digest=settings.BACKUP_TABLE_DIGEST
+                )
+
+                for schema, table in tables:
+                    scripter.script_table(table, schema, columns=columns.get((schema, table)))
 
             conn.close()
-            return BackupService._generate_checksum(output_path)
+            result = BackupService._result(out, codec, out.bytes_in, scripter.table_stats)
+            result["change_state"] = change_state
+            return result
 
         except Exception as e:
-            if os.path.exists(output_path):
+            if sink is not None:
+                sink.abort()
+            elif os.path.exists(output_path):
                 os.remove(output_path)
             raise Exception(f"Lightweight MSSQL Backup Failed: {str(e)}")
 
     @staticmethod
-    def _generate_checksum(file_path):
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
\ No newline at end of file
+    def _run_mssql_segmented(conn_details: dict, output_path: str, batch_size: int, jobs: int,
+                             codec: str = None, compression_level: int = None, sink=None, progress=None,
+                             timer: PhaseTimer = None, table_filter: TableFilter = None,
+                             checkpoint: ExportCheckpoint = None, track_changes: bool = False):
+        """
+        Exports tables into segment files, `jobs` tables at once, then
+        stitches the segments into output_path in INFORMATION_SCHEMA order so
+        the result has the same layout as a serial run.
+
+        Each segment is compressed on its own (a complete gzip member or
+        zstd/lz4 frame), and concatenated frames decode as one stream, so
+        stitching is a raw byte copy with no recompression. Phase times are
+        summed over the export threads.
+
+        With a `checkpoint` (ExportCheckpoint) tables with a primary key are
+        read in keyset chunks of MSSQL_CHECKPOINT_ROWS, each closed as its
+        own segment and recorded before the next starts. If the export
+        fails the segments are kept, and running again with the same
+        checkpoint skips finished tables and continues the others after
+        their last recorded key. The change state of `track_changes` is
+        kept in the checkpoint, so a resumed base still starts its chain
+        from the moment the first attempt began.
+        """
+        timer = timer or PhaseTimer()
+        keep_parts = checkpoint is not None
+        chunk_rows = settings.MSSQL_CHECKPOINT_ROWS if keep_parts else 0
+        checkpoint = checkpoint or ExportCheckpoint()
+        resuming = checkpoint.resumable
+        parts_dir = checkpoint.parts_dir if resuming else f"{output_path}.parts"
+        os.makedirs(parts_dir, exist_ok=True)
+        pool = MSSQLConnectionPool(conn_details, size=jobs, timer=timer)
+        succeeded = False
+
+        def export_table(index: int, entry: dict) -> dict:
+            schema, table = entry["schema"], entry["table"]
+            if entry["done"]:
+                if progress is not None:
+                    progress.advance(entry["rows"], entry["bytes"])
+                    progress.finish_table()
+                return entry["stats"]
+
+            resume = None
+            if entry["segments"]:
+                print(f"--- RESUMING {schema}.{table} AFTER {entry['rows']} ROWS ---")
+                resume = {
+                    "after": decode_key(entry["after"]),
+                    "rows": entry["rows"],
+                    "bytes": entry["bytes"],
+                    "duration_seconds": entry["duration_seconds"],
+                    "hash": BackupService._rehash_segments(
+                        parts_dir, entry["segments"], codec, table_header(f"{schema}.{table}")
+                    ),
+                }
+            state = {"seq": len(entry["segments"])}
+            state["seg"] = BackupService._open_segment(parts_dir, index, state["seq"], codec, compression_level, timer)
+
+            def on_chunk(after, done, stats):
+                # Close the chunk's segment; all but the last are checkpointed
+                # here, the last one together with the table's stats below
+                seg = state["seg"]
+                seg.close()
+                state.update(segment={"file": os.path.basename(seg.path), "bytes_in": seg.bytes_in},
+                             after=after, stats=stats)
+                if done:
+                    return None
+                checkpoint.record(
+                    index, state["segment"], after, stats["rows"], stats["bytes"], stats["duration_seconds"]
+                )
+                state["seq"] += 1
+                state["seg"] = BackupService._open_segment(
+                    parts_dir, index, state["seq"], codec, compression_level, timer
+                )
+                return state["seg"].text()
+
+            try:
+                with pool.connection() as conn:
+                    scripter = MSSQLScripter(
+                        conn.cursor(), state["seg"].text(),
+                        batch_size=batch_size,
+                        rows_per_insert=settings.MSSQL_INSERT_BATCH_ROWS,
+                        progress=progress,
+                        timer=timer,
+                        digest=settings.BACKUP_TABLE_DIGEST
+                    )
+                    scripter.script_table(
+                        table, schema,
+                        key_columns=entry["key"], chunk_rows=chunk_rows, on_chunk=on_chunk, resume=resume,
+                        columns=entry.get("columns")
+                    )
+            except Exception:
+                # Only the open segment is incomplete; closed ones are checkpointed
+                state["seg"].discard()
+                raise
+            table_stats = scripter.table_stats[-1]
+            checkpoint.record(
+                index, state["segment"], state["after"], table_stats["row_count"], table_stats["bytes"],
+                table_stats["duration_seconds"], stats=table_stats
+            )
+            return table_stats
+
+        try:
+            with pool.connection() as conn, timer.phase("metadata"):
+                cursor = conn.cursor()
+                if resuming:
+                    tables = [(entry["schema"], entry["table"]) for entry in checkpoint.tables()]
+                else:
+                    tables = BackupService._list_mssql_tables(cursor, conn_details, table_filter)
+                if progress is not None:
+                    progress.set_estimates(
+                        rows_total=BackupService._estimate_mssql_rows(cursor, tables), tables_total=len(tables)
+                    )
+                if not resuming:
+                    keys = BackupService._mssql_primary_keys(cursor) if chunk_rows or track_changes else {}
+                    change_state = IncrementalService.capture(cursor, tables, keys) if track_changes else None
+                    checkpoint.begin(
+                        output_path, parts_dir, codec, tables, keys if chunk_rows else {},
+                        BackupService._mssql_insertable_columns(cursor), change_state
+                    )
+
+            header_path = os.path.join(parts_dir, "header.sql")
+            with BackupOutput(header_path, codec, compression_level, checksum=False) as header:
+                BackupService._write_mssql_header(header.text(), conn_details)
+
+            executor = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="mssql-export")
+            try:
+                futures = [executor.submit(export_table, i, entry) for i, entry in enumerate(checkpoint.tables())]
+                table_stats = [future.result() for future in futures]
+            except Exception:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+            executor.shutdown(wait=True)
+
+            # Every table's segments as recorded, including earlier attempts'
+            segments = [(header_path, header.bytes_in)] + [
+                (os.path.join(parts_dir, segment["file"]), segment["bytes_in"])
+                for entry in checkpoint.tables() for segment in entry["segments"]
+            ]
+
+            # The checksum is taken on the stitched bytes as they are copied
+            with timer.phase("stitch"), BackupService._open_artifact(output_path, sink=sink, timer=timer) as out:
+                for path, _ in segments:
+                    with open(path, "rb") as seg:
+                        shutil.copyfileobj(seg, out, COPY_BUFFER_SIZE)
+
+            bytes_in = sum(n for _, n in segments)
+            succeeded = True
+            result = BackupService._result(out, codec, bytes_in, table_stats)
+            result["change_state"] = checkpoint.change_state
+            return result
+        finally:
+            pool.close()
+            # Failed before the checkpoint was started: nothing to resume
+            if succeeded or not keep_parts or not checkpoint.resumable:
+                shutil.rmtree(parts_dir, ignore_errors=True)
+
+    @staticmethod
+    def run_mssql_incremental(conn_details: dict, output_path: str, previous: dict, chain: dict,
+                              batch_size: int = None, compression: str = None, compression_level: int = None,
+                              sink=None, progress=None, timer: PhaseTimer = None,
+                              table_filter: TableFilter = None):
+        """
+        Incremental SQL Server backup: only what changed since `previous`,
+        the parent backup's change state (see IncrementalService). Changed
+        rows are scripted as DELETEs of their keys followed by INSERTs,
+        tables that can't be diffed as a DELETE of every row followed by
+        the full data, unchanged tables not at all, so replaying the base
+        and each increment in order rebuilds the data. `chain`
+        ("base_backup_id", "parent_backup_id", "sequence") is written into
+        the script header. Increments are small and run serially, without
+        a checkpoint.
+
+        Returns the usual result plus "change_state" (for the next
+        increment) and "changes" (per changed table: mode, rows, keys).
+        """
+        batch_size = batch_size or settings.MSSQL_FETCH_BATCH_SIZE
+        timer = timer or PhaseTimer()
+        try:
+            codec = CompressionService.validate(compression)
+            with timer.phase("connect"):
+                conn = BackupService._connect_mssql(conn_details)
+            cursor = conn.cursor()
+
+            with BackupService._open_artifact(output_path, codec, compression_level, sink, timer) as out:
+                f = out.text()
+                BackupService._write_mssql_header(f, conn_details)
+                f.write(f"-- Incremental backup {chain['sequence']} of base {chain['base_backup_id']}\n")
+                f.write(f"-- Parent backup: {chain['parent_backup_id']}\n")
+
+                with timer.phase("metadata"):
+                    tables = BackupService._list_mssql_tables(cursor, conn_details, table_filter)
+                    keys = BackupService._mssql_primary_keys(cursor)
+                    columns = BackupService._mssql_insertable_columns(cursor)
+                    change_state = IncrementalService.capture(cursor, tables, keys)
+                    plans = [
+                        IncrementalService.plan(cursor, schema, table, keys.get((schema, table)), previous, change_state)
+                        for schema, table in tables
+                    ]
+                    changed = [(name, plan) for name, plan in zip(tables, plans) if plan["mode"] != UNCHANGED]
+                    if progress is not None:
+                        progress.set_estimates(tables_total=len(changed))
+                scripter = MSSQLScripter(
+                    cursor, f,
+                    batch_size=batch_size,
+                    rows_per_insert=settings.MSSQL_INSERT_BATCH_ROWS,
+                    progress=progress,
+                    timer=timer,
+                    digest=settings.BACKUP_TABLE_DIGEST
+                )
+
+                changes = {}
+                for (schema, table), plan in changed:
+                    if plan["mode"] == TABLE:
+                        f.write(f"\nDELETE FROM {quote_ident(schema)}.{quote_ident(table)};\n")
+                        deleted = None
+                        scripter.script_table(table, schema, columns=columns.get((schema, table)))
+                    else:
+                        f.write("\n")
+                        deleted = scripter.script_deletes(table, schema, keys[(schema, table)], *plan["keys"])
+                        where, params = plan["where"]
+                        scripter.script_table(
+                            table, schema, columns=columns.get((schema, table)), where=where, params=params
+                        )
+                    changes[f"{schema}.{table}"] = {
+                        "mode": plan["mode"],
+                        "rows": scripter.table_stats[-1]["row_count"],
+                        "keys": deleted,
+                    }
+
+            conn.close()
+            result = BackupService._result(out, codec, out.bytes_in, scripter.table_stats)
+            result["change_state"] = change_state
+            result["changes"] = changes
+            return result
+
+        except Exception as e:
+            if sink is not None:
+                sink.abort()
+            elif os.path.exists(output_path):
+                os.remove(output_path)
+            raise Exception(f"Incremental MSSQL Backup Failed: {str(e)}")
+
+    @staticmethod
+    def discard_checkpoint(checkpoint: ExportCheckpoint):
+        """
+        Removes the segments of an export that will not be resumed.
+        """
+        if checkpoint.parts_dir:
+            shutil.rmtree(checkpoint.parts_dir, ignore_errors=True)
+        checkpoint.clear()
+
+    @staticmethod
+    def _open_segment(parts_dir: str, index: int, seq: int, codec: str = None, compression_level: int = None,
+                      timer: PhaseTimer = None) -> BackupOutput:
+        return BackupOutput(
+            os.path.join(parts_dir, f"{index:05d}-{seq:05d}.sql"), codec, compression_level,
+            checksum=False, timer=timer
+        )
+
+    @staticmethod
+    def _rehash_segments(parts_dir: str, segments: list, codec: str = None, header: str = ""):
+        """
+        Table digest (BACKUP_TABLE_DIGEST) over a resumed table's finished
+        segments, so it comes out as if the table had been scripted in one
+        go. Hash state can't be checkpointed, so the segments are re-read.
+        """
+        if not settings.BACKUP_TABLE_DIGEST:
+            return None
+        digest = new_digest(settings.BACKUP_TABLE_DIGEST)
+        skip = len(header.encode("utf-8"))
+        for segment in segments:
+            with open(os.path.join(parts_dir, segment["file"]), "rb") as raw:
+                f = CompressionService.open_reader(raw, codec) if codec else raw
+                while True:
+                    block = f.read(COPY_BUFFER_SIZE)
+                    if not block:
+                        break
+                    if skip:
+                        # The table's header comment is not part of its digest
+                        n = min(skip, len(block))
+                        block, skip = block[n:], skip - n
+                    digest.update(block)
+        return digest
+
+    @staticmethod
+    def _open_artifact(output_path: str, codec: str = None, compression_level: int = None, sink=None,
+                       timer: PhaseTimer = None) -> BackupOutput:
+        """
+        Final backup file: hashed on the fly (SHA-256 plus the optional
+        BACKUP_SECONDARY_DIGEST), so nothing has to re-read it afterwards.
+        """
+        return BackupOutput(
+            output_path, codec, compression_level,
+            secondary_digest=settings.BACKUP_SECONDARY_DIGEST,
+            sink=sink,
+            timer=timer
+        )
+
+    @staticmethod
+    def _result(out: BackupOutput, codec: str = None, bytes_in: int = None, table_stats: list = None) -> dict:
+        """
+        Summary of a finished artifact for the history row. The ratio is only
+        known when the codec ran in our pipeline (not inside pg_dump).
+        `table_stats` become the job's backup_table_stats rows.
+        """
+        bytes_out = out.bytes_out
+        ratio = round(bytes_in / bytes_out, 3) if codec and bytes_in and bytes_out else None
+        return {
+            "checksum": out.checksum,
+            "secondary_checksum": out.secondary_checksum,
+            "compression_codec": codec,
+            "compression_ratio": ratio,
+            "uncompressed_size_bytes": bytes_in,
+            "table_stats": table_stats or [],
+        }
+
+    @staticmethod
+    def _generate_checksum(file_path, algorithm: str = "sha256"):
+        """
+        Standalone verify pass over a finished file (backups get their digest
+        while being written). Reads in 1 MiB blocks into a reused buffer.
+        """
+        digest = hashlib.new(algorithm)
+        buffer = bytearray(COPY_BUFFER_SIZE)
+        view = memoryview(buffer)
+        with open(file_path, "rb", buffering=0) as f:
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                digest.update(view[:n])
+        return digest.hexdigest()
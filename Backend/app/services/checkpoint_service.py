@@ -0,0 +1,183 @@
+import base64
+import copy
+import datetime
+import decimal
+import os
+import threading
+import uuid
+from typing import Callable, List, Optional
+
+
+def encode_key(values) -> Optional[list]:
+    """
+    Primary-key values as JSON: plain ints/strings as-is, everything else
+    tagged with its type so decode_key() can rebuild the query parameter.
+    """
+    if values is None:
+        return None
+    out = []
+    for v in values:
+        if isinstance(v, datetime.datetime):
+            out.append({"datetime": v.isoformat()})
+        elif isinstance(v, datetime.date):
+            out.append({"date": v.isoformat()})
+        elif isinstance(v, datetime.time):
+            out.append({"time": v.isoformat()})
+        elif isinstance(v, decimal.Decimal):
+            out.append({"decimal": str(v)})
+        elif isinstance(v, uuid.UUID):
+            out.append({"uuid": str(v)})
+        elif isinstance(v, (bytes, bytearray)):
+            out.append({"bytes": base64.b64encode(bytes(v)).decode("ascii")})
+        else:
+            out.append(v)
+    return out
+
+
+def decode_key(values: Optional[list]) -> Optional[list]:
+    if values is None:
+        return None
+    out = []
+    for v in values:
+        if not isinstance(v, dict):
+            out.append(v)
+            continue
+        (kind, raw), = v.items()
+        if kind == "datetime":
+            out.append(datetime.datetime.fromisoformat(raw))
+        elif kind == "date":
+            out.append(datetime.date.fromisoformat(raw))
+        elif kind == "time":
+            out.append(datetime.time.fromisoformat(raw))
+        elif kind == "decimal":
+            out.append(decimal.Decimal(raw))
+        elif kind == "uuid":
+            out.append(uuid.UUID(raw))
+        else:
+            out.append(base64.b64decode(raw))
+    return out
+
+
+class ExportCheckpoint:
+    """
+    Resumable state of a segmented MSSQL export, saved through `persist`
+    (the task stores it on the BackupHistory row) every time a segment is
+    closed:
+
+        {"output_path": ..., "parts_dir": ..., "codec": ..., "change_state": ...,
+         "tables": [{"schema", "table", "key", "columns", "segments", "after",
+                     "rows", "bytes", "duration_seconds", "done", "stats"}, ...]}
+
+    `segments` are the finished files in parts_dir ({"file", "bytes_in"}),
+    `after` is the last primary key they hold (encode_key form). The table
+    list is frozen by the first attempt so segment names stay stable across
+    retries.
+    """
+
+    def __init__(self, state: Optional[dict] = None, persist: Optional[Callable[[dict], None]] = None):
+        self.state = copy.deepcopy(state) if state else {}
+        self.persist = persist
+        self._lock = threading.Lock()
+        # Serializes saves so export threads never store an older snapshot over a newer one
+        self._save_lock = threading.Lock()
+
+    @property
+    def resumable(self) -> bool:
+        return bool(self.state.get("tables"))
+
+    def intact(self) -> bool:
+        """
+        Whether every recorded segment is still on this host's disk.
+        """
+        parts_dir = self.parts_dir
+        if not parts_dir or not os.path.isdir(parts_dir):
+            return False
+        return all(
+            os.path.exists(os.path.join(parts_dir, segment["file"]))
+            for entry in self.tables() for segment in entry["segments"]
+        )
+
+    @property
+    def output_path(self) -> Optional[str]:
+        return self.state.get("output_path")
+
+    @property
+    def parts_dir(self) -> Optional[str]:
+        return self.state.get("parts_dir")
+
+    @property
+    def change_state(self) -> Optional[dict]:
+        return self.state.get("change_state")
+
+    def begin(self, output_path: str, parts_dir: str, codec: Optional[str], tables: List[tuple], keys: dict,
+              columns: Optional[dict] = None, change_state: Optional[dict] = None):
+        """
+        Fresh export of `tables` ((schema, table) pairs); `keys` maps a pair
+        to its primary-key columns (tables without one are exported whole),
+        `columns` to the columns to script when not all of them.
+        `change_state` is an incremental base's (see IncrementalService).
+        """
+        columns = columns or {}
+        with self._lock:
+            self.state = {
+                "output_path": output_path,
+                "parts_dir": parts_dir,
+                "codec": codec,
+                "change_state": change_state,
+                "tables": [
+                    {
+                        "schema": schema,
+                        "table": table,
+                        "key": keys.get((schema, table)),
+                        "columns": columns.get((schema, table)),
+                        "segments": [],
+                        "after": None,
+                        "rows": 0,
+                        "bytes": 0,
+                        "duration_seconds": 0.0,
+                        "done": False,
+                        "stats": None,
+                    }
+                    for schema, table in tables
+                ],
+            }
+        self.save()
+
+    def tables(self) -> List[dict]:
+        with self._lock:
+            return copy.deepcopy(self.state.get("tables", []))
+
+    def record(self, index: int, segment: dict, after=None, rows: int = 0, nbytes: int = 0,
+               duration_seconds: float = 0.0, stats: Optional[dict] = None):
+        """
+        A closed segment of table `index` and the table's totals so far;
+        `stats` (its table_stats entry) marks the table finished.
+        """
+        with self._lock:
+            entry = self.state["tables"][index]
+            entry["segments"].append(segment)
+            entry["after"] = encode_key(after)
+            entry["rows"] = rows
+            entry["bytes"] = nbytes
+            entry["duration_seconds"] = round(duration_seconds, 3)
+            if stats is not None:
+                entry["done"] = True
+                entry["stats"] = stats
+        self.save()
+
+    def save(self):
+        if self.persist is None:
+            return
+        try:
+            with self._save_lock:
+                with self._lock:
+                    snapshot = copy.deepcopy(self.state)
+                self.persist(snapshot)
+        except Exception as e:
+            # The segments are still on disk; only a crash before the next save loses ground
+            print(f"!!! Could not save export checkpoint: {e} !!!")
+
+    def clear(self):
+        with self._lock:
+            self.state = {}
+        self.save()
@@ -0,0 +1,377 @@
+import hashlib
+import json
+import math
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+
+from app.core.config import settings
+from app.models.history import BackupChunk
+from app.services.storage_service import MANIFEST_SUFFIX, StorageService, StorageWriter
+
+try:
+    # Compiled FastCDC; the fallback below cuts at the same offsets, only slower
+    from fastcdc.fastcdc_cy import fastcdc_cy as _fastcdc
+except ImportError:
+    _fastcdc = None
+
+KIB = 1024
+
+# FastCDC gear table, the one the `fastcdc` package uses
+GEAR = (
+    1553318008, 574654857, 759734804, 310648967, 1393527547, 1195718329,
+    694400241, 1154184075, 1319583805, 1298164590, 122602963, 989043992,
+    1918895050, 933636724, 1369634190, 1963341198, 1565176104, 1296753019,
+    1105746212, 1191982839, 1195494369, 29065008, 1635524067, 722221599,
+    1355059059, 564669751, 1620421856, 1100048288, 1018120624, 1087284781,
+    1723604070, 1415454125, 737834957, 1854265892, 1605418437, 1697446953,
+    973791659, 674750707, 1669838606, 320299026, 1130545851, 1725494449,
+    939321396, 748475270, 554975894, 1651665064, 1695413559, 671470969,
+    992078781, 1935142196, 1062778243, 1901125066, 1935811166, 1644847216,
+    744420649, 2068980838, 1988851904, 1263854878, 1979320293, 111370182,
+    817303588, 478553825, 694867320, 685227566, 345022554, 2095989693,
+    1770739427, 165413158, 1322704750, 46251975, 710520147, 700507188,
+    2104251000, 1350123687, 1593227923, 1756802846, 1179873910, 1629210470,
+    358373501, 807118919, 751426983, 172199468, 174707988, 1951167187,
+    1328704411, 2129871494, 1242495143, 1793093310, 1721521010, 306195915,
+    1609230749, 1992815783, 1790818204, 234528824, 551692332, 1930351755,
+    110996527, 378457918, 638641695, 743517326, 368806918, 1583529078,
+    1767199029, 182158924, 1114175764, 882553770, 552467890, 1366456705,
+    934589400, 1574008098, 1798094820, 1548210079, 821697741, 601807702,
+    332526858, 1693310695, 136360183, 1189114632, 506273277, 397438002,
+    620771032, 676183860, 1747529440, 909035644, 142389739, 1991534368,
+    272707803, 1905681287, 1210958911, 596176677, 1380009185, 1153270606,
+    1150188963, 1067903737, 1020928348, 978324723, 962376754, 1368724127,
+    1133797255, 1367747748, 1458212849, 537933020, 1295159285, 2104731913,
+    1647629177, 1691336604, 922114202, 170715530, 1608833393, 62657989,
+    1140989235, 381784875, 928003604, 449509021, 1057208185, 1239816707,
+    525522922, 476962140, 102897870, 132620570, 419788154, 2095057491,
+    1240747817, 1271689397, 973007445, 1380110056, 1021668229, 12064370,
+    1186917580, 1017163094, 597085928, 2018803520, 1795688603, 1722115921,
+    2015264326, 506263638, 1002517905, 1229603330, 1376031959, 763839898,
+    1970623926, 1109937345, 524780807, 1976131071, 905940439, 1313298413,
+    772929676, 1578848328, 1108240025, 577439381, 1293318580, 1512203375,
+    371003697, 308046041, 320070446, 1252546340, 568098497, 1341794814,
+    1922466690, 480833267, 1060838440, 969079660, 1836468543, 2049091118,
+    2023431210, 383830867, 2112679659, 231203270, 1551220541, 1377927987,
+    275637462, 2110145570, 1700335604, 738389040, 1688841319, 1506456297,
+    1243730675, 258043479, 599084776, 41093802, 792486733, 1897397356,
+    28077829, 1520357900, 361516586, 1119263216, 209458355, 45979201,
+    363681532, 477245280, 2107748241, 601938891, 244572459, 1689418013,
+    1141711990, 1485744349, 1181066840, 1950794776, 410494836, 1445347454,
+    2137242950, 852679640, 1014566730, 1999335993, 1871390758, 1736439305,
+    231222289, 603972436, 783045542, 370384393, 184356284, 709706295,
+    1453549767, 591603172, 768512391, 854125182,
+)
+
+
+def _cdc_offset(data: bytes, min_size: int, max_size: int, center: int, mask_s: int, mask_l: int) -> int:
+    """
+    Length of the chunk starting at data[0]: the first offset past
+    min_size where the gear hash has none of the mask bits set. The
+    stricter mask before `center` (normalized chunking) keeps sizes close
+    to the average.
+    """
+    gear = GEAR
+    pattern = 0
+    i = min(min_size, len(data))
+    barrier = min(center, len(data))
+    for byte in data[i:barrier]:
+        pattern = (pattern >> 1) + gear[byte]
+        i += 1
+        if not pattern & mask_s:
+            return i
+    for byte in data[i:min(max_size, len(data))]:
+        pattern = (pattern >> 1) + gear[byte]
+        i += 1
+        if not pattern & mask_l:
+            return i
+    return i
+
+
+class ContentChunker:
+    """
+    Streaming content-defined chunking (FastCDC): push() bytes in and get
+    back the chunks whose end is settled, finish() returns the rest. A cut
+    only depends on the bytes since the previous cut, so two streams that
+    share a stretch of content cut it the same way and produce the same
+    chunks there, wherever the stretch sits in each stream.
+    """
+
+    def __init__(self, min_size: int, avg_size: int, max_size: int):
+        if not 64 <= min_size <= avg_size <= max_size:
+            raise Exception("Chunk sizes must satisfy 64 <= min <= average <= max")
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        bits = round(math.log2(avg_size))
+        self._mask_s = (1 << (bits + 1)) - 1
+        self._mask_l = (1 << (bits - 1)) - 1
+        offset = min(min_size + (min_size + 1) // 2, avg_size)
+        self._center = min(avg_size - offset, max_size)
+        self._buffer = bytearray()
+
+    @classmethod
+    def from_settings(cls) -> "ContentChunker":
+        return cls(
+            settings.BACKUP_DEDUP_MIN_CHUNK_KB * KIB,
+            settings.BACKUP_DEDUP_AVG_CHUNK_KB * KIB,
+            settings.BACKUP_DEDUP_MAX_CHUNK_KB * KIB
+        )
+
+    def push(self, data) -> List[bytes]:
+        self._buffer += data
+        # Cut in batches of a few chunks rather than on every write
+        if len(self._buffer) < 2 * self.max_size:
+            return []
+        return self._cut(final=False)
+
+    def finish(self) -> List[bytes]:
+        return self._cut(final=True)
+
+    def _cut(self, final: bool) -> List[bytes]:
+        buffer = self._buffer
+        ends = []
+        if _fastcdc is not None:
+            for chunk in _fastcdc(bytes(buffer), self.min_size, self.avg_size, self.max_size):
+                ends.append(chunk.offset + chunk.length)
+        else:
+            start = 0
+            while start < len(buffer):
+                window = bytes(buffer[start:start + self.max_size])
+                start += _cdc_offset(
+                    window, self.min_size, self.max_size, self._center, self._mask_s, self._mask_l
+                )
+                ends.append(start)
+        # A chunk cut short by the end of the buffer may grow with the next write
+        if not final and ends and ends[-1] == len(buffer):
+            previous = ends[-2] if len(ends) > 1 else 0
+            if ends[-1] - previous < self.max_size:
+                ends.pop()
+
+        chunks, start = [], 0
+        for end in ends:
+            chunks.append(bytes(buffer[start:end]))
+            start = end
+        del buffer[:start]
+        return chunks
+
+
+class ChunkStoreWriter(StorageWriter):
+    """
+    Deduplicating sink (BACKUP_DEDUP_ENABLED): cuts the artifact into
+    content-defined chunks and uploads only those the storage target does
+    not hold yet, the others are referenced where they are. close() writes
+    the manifest, "<file name>.chunks", which is the backup's `location`;
+    StorageService.open_reader turns it back into the original bytes.
+
+    Chunks are handed to a thread pool in batches of about batch_size
+    bytes: each batch is hashed, looked up with one UPDATE ... RETURNING,
+    its new chunks uploaded and recorded with one bulk INSERT, so the
+    metadata DB sees two short transactions per batch instead of per
+    chunk. At most max_in_flight batches are in flight, so memory stays
+    around batch_size * (max_in_flight + 1) plus twice the max chunk size.
+    When the job completes the task records `chunk_ids` as the backup's
+    BackupChunkRef rows; chunks a failed run uploaded are reused by its
+    retry or collected later.
+    """
+
+    def __init__(self, config, file_name: str, local_dir: str, session_factory,
+                 chunker: Optional[ContentChunker] = None, max_in_flight: int = 4,
+                 batch_size: int = 16 * KIB * KIB):
+        self.config = config
+        self.local_dir = local_dir
+        self.session_factory = session_factory
+        self.storage_id = config.id if config is not None else None
+        self._manifest_name = file_name + MANIFEST_SUFFIX
+        self.location = StorageService.location_for(config, self._manifest_name, local_dir)
+        self.chunks = []  # [(chunk_id, location, size)] once closed
+        self.bytes_new = 0
+        self.bytes_reused = 0
+        self._chunker = chunker or ContentChunker.from_settings()
+        self.batch_size = max(1, batch_size)
+        self._batch = []
+        self._batch_bytes = 0
+        self._client = StorageService.client_for(config)
+        self._futures = []
+        self._error = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="chunk-store")
+
+    @property
+    def chunk_ids(self) -> list:
+        return [chunk_id for chunk_id, _, _ in self.chunks]
+
+    def write(self, data):
+        self._raise_if_failed()
+        for chunk in self._chunker.push(data):
+            self._queue(chunk)
+        n = len(data)
+        self.bytes_written += n
+        return n
+
+    def _queue(self, chunk: bytes):
+        self._batch.append(chunk)
+        self._batch_bytes += len(chunk)
+        if self._batch_bytes >= self.batch_size:
+            self._submit()
+
+    def _submit(self):
+        if not self._batch:
+            return
+        batch, self._batch, self._batch_bytes = self._batch, [], 0
+        self._slots.acquire()
+        self._raise_if_failed()
+        self._futures.append(self._executor.submit(self._store, batch))
+
+    def _store(self, batch: List[bytes]):
+        try:
+            keys = [(hashlib.sha256(data).hexdigest(), len(data)) for data in batch]
+            found = self._reuse(set(keys))
+            results, rows, reused = [], [], 0
+            try:
+                for (digest, size), data in zip(keys, batch):
+                    if (digest, size) in found:
+                        reused += size
+                    else:
+                        # A unique name per copy: an old copy of the same chunk may be being deleted right now
+                        name = f"chunks/{digest[:2]}/{digest}-{uuid.uuid4().hex[:12]}"
+                        location = StorageService.put_bytes(self.config, name, self.local_dir, data, self._client)
+                        chunk_id = uuid.uuid4()
+                        rows.append({
+                            "id": chunk_id, "storage_id": self.storage_id,
+                            "digest": digest, "size": size, "location": location
+                        })
+                        # Repeats later in the batch reuse this copy
+                        found[(digest, size)] = (chunk_id, location)
+                    chunk_id, location = found[(digest, size)]
+                    results.append((chunk_id, location, size))
+            finally:
+                # Record what was uploaded even if a later upload failed, so collection can remove it
+                self._add(rows)
+            with self._lock:
+                self.bytes_reused += reused
+                self.bytes_new += sum(row["size"] for row in rows)
+            return results
+        except Exception as e:
+            with self._lock:
+                self._error = self._error or e
+        finally:
+            self._slots.release()
+
+    def _reuse(self, keys: set) -> Dict[Tuple[str, int], tuple]:
+        """
+        (digest, size) -> (id, location) of a stored copy for each of `keys`
+        that has one, every copy marked as used now so garbage collection
+        leaves it alone. Copies being collected are skipped.
+        """
+        if not keys:
+            return {}
+        # Locked in id order, so backups touching the same chunks can't deadlock
+        candidates = select(BackupChunk.id).where(
+            BackupChunk.storage_id == self.storage_id,
+            BackupChunk.digest.in_({digest for digest, _ in keys}),
+            BackupChunk.deleting.is_(False)
+        ).order_by(BackupChunk.id).with_for_update()
+        db = self.session_factory()
+        try:
+            # deleting is checked again on the locked rows, in case collection claimed them meanwhile
+            rows = db.execute(
+                update(BackupChunk).where(
+                    BackupChunk.id.in_(candidates), BackupChunk.deleting.is_(False)
+                ).values(last_used_at=func.now()).returning(
+                    BackupChunk.id, BackupChunk.location, BackupChunk.digest, BackupChunk.size
+                ),
+                execution_options={"synchronize_session": False}
+            ).all()
+            db.commit()
+        finally:
+            db.close()
+        found = {}
+        for row in rows:
+            if (row.digest, row.size) in keys:
+                found.setdefault((row.digest, row.size), (row.id, row.location))
+        return found
+
+    def _add(self, rows: list):
+        if not rows:
+            return
+        db = self.session_factory()
+        try:
+            db.execute(insert(BackupChunk), rows)
+            db.commit()
+        finally:
+            db.close()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise Exception(f"Chunk store write failed: {self._error}")
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            for chunk in self._chunker.finish():
+                self._queue(chunk)
+            self._submit()
+            results = [future.result() for future in self._futures]
+            self._raise_if_failed()
+            self.chunks = [chunk for batch in results for chunk in batch]
+            manifest = {
+                "version": 1,
+                "size": self.bytes_written,
+                "chunks": [[location, size] for _, location, size in self.chunks],
+            }
+            StorageService.put_bytes(
+                self.config, self._manifest_name, self.local_dir, json.dumps(manifest).encode(), self._client
+            )
+        except Exception:
+            self.abort()
+            raise
+        self._executor.shutdown(wait=True)
+        self.closed = True
+        print(f"--- DEDUP: {len(self.chunks)} chunks, {self.bytes_new} new bytes, {self.bytes_reused} reused ---")
+
+    def abort(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ChunkStore:
+    """
+    Entry points for deduplicated backup storage, see ChunkStoreWriter.
+    """
+
+    @staticmethod
+    def open_writer(config, file_name: str, local_dir: str, session_factory) -> StorageWriter:
+        """
+        The sink a backup streams into: a ChunkStoreWriter when
+        BACKUP_DEDUP_ENABLED, otherwise StorageService's plain writer.
+        """
+        if not settings.BACKUP_DEDUP_ENABLED:
+            return StorageService.open_writer(config, file_name, local_dir)
+        if _fastcdc is None:
+            print("--- DEDUP: fastcdc not installed, using the pure-Python chunker ---")
+        return ChunkStoreWriter(
+            config, file_name, local_dir, session_factory, max_in_flight=settings.STORAGE_UPLOAD_CONCURRENCY,
+            batch_size=settings.BACKUP_DEDUP_BATCH_MB * KIB * KIB
+        )
+
+    @staticmethod
+    def references(backup_id, writer: StorageWriter) -> list:
+        """
+        BackupChunkRef rows for a completed backup (none unless it was
+        deduplicated).
+        """
+        if not isinstance(writer, ChunkStoreWriter):
+            return []
+        return [
+            {"backup_id": backup_id, "seq": seq, "chunk_id": chunk_id}
+            for seq, chunk_id in enumerate(writer.chunk_ids)
+        ]
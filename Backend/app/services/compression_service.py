@@ -0,0 +1,72 @@
+import gzip
+from typing import BinaryIO, Optional
+
+# Codec name -> (file extension, default level)
+CODECS = {
+    "gzip": (".gz", 6),
+    "zstd": (".zst", 3),
+    "lz4": (".lz4", 0),
+}
+
+
+class CompressionService:
+    """
+    Streaming compressors/decompressors layered over a binary file object.
+
+    Writers never close the file object they wrap: closing a writer only
+    finishes the compressed frame, so callers can keep appending (several
+    gzip members / zstd or lz4 frames concatenate into a valid stream).
+    """
+
+    @staticmethod
+    def validate(codec: Optional[str]) -> Optional[str]:
+        if codec and codec not in CODECS:
+            raise Exception(f"Unsupported compression codec '{codec}'. Use one of: {', '.join(CODECS)}")
+        return codec
+
+    @staticmethod
+    def extension(codec: Optional[str]) -> str:
+        return CODECS[codec][0] if codec else ""
+
+    @staticmethod
+    def default_level(codec: str) -> int:
+        return CODECS[codec][1]
+
+    @staticmethod
+    def open_writer(raw: BinaryIO, codec: str, level: Optional[int] = None) -> BinaryIO:
+        CompressionService.validate(codec)
+        if level is None:
+            level = CompressionService.default_level(codec)
+
+        if codec == "gzip":
+            # mtime=0 keeps output deterministic for identical input
+            return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level, mtime=0)
+
+        if codec == "zstd":
+            zstandard = CompressionService._import("zstandard", codec)
+            return zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=False)
+
+        lz4_frame = CompressionService._import("lz4.frame", codec)
+        return lz4_frame.LZ4FrameFile(raw, mode="wb", compression_level=level)
+
+    @staticmethod
+    def open_reader(raw: BinaryIO, codec: str) -> BinaryIO:
+        CompressionService.validate(codec)
+
+        if codec == "gzip":
+            return gzip.GzipFile(fileobj=raw, mode="rb")
+
+        if codec == "zstd":
+            zstandard = CompressionService._import("zstandard", codec)
+            return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=False)
+
+        lz4_frame = CompressionService._import("lz4.frame", codec)
+        return lz4_frame.LZ4FrameFile(raw, mode="rb")
+
+    @staticmethod
+    def _import(module: str, codec: str):
+        try:
+            return __import__(module, fromlist=["_"])
+        except ImportError:
+            package = module.split(".")[0]
+            raise Exception(f"Compression codec '{codec}' requires the '{package}' package (pip install {package})")
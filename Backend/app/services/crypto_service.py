@@ -1,39 +1,109 @@
 import base64
 import os
+from functools import lru_cache
+from typing import List, Optional
 from Crypto.Cipher import AES
 from Crypto.Protocol.KDF import PBKDF2
 from Crypto.Hash import SHA256
 from app.core.config import settings
 
-def get_derived_key():
-    # Derives the 32-byte key using PBKDF2 matching Deno logic
-    salt = b"pg-backup-salt"
+# Must match the Supabase Deno function that also encrypts credentials
+SALT = b"pg-backup-salt"
+ITERATIONS = 100000
+NONCE_SIZE = 12
+TAG_SIZE = 16
+# "<key id>:<base64>" marks ciphertexts written with a named key; plain
+# base64 (no separator, ':' is not in the alphabet) is the original format
+KEY_ID_SEPARATOR = ":"
+
+@lru_cache(maxsize=16)
+def derive_key(secret: str) -> bytes:
+    """
+    32-byte AES key for a secret. PBKDF2 at 100k iterations costs ~100 ms,
+    so each secret is derived once per process and then served from cache.
+    """
     return PBKDF2(
-        settings.ENCRYPTION_KEY, 
-        salt, 
-        dkLen=32, 
-        count=100000, 
+        secret.encode('utf-8'),
+        SALT,
+        dkLen=32,
+        count=ITERATIONS,
         hmac_hash_module=SHA256
     )
 
+def get_derived_key():
+    # Current key (ENCRYPTION_KEY)
+    return derive_key(settings.ENCRYPTION_KEY)
+
+def _keyring() -> dict:
+    """
+    Key id -> secret for every key that may still be found in stored data:
+    the current ENCRYPTION_KEY (under ENCRYPTION_KEY_ID) plus retired ones.
+    """
+    keys = dict(settings.ENCRYPTION_RETIRED_KEYS)
+    if settings.ENCRYPTION_KEY_ID:
+        keys[settings.ENCRYPTION_KEY_ID] = settings.ENCRYPTION_KEY
+    return keys
+
+def secrets_for(key_id: Optional[str]) -> List[str]:
+    """
+    Secrets to try on data written under `key_id`. Data written without one
+    may be under the current key or any retired one, current first.
+    """
+    if key_id:
+        secret = _keyring().get(key_id)
+        if secret is None:
+            raise Exception(f"Unknown encryption key id '{key_id}'")
+        return [secret]
+    return [settings.ENCRYPTION_KEY] + [
+        s for s in settings.ENCRYPTION_RETIRED_KEYS.values() if s != settings.ENCRYPTION_KEY
+    ]
+
 def encrypt(plaintext: str) -> str:
     key = get_derived_key()
-    iv = os.urandom(12) # 12-byte nonce for GCM
+    iv = os.urandom(NONCE_SIZE) # 12-byte nonce for GCM
     cipher = AES.new(key, AES.MODE_GCM, nonce=iv)
     ciphertext, tag = cipher.encrypt_and_digest(plaintext.encode('utf-8'))
-    
+
     # Combined format: IV + Ciphertext + Tag (Matches Deno/WebCrypto)
-    combined = iv + ciphertext + tag
-    return base64.b64encode(combined).decode('utf-8')
+    combined = base64.b64encode(iv + ciphertext + tag).decode('utf-8')
+    if settings.ENCRYPTION_KEY_ID:
+        return f"{settings.ENCRYPTION_KEY_ID}{KEY_ID_SEPARATOR}{combined}"
+    return combined
+
+def _decrypt_with(key: bytes, data: bytes) -> str:
+    iv = data[:NONCE_SIZE]
+    tag = data[-TAG_SIZE:]
+    ciphertext = data[NONCE_SIZE:-TAG_SIZE]
 
-def decrypt(base64_ciphertext: str) -> str:
-    key = get_derived_key()
-    data = base64.b64decode(base64_ciphertext)
-    
-    iv = data[:12]
-    tag = data[-16:]
-    ciphertext = data[12:-16]
-    
     cipher = AES.new(key, AES.MODE_GCM, nonce=iv)
     decrypted = cipher.decrypt_and_verify(ciphertext, tag)
-    return decrypted.decode('utf-8')
\ No newline at end of file
+    return decrypted.decode('utf-8')
+
+def decrypt(base64_ciphertext: str) -> str:
+    if KEY_ID_SEPARATOR in base64_ciphertext:
+        key_id, payload = base64_ciphertext.split(KEY_ID_SEPARATOR, 1)
+        secret, = secrets_for(key_id)
+        return _decrypt_with(derive_key(secret), base64.b64decode(payload))
+
+    # Original format carries no key id: try the current key, then retired ones
+    data = base64.b64decode(base64_ciphertext)
+    for secret in secrets_for(None):
+        try:
+            return _decrypt_with(derive_key(secret), data)
+        except ValueError:
+            continue
+    raise Exception("Could not decrypt value with any configured encryption key")
+
+def needs_rotation(value: str) -> bool:
+    """
+    True when `value` was not written with the current key id.
+    """
+    if not settings.ENCRYPTION_KEY_ID:
+        return False
+    return not value.startswith(settings.ENCRYPTION_KEY_ID + KEY_ID_SEPARATOR)
+
+def reencrypt(value: str) -> str:
+    """
+    Rewrites a stored ciphertext under the current key (for key rotation).
+    """
+    return encrypt(decrypt(value)) if needs_rotation(value) else value
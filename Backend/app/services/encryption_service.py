@@ -0,0 +1,211 @@
+import io
+import os
+import struct
+from typing import BinaryIO, Callable, Optional
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from app.core.config import settings
+from app.services.crypto_service import derive_key, secrets_for
+
+MAGIC = b"DBE1"
+# magic, plaintext bytes per segment, key id length; then key id, salt, nonce prefix
+HEADER = struct.Struct(">4sIB")
+SALT_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+TAG_SIZE = 16
+HKDF_INFO = b"backup-stream"
+
+
+def _file_cipher(secret: str, salt: bytes) -> AESGCM:
+    """
+    AES-256-GCM under the file's own key: HKDF of the secret's derived key
+    with the file's random salt.
+    """
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=HKDF_INFO)
+    return AESGCM(hkdf.derive(derive_key(secret)))
+
+
+def _nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    return prefix + struct.pack(">IB", index, 1 if last else 0)
+
+
+def _read_upto(raw, n: int) -> bytes:
+    # Object storage bodies may return short reads before the end
+    parts, remaining = [], n
+    while remaining > 0:
+        data = raw.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b"".join(parts)
+
+
+class EncryptingWriter:
+    """
+    Sink wrapper that encrypts a backup before it reaches `raw` (a
+    StorageWriter), as
+
+        header | segment 0 | segment 1 | ... | last segment
+
+    The header holds the segment size, ENCRYPTION_KEY_ID, a random salt
+    and a random nonce prefix. Every segment is sealed on its own with
+    AES-GCM under nonce prefix || index || last flag, with the header as
+    associated data: segments can't be reordered, moved between files or
+    cut off at the end without failing authentication, and any one of them
+    can be decrypted alone. Memory is one segment, whatever the backup size.
+
+    Behaves like the StorageWriter it wraps (close() commits, abort()
+    throws away); bytes_written counts plaintext.
+    """
+
+    def __init__(self, raw, segment_size: int):
+        self.raw = raw
+        self.segment_size = segment_size
+        self.bytes_written = 0
+        self.closed = False
+        key_id = (settings.ENCRYPTION_KEY_ID or "").encode("utf-8")
+        salt = os.urandom(SALT_SIZE)
+        self._prefix = os.urandom(NONCE_PREFIX_SIZE)
+        self._header = HEADER.pack(MAGIC, segment_size, len(key_id)) + key_id + salt + self._prefix
+        self._cipher = _file_cipher(settings.ENCRYPTION_KEY, salt)
+        self._buffer = bytearray()
+        self._index = 0
+        self.raw.write(self._header)
+
+    @property
+    def location(self) -> str:
+        return self.raw.location
+
+    def write(self, data) -> int:
+        self._buffer += data
+        # Strictly more than a segment: only close() knows which one is last
+        sealed = 0
+        with memoryview(self._buffer) as view:
+            while len(view) - sealed > self.segment_size:
+                self._seal(view[sealed:sealed + self.segment_size], last=False)
+                sealed += self.segment_size
+        if sealed:
+            del self._buffer[:sealed]
+        n = len(data)
+        self.bytes_written += n
+        return n
+
+    def _seal(self, plaintext, last: bool):
+        nonce = _nonce(self._prefix, self._index, last)
+        self.raw.write(self._cipher.encrypt(nonce, plaintext, self._header))
+        self._index += 1
+
+    def flush(self):
+        self.raw.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._seal(bytes(self._buffer), last=True)
+            self._buffer.clear()
+            self.raw.close()
+        except Exception:
+            self.abort()
+            raise
+        self.closed = True
+
+    def abort(self):
+        self.closed = True
+        self.raw.abort()
+
+
+class DecryptingReader(io.RawIOBase):
+    """
+    Plaintext of an EncryptingWriter artifact from byte `start`.
+    `open_at(offset)` opens the stored object at a byte offset: the header
+    is read from the start, then a reader positioned past the first
+    segment reopens at the segment holding `start`, so a ranged download
+    only decrypts the segments it returns.
+    """
+
+    def __init__(self, open_at: Callable[[int], BinaryIO], start: int = 0):
+        raw = open_at(0)
+        try:
+            fixed = _read_upto(raw, HEADER.size)
+            if len(fixed) < HEADER.size or fixed[:len(MAGIC)] != MAGIC:
+                raise Exception("Backup is not an encrypted backup or its header is damaged")
+            _, self.segment_size, id_length = HEADER.unpack(fixed)
+            key_id = _read_upto(raw, id_length)
+            salt = _read_upto(raw, SALT_SIZE)
+            self._prefix = _read_upto(raw, NONCE_PREFIX_SIZE)
+        except Exception:
+            raw.close()
+            raise
+        self._header = fixed + key_id + salt + self._prefix
+        # Without a key id the file may be under the current key or a retired one
+        self._ciphers = [_file_cipher(secret, salt) for secret in secrets_for(key_id.decode("utf-8") or None)]
+
+        self._index = start // self.segment_size
+        self._skip = start - self._index * self.segment_size
+        if self._index:
+            raw.close()
+            raw = open_at(len(self._header) + self._index * (self.segment_size + TAG_SIZE))
+        self._raw = raw
+        self._lookahead = b""
+        self._plain = memoryview(b"")
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._plain:
+            if self._done:
+                return 0
+            self._plain = memoryview(self._next_segment())[self._skip:]
+            self._skip = 0
+        n = min(len(buffer), len(self._plain))
+        buffer[:n] = self._plain[:n]
+        self._plain = self._plain[n:]
+        return n
+
+    def _next_segment(self) -> bytes:
+        # One byte past the segment tells whether it is the last one
+        want = self.segment_size + TAG_SIZE + 1
+        data = self._lookahead + _read_upto(self._raw, want - len(self._lookahead))
+        last = len(data) < want
+        sealed, self._lookahead = (data, b"") if last else (data[:-1], data[-1:])
+        self._done = last
+        if len(sealed) < TAG_SIZE:
+            raise Exception("Encrypted backup is truncated")
+        nonce = _nonce(self._prefix, self._index, last)
+        for cipher in self._ciphers:
+            try:
+                plaintext = cipher.decrypt(nonce, sealed, self._header)
+            except InvalidTag:
+                continue
+            self._ciphers = [cipher]
+            self._index += 1
+            return plaintext
+        raise Exception("Encrypted backup failed authentication: it is corrupt, truncated or under an unknown key")
+
+    def close(self):
+        if not self.closed:
+            self._raw.close()
+        super().close()
+
+
+class EncryptionService:
+    """
+    Streaming encryption of backup artifacts (schedules with
+    encryption_enabled), see EncryptingWriter for the format.
+    """
+
+    @staticmethod
+    def open_writer(raw, segment_size: Optional[int] = None) -> EncryptingWriter:
+        return EncryptingWriter(raw, segment_size or settings.BACKUP_ENCRYPTION_SEGMENT_KB * 1024)
+
+    @staticmethod
+    def open_reader(open_at: Callable[[int], BinaryIO], start: int = 0) -> DecryptingReader:
+        return DecryptingReader(open_at, start)
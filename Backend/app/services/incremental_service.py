@@ -0,0 +1,226 @@
+from typing import List, Optional
+
+from app.services.checkpoint_service import decode_key, encode_key
+from app.services.mssql_scripter import keyset_predicate, quote_ident
+
+# How a table's changes are found, best first
+CHANGE_TRACKING = "change_tracking"
+ROWVERSION = "rowversion"
+CHECKSUM = "checksum"
+
+# What an incremental backup writes for a table
+UNCHANGED = "unchanged"
+ROWS = "rows"  # DELETE the changed keys, INSERT their current rows
+TABLE = "table"  # DELETE everything, INSERT every row
+
+
+def _ident(schema: str, table: str) -> str:
+    return f"{quote_ident(schema)}.{quote_ident(table)}"
+
+
+class IncrementalService:
+    """
+    Change detection for incremental SQL Server backups.
+
+    Every backup of an incremental chain records a change state: per table
+    the detection method plus its watermark, taken before any row is read.
+    The next backup compares against it, per table:
+
+      * Change Tracking (table enabled for it, primary key): the keys from
+        CHANGETABLE(CHANGES ...) since the recorded version, deletes
+        included;
+      * rowversion column and a primary key that is a single ascending
+        identity column: rows whose rowversion is at or above the recorded
+        MIN_ACTIVE_ROWVERSION(). Deletes are invisible to rowversion, so
+        the row count is checked: it must equal the old count plus the
+        changed rows above the old highest key, otherwise the table is
+        exported whole. With an identity key every insert lands above the
+        old highest key and keys can't be updated, so that count only
+        balances when nothing was deleted (other keys could hide a delete
+        behind an insert below the maximum);
+      * anything else: COUNT_BIG(*) and CHECKSUM_AGG(BINARY_CHECKSUM(*)),
+        the whole table when either moved.
+
+    Changes are bounded above by the new state's watermark, so a row that
+    changes while the backup runs is left to the next one. Any doubt
+    (method changed, Change Tracking history cleaned up, a failing query)
+    means the whole table.
+    """
+
+    @staticmethod
+    def methods(cursor, tables: List[tuple], keys: dict) -> dict:
+        """
+        (schema, table) -> detection method for each of `tables`; `keys`
+        maps them to their primary-key columns.
+        """
+        tracked, rowversions, identities = set(), {}, {}
+        try:
+            cursor.execute("""
+                SELECT OBJECT_SCHEMA_NAME(object_id), OBJECT_NAME(object_id)
+                FROM sys.change_tracking_tables
+            """)
+            tracked = {(row[0], row[1]) for row in cursor.fetchall()}
+        except Exception as e:
+            print(f"!!! Could not read change tracking tables: {e} !!!")
+        try:
+            cursor.execute("""
+                SELECT SCHEMA_NAME(t.schema_id), t.name, c.name
+                FROM sys.tables t
+                JOIN sys.columns c ON c.object_id = t.object_id
+                WHERE c.system_type_id = 189
+            """)
+            rowversions = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+        except Exception as e:
+            print(f"!!! Could not read rowversion columns: {e} !!!")
+        if rowversions:
+            try:
+                cursor.execute("""
+                    SELECT OBJECT_SCHEMA_NAME(object_id), OBJECT_NAME(object_id), name
+                    FROM sys.identity_columns
+                    WHERE CAST(increment_value AS BIGINT) > 0
+                """)
+                identities = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+            except Exception as e:
+                print(f"!!! Could not read identity columns: {e} !!!")
+
+        methods = {}
+        for name in tables:
+            if name in tracked and keys.get(name):
+                methods[name] = {"method": CHANGE_TRACKING}
+            elif name in rowversions and name in identities and list(keys.get(name) or []) == [identities[name]]:
+                methods[name] = {"method": ROWVERSION, "column": rowversions[name]}
+            else:
+                methods[name] = {"method": CHECKSUM}
+        return methods
+
+    @staticmethod
+    def capture(cursor, tables: List[tuple], keys: dict) -> dict:
+        """
+        Change state of `tables` right now:
+
+            {"change_tracking_version": ..., "rowversion": "<hex>",
+             "tables": [{"schema", "table", "method", ...watermarks}, ...]}
+        """
+        methods = IncrementalService.methods(cursor, tables, keys)
+        used = {entry["method"] for entry in methods.values()}
+        state = {"change_tracking_version": None, "rowversion": None, "tables": []}
+        if CHANGE_TRACKING in used:
+            cursor.execute("SELECT CHANGE_TRACKING_CURRENT_VERSION()")
+            state["change_tracking_version"] = cursor.fetchone()[0]
+        if ROWVERSION in used:
+            cursor.execute("SELECT MIN_ACTIVE_ROWVERSION()")
+            state["rowversion"] = bytes(cursor.fetchone()[0]).hex()
+
+        for schema, table in tables:
+            entry = dict(methods[(schema, table)], schema=schema, table=table)
+            ident = _ident(schema, table)
+            if entry["method"] == ROWVERSION:
+                key = keys[(schema, table)]
+                cursor.execute(f"SELECT COUNT_BIG(*) FROM {ident}")
+                entry["rows"] = int(cursor.fetchone()[0])
+                order = ", ".join(f"{quote_ident(col)} DESC" for col in key)
+                cursor.execute(f"SELECT TOP (1) {', '.join(quote_ident(col) for col in key)} FROM {ident} ORDER BY {order}")
+                row = cursor.fetchone()
+                entry["max_key"] = encode_key(list(row)) if row else None
+            elif entry["method"] == CHECKSUM:
+                cursor.execute(f"SELECT COUNT_BIG(*), CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM {ident}")
+                count, checksum = cursor.fetchone()
+                entry["rows"] = int(count)
+                entry["checksum"] = checksum
+            state["tables"].append(entry)
+        return state
+
+    @staticmethod
+    def plan(cursor, schema: str, table: str, key: Optional[List[str]], previous: dict, current: dict) -> dict:
+        """
+        What to export for one table, comparing the parent backup's change
+        state with the current one: {"mode": UNCHANGED | TABLE} or
+        {"mode": ROWS, "keys": (query, params), "where": (condition, params)},
+        the changed keys to delete and the rows to insert.
+        """
+        old = IncrementalService._entry(previous, schema, table)
+        new = IncrementalService._entry(current, schema, table)
+        if old is None or new is None or old["method"] != new["method"]:
+            return {"mode": TABLE}
+        try:
+            if new["method"] == CHANGE_TRACKING:
+                return IncrementalService._plan_change_tracking(
+                    cursor, schema, table, key, previous["change_tracking_version"],
+                    current["change_tracking_version"]
+                )
+            if new["method"] == ROWVERSION:
+                return IncrementalService._plan_rowversion(
+                    cursor, schema, table, key, new["column"], previous["rowversion"], current["rowversion"], old, new
+                )
+            if (old["rows"], old["checksum"]) == (new["rows"], new["checksum"]):
+                return {"mode": UNCHANGED}
+            return {"mode": TABLE}
+        except Exception as e:
+            print(f"!!! Could not read changes of {schema}.{table}, exporting it whole: {e} !!!")
+            return {"mode": TABLE}
+
+    @staticmethod
+    def _entry(state: dict, schema: str, table: str) -> Optional[dict]:
+        for entry in state.get("tables") or []:
+            if entry["schema"] == schema and entry["table"] == table:
+                return entry
+        return None
+
+    @staticmethod
+    def _plan_change_tracking(cursor, schema: str, table: str, key: List[str], since, until) -> dict:
+        ident = _ident(schema, table)
+        cursor.execute("SELECT CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID(%s))", (ident,))
+        min_valid = cursor.fetchone()[0]
+        if since is None or min_valid is None or since < min_valid:
+            # The change history we need was cleaned up (or tracking was re-enabled)
+            return {"mode": TABLE}
+
+        # pymssql %-formats queries that carry parameters
+        ident = ident.replace("%", "%%")
+        changes = f"CHANGETABLE(CHANGES {ident}, %s) AS ct WHERE ct.SYS_CHANGE_VERSION <= %s"
+        params = (since, until)
+        cursor.execute(f"SELECT COUNT_BIG(*) FROM {changes}", params)
+        if not cursor.fetchone()[0]:
+            return {"mode": UNCHANGED}
+
+        columns = [quote_ident(col).replace("%", "%%") for col in key]
+        join = " AND ".join(f"ct.{col} = {ident}.{col}" for col in columns)
+        return {
+            "mode": ROWS,
+            "keys": (f"SELECT {', '.join('ct.' + col for col in columns)} FROM {changes}", params),
+            "where": (f"EXISTS (SELECT 1 FROM {changes} AND {join})", params),
+        }
+
+    @staticmethod
+    def _plan_rowversion(cursor, schema: str, table: str, key: List[str], column: str, since: str, until: str,
+                         old: dict, new: dict) -> dict:
+        if not since or not until:
+            return {"mode": TABLE}
+        ident = _ident(schema, table).replace("%", "%%")
+        column = quote_ident(column).replace("%", "%%")
+        changed = f"{column} >= %s AND {column} < %s"
+        params = [bytes.fromhex(since), bytes.fromhex(until)]
+
+        # Changed rows above the old highest key are certainly inserts
+        max_key = decode_key(old.get("max_key"))
+        if max_key is None:
+            above, above_params = "1 = 1", []
+        else:
+            above, above_params = keyset_predicate(key, max_key)
+        cursor.execute(
+            f"SELECT COUNT_BIG(*), SUM(CASE WHEN {above} THEN 1 ELSE 0 END) FROM {ident} WHERE {changed}",
+            tuple(above_params + params)
+        )
+        count, inserted = cursor.fetchone()
+        if old["rows"] + int(inserted or 0) != new["rows"]:
+            # Rows were deleted (methods() only picks identity keys, so inserts land above max_key)
+            return {"mode": TABLE}
+        if not count:
+            return {"mode": UNCHANGED}
+
+        columns = ", ".join(quote_ident(col).replace("%", "%%") for col in key)
+        return {
+            "mode": ROWS,
+            "keys": (f"SELECT {columns} FROM {ident} WHERE {changed}", tuple(params)),
+            "where": (changed, tuple(params)),
+        }
@@ -0,0 +1,242 @@
+import re
+from typing import Iterable, Iterator, List, Optional, TextIO
+
+from app.services.mssql_scripter import quote_ident
+
+# Longest run of statement text that is not a top-level ';': plain text,
+# complete N'...' literals, [identifiers] and comments. Stops at a ';' or at
+# the opening of a literal/comment that isn't closed yet.
+_STATEMENT_BODY = re.compile(r"""
+    (?:
+        [^';\[/-]+
+      | '[^']*(?:''[^']*)*'(?!')
+      | \[[^\]]*(?:\]\][^\]]*)*\](?!\])
+      | --[^\n]*(?:\n|\Z)
+      | /\*.*?\*/
+      | /(?!\*)
+      | -(?!-)
+    )*
+""", re.S | re.X)
+_LEADING_COMMENTS = re.compile(r"(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/)*", re.S)
+_INSERT_TARGET = re.compile(r"INSERT\s+INTO\s+((?:\[(?:[^\]]|\]\])*\]\.)?\[(?:[^\]]|\]\])*\])", re.I)
+_ROW_SEPARATOR = "),\n("
+READ_CHUNK_CHARS = 1024 * 1024
+
+
+class StatementSplitter:
+    """
+    Incremental splitter for T-SQL scripts.
+
+    Text is fed in arbitrary chunks and complete statements come out as soon
+    as their terminating ';' arrives, so a multi-GB script is replayed with
+    only the statement being assembled held in memory. Semicolons inside
+    N'...' literals, [bracketed] identifiers and comments are skipped by a
+    single regex match per statement, so row data is never walked character
+    by character in Python.
+    """
+
+    def __init__(self):
+        self._buf = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buf += text
+        return self._scan(final=False)
+
+    def finish(self) -> List[str]:
+        statements = self._scan(final=True)
+        tail, self._buf = self._buf, ""
+        if _has_code(tail):
+            statements.append(tail.strip())
+        return statements
+
+    def _scan(self, final: bool) -> List[str]:
+        buf = self._buf
+        # Hold back the last character until more text arrives: it may be the
+        # first half of '--', '/*' or an escaped '' / ]]
+        end = len(buf) if final else len(buf) - 1
+        statements = []
+        start = 0
+        while start < end:
+            stop = _STATEMENT_BODY.match(buf, start, end).end()
+            if stop >= end or buf[stop] != ";":
+                # Statement (or a literal/comment inside it) continues in the next chunk
+                break
+            statement = buf[start:stop].strip()
+            if _has_code(statement):
+                statements.append(statement)
+            start = stop + 1
+        self._buf = buf[start:]
+        return statements
+
+
+def _has_code(text: str) -> bool:
+    """
+    False for whitespace/comment-only fragments (the script header, the
+    "-- Data for table" lines after the last statement).
+    """
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("--"):
+            return True
+    return False
+
+
+def iter_statements(stream: TextIO, chunk_chars: int = READ_CHUNK_CHARS) -> Iterator[str]:
+    splitter = StatementSplitter()
+    while True:
+        chunk = stream.read(chunk_chars)
+        if not chunk:
+            break
+        yield from splitter.feed(chunk)
+    yield from splitter.finish()
+
+
+def insert_target(statement: str) -> Optional[str]:
+    """
+    Bracketed target table of an INSERT statement, else None.
+    Leading comments (the scripter's "-- Data for table" marker) are skipped.
+    """
+    match = _INSERT_TARGET.match(statement, _LEADING_COMMENTS.match(statement).end())
+    return match.group(1) if match else None
+
+
+class MSSQLReplayer:
+    """
+    Replays a script written by MSSQLScripter against a DB-API connection.
+
+    Statements are sent `batch_statements` at a time as one T-SQL batch
+    (one round trip for up to batch_statements * 1000 rows) and committed
+    every `commit_statements`, instead of one execute + implicit commit per
+    line. Per table it also switches IDENTITY_INSERT on for identity tables
+    and, with clean=True, empties the table before its first INSERT.
+    Foreign keys are disabled for the duration of the replay, since the
+    script emits tables in catalog order rather than dependency order, and
+    re-enabled WITH CHECK afterwards: the restored rows are validated and
+    the constraints stay trusted, and rows that violate one fail the
+    restore. A failure rolls back the open transaction only; earlier
+    commits stay.
+    """
+
+    def __init__(self, conn, batch_statements: int = 50, commit_statements: int = 1000, clean: bool = False):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.batch_statements = max(1, int(batch_statements))
+        self.commit_statements = max(self.batch_statements, int(commit_statements))
+        self.clean = clean
+        self.statements = 0
+        self.rows = 0
+        self.tables = 0
+        self._identity_tables = set()
+        self._current_table = None
+        self._seen_tables = set()
+
+    def replay(self, statements: Iterable[str]) -> int:
+        """
+        Executes every statement. Returns the number of rows inserted.
+        """
+        self._identity_tables = self._load_identity_tables()
+        tables = self._load_tables()
+        self._disable_constraints(tables)
+        try:
+            batch = []
+            since_commit = 0
+            for statement in statements:
+                table = insert_target(statement)
+                if table is not None:
+                    batch.extend(self._table_switch(table))
+                    self.rows += statement.count(_ROW_SEPARATOR) + 1
+                batch.append(statement)
+                self.statements += 1
+                if len(batch) >= self.batch_statements:
+                    self._execute(batch)
+                    since_commit += len(batch)
+                    batch = []
+                    if since_commit >= self.commit_statements:
+                        self.conn.commit()
+                        since_commit = 0
+            if self._current_table in self._identity_tables:
+                batch.append(f"SET IDENTITY_INSERT {self._current_table} OFF")
+            if batch:
+                self._execute(batch)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            self._enable_constraints(tables, validate=False)
+            raise
+        self._enable_constraints(tables, validate=True)
+        return self.rows
+
+    def _table_switch(self, table: str) -> List[str]:
+        """
+        Statements to run before an INSERT into `table` when the script moves on to it.
+        """
+        if table == self._current_table:
+            return []
+        prelude = []
+        if self._current_table in self._identity_tables:
+            prelude.append(f"SET IDENTITY_INSERT {self._current_table} OFF")
+        if self.clean and table not in self._seen_tables:
+            prelude.append(f"DELETE FROM {table}")
+        if table in self._identity_tables:
+            prelude.append(f"SET IDENTITY_INSERT {table} ON")
+        if table not in self._seen_tables:
+            self._seen_tables.add(table)
+            self.tables += 1
+        self._current_table = table
+        return prelude
+
+    def _execute(self, batch: List[str]):
+        self.cursor.execute(";\n".join(batch))
+
+    def _load_identity_tables(self) -> set:
+        # Both spellings the scripter may emit: [table] and [schema].[table]
+        self.cursor.execute("""
+            SELECT OBJECT_SCHEMA_NAME(object_id), OBJECT_NAME(object_id)
+            FROM sys.identity_columns
+        """)
+        names = set()
+        for schema, table in self.cursor.fetchall():
+            names.add(quote_ident(table))
+            names.add(f"{quote_ident(schema)}.{quote_ident(table)}")
+        return names
+
+    def _load_tables(self) -> list:
+        self.cursor.execute("""
+            SELECT TABLE_SCHEMA, TABLE_NAME
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_TYPE = 'BASE TABLE'
+        """)
+        return [f"{quote_ident(schema)}.{quote_ident(table)}" for schema, table in self.cursor.fetchall()]
+
+    def _disable_constraints(self, tables: list):
+        if not tables:
+            return
+        self.cursor.execute(";\n".join(f"ALTER TABLE {t} NOCHECK CONSTRAINT ALL" for t in tables))
+        self.conn.commit()
+
+    def _enable_constraints(self, tables: list, validate: bool):
+        """
+        Turns every table's constraints back on, one table at a time. With
+        validate (WITH CHECK) the rows are checked first; a table whose rows
+        violate a constraint still gets it back, unchecked, and is reported
+        in the exception raised at the end. Without validate (after a failed
+        replay) errors are only printed, so they don't mask the original one.
+        """
+        violations = []
+        for table in tables:
+            if validate:
+                try:
+                    self.cursor.execute(f"ALTER TABLE {table} WITH CHECK CHECK CONSTRAINT ALL")
+                    self.conn.commit()
+                    continue
+                except Exception as e:
+                    self.conn.rollback()
+                    violations.append(f"{table}: {e}")
+            try:
+                self.cursor.execute(f"ALTER TABLE {table} CHECK CONSTRAINT ALL")
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                print(f"!!! Could not re-enable constraints of {table}: {e} !!!")
+        if violations:
+            raise Exception(f"Restored data violates constraints: {'; '.join(violations)}")
@@ -0,0 +1,382 @@
+import datetime
+import decimal
+import time
+import uuid
+from typing import Callable, List, Optional, TextIO
+
+from app.core.timing import PhaseTimer
+from app.services.output_service import new_digest
+
+# DB-API type codes reported by pymssql in cursor.description
+STRING = 1
+BINARY = 2
+NUMBER = 3
+DATETIME = 4
+DECIMAL = 5
+
+# SQL Server rejects more than 1000 row value expressions per INSERT
+MAX_ROWS_PER_INSERT = 1000
+
+
+def quote_ident(name: str) -> str:
+    """
+    Brackets a SQL Server identifier, escaping any embedded ']'.
+    """
+    return "[" + str(name).replace("]", "]]") + "]"
+
+
+def table_header(table: str) -> str:
+    """
+    Comment line opening a table's data in the script.
+    """
+    return f"\n-- Data for table: {table}\n"
+
+
+def select_list(columns: Optional[List[str]] = None) -> str:
+    """
+    Bracketed column list for a SELECT, or "*" for every column.
+    """
+    return ", ".join(quote_ident(col) for col in columns) if columns else "*"
+
+
+def keyset_predicate(key_columns: List[str], after: list):
+    """
+    "key > after" over a (composite) key, plus its parameters:
+    (k1 > @1) OR (k1 = @1 AND k2 > @2) ... Percent signs in the names are
+    escaped, as pymssql %-formats queries that carry parameters.
+    """
+    columns = [quote_ident(col).replace("%", "%%") for col in key_columns]
+    terms, params = [], []
+    for i, column in enumerate(columns):
+        terms.append("(" + " AND ".join([f"{c} = %s" for c in columns[:i]] + [f"{column} > %s"]) + ")")
+        params.extend(after[:i + 1])
+    return " OR ".join(terms), params
+
+
+def keyset_query(table_ident: str, key_columns: List[str], after: Optional[list], limit: int,
+                 columns: Optional[List[str]] = None):
+    """
+    SELECT for the next `limit` rows after the key `after` (None: from the
+    start), in key order, plus its parameters.
+    """
+    order = ", ".join(quote_ident(col) for col in key_columns)
+    if after is None:
+        return f"SELECT TOP ({int(limit)}) {select_list(columns)} FROM {table_ident} ORDER BY {order}", None
+
+    where, params = keyset_predicate(key_columns, after)
+    return (
+        f"SELECT TOP ({int(limit)}) {select_list(columns).replace('%', '%%')} FROM {table_ident.replace('%', '%%')} "
+        f"WHERE {where} ORDER BY {order.replace('%', '%%')}",
+        tuple(params),
+    )
+
+
+# --- Value encoders (one per column, picked once) ---
+
+def _encode_str(val: str) -> str:
+    return "N'" + val.replace("'", "''") + "'"
+
+
+def _encode_bool(val: bool) -> str:
+    return "1" if val else "0"
+
+
+def _encode_decimal(val) -> str:
+    # Fixed-point so large/small values never come out as '1E+3'
+    return format(val, "f")
+
+
+def _encode_bytes(val) -> str:
+    return "0x" + bytes(val).hex()
+
+
+def _encode_uuid(val: uuid.UUID) -> str:
+    return "'" + str(val) + "'"
+
+
+def _encode_datetime(val: datetime.datetime) -> str:
+    # DATETIME columns only take 3 fractional digits; keep full precision
+    # when the value really carries microseconds (datetime2/datetimeoffset)
+    if val.microsecond % 1000 == 0:
+        return "'" + val.isoformat(timespec="milliseconds") + "'"
+    return "'" + val.isoformat() + "'"
+
+
+def _encode_iso(val) -> str:
+    return "'" + val.isoformat() + "'"
+
+
+def _encode_fallback(val) -> str:
+    return _encode_str(str(val))
+
+
+_VALUE_ENCODERS = {
+    bool: _encode_bool,
+    int: int.__repr__,
+    float: float.__repr__,
+    decimal.Decimal: _encode_decimal,
+    str: _encode_str,
+    bytes: _encode_bytes,
+    bytearray: _encode_bytes,
+    memoryview: _encode_bytes,
+    uuid.UUID: _encode_uuid,
+    datetime.datetime: _encode_datetime,
+    datetime.date: _encode_iso,
+    datetime.time: _encode_iso,
+}
+
+# Type codes that map to exactly one Python type. NUMBER (int/float/bit) and
+# BINARY (varbinary, uniqueidentifier, date, time, datetime2...) are
+# ambiguous and get resolved once from the first non-NULL value instead.
+_TYPE_CODE_ENCODERS = {
+    STRING: _encode_str,
+    DECIMAL: _encode_decimal,
+    DATETIME: _encode_datetime,
+}
+
+
+def encoder_for_value(val) -> Callable[[object], str]:
+    for cls in type(val).__mro__:
+        encoder = _VALUE_ENCODERS.get(cls)
+        if encoder is not None:
+            return encoder
+    return _encode_fallback
+
+
+def column_encoders(description) -> list:
+    """
+    Builds one encoder per column from a DB-API cursor.description.
+    Ambiguous columns are left as None until resolve_encoders() sees data.
+    """
+    return [_TYPE_CODE_ENCODERS.get(col[1]) for col in description]
+
+
+def resolve_encoders(encoders: list, columns: list) -> None:
+    """
+    Fills unresolved (None) encoders in place from the first non-NULL value
+    of each column. Columns that are entirely NULL stay unresolved.
+    """
+    for i, encoder in enumerate(encoders):
+        if encoder is None:
+            for val in columns[i]:
+                if val is not None:
+                    encoders[i] = encoder_for_value(val)
+                    break
+
+
+def encode_rows(rows: list, encoders: list) -> List[str]:
+    """
+    Encodes a chunk of row tuples into "v1,v2,..." strings.
+
+    Works column by column so every cell of a column goes through the same
+    encoder via map(); only columns that actually hold NULLs pay for a
+    per-cell None check.
+    """
+    columns = list(zip(*rows))
+    resolve_encoders(encoders, columns)
+
+    encoded_columns = []
+    for col, encoder in zip(columns, encoders):
+        if encoder is None:
+            encoded_columns.append(("NULL",) * len(col))
+        elif None in col:
+            encoded_columns.append(["NULL" if v is None else encoder(v) for v in col])
+        else:
+            encoded_columns.append(map(encoder, col))
+    return list(map(",".join, zip(*encoded_columns)))
+
+
+class MSSQLScripter:
+    """
+    Streams table data out of a DB-API cursor as INSERT statements.
+
+    Rows are pulled with fetchmany() and each chunk is written before the
+    next one is fetched, so memory stays bounded by batch_size no matter
+    how large the table is. Each INSERT carries up to rows_per_insert row
+    value expressions (capped at SQL Server's limit of 1000); 1 gives the
+    classic one-statement-per-row script.
+
+    An optional `progress` (ProgressReporter) is told about each table and
+    each written chunk (rows, characters); an optional `timer` (PhaseTimer)
+    gets the "query", "fetch", "encode" and "write" times.
+
+    Every scripted table is summarized in table_stats (rows, UTF-8 bytes,
+    seconds and, with a `digest`, a hash of its INSERT script).
+
+    Given the table's primary key, script_table() reads it in keyset chunks
+    (SELECT TOP (n) ... WHERE key > last ORDER BY key), one short query per
+    chunk, and hands each chunk boundary to a callback: that is where
+    exports checkpoint and switch to a new output segment.
+    """
+
+    def __init__(self, cursor, out: TextIO, batch_size: int = 5000, rows_per_insert: int = MAX_ROWS_PER_INSERT,
+                 progress=None, timer=None, digest: Optional[str] = None):
+        self.cursor = cursor
+        self.out = out
+        self.batch_size = max(1, int(batch_size))
+        self.rows_per_insert = min(max(1, int(rows_per_insert)), MAX_ROWS_PER_INSERT)
+        self.progress = progress
+        self.timer = timer or PhaseTimer()
+        self.digest = digest
+        self.table_stats: List[dict] = []
+
+    def script_table(self, table: str, schema: Optional[str] = None, key_columns: Optional[List[str]] = None,
+                     chunk_rows: int = 0, on_chunk: Optional[Callable] = None, resume: Optional[dict] = None,
+                     columns: Optional[List[str]] = None, where: Optional[str] = None, params=None) -> int:
+        """
+        Writes every row of `table` (in `schema`, if given) to the output.
+        Returns the row count. `columns` limits the script to those columns
+        (rowversion and computed ones can't be inserted); `where` (with
+        its `params`) to the matching rows, in unchunked reads.
+
+        With `key_columns` and `chunk_rows` the table is read in keyset
+        chunks; after each one on_chunk(last_key, done, stats) is called
+        with the running totals and returns the output for the next chunk.
+        `resume` ({"after", "rows", "bytes", "duration_seconds", "hash"})
+        continues a table after a checkpoint instead of starting it.
+        """
+        started = time.perf_counter()
+        resume = resume or {}
+        table_hash = resume.get("hash") or (new_digest(self.digest) if self.digest else None)
+        self._table_bytes = resume.get("bytes", 0)
+        total = resume.get("rows", 0)
+        previous_seconds = resume.get("duration_seconds", 0.0)
+        table_ident = f"{quote_ident(schema)}.{quote_ident(table)}" if schema else quote_ident(table)
+        table = f"{schema}.{table}" if schema else table
+        if not resume:
+            self.out.write(table_header(table))
+        if self.progress is not None:
+            self.progress.start_table(table)
+            if total:
+                self.progress.advance(total, self._table_bytes)
+
+        def running_stats():
+            return {
+                "rows": total,
+                "bytes": self._table_bytes,
+                "duration_seconds": previous_seconds + time.perf_counter() - started,
+            }
+
+        if key_columns and chunk_rows:
+            after = resume.get("after")
+            while True:
+                query, query_params = keyset_query(table_ident, key_columns, after, chunk_rows, columns)
+                with self.timer.phase("query"):
+                    self.cursor.execute(query, query_params)
+                rows, last_row, key_index = self._write_result(table_ident, table_hash, key_columns)
+                total += rows
+                if last_row is not None:
+                    after = [last_row[i] for i in key_index]
+                done = rows < chunk_rows
+                out = on_chunk(after, done, running_stats())
+                if done:
+                    break
+                self.out = out
+        else:
+            query = f"SELECT {select_list(columns)} FROM {table_ident}"
+            if params is not None:
+                query = query.replace("%", "%%")
+            if where:
+                query += f" WHERE {where}"
+            with self.timer.phase("query"):
+                self.cursor.execute(query, params)
+            total += self._write_result(table_ident, table_hash)[0]
+            if on_chunk is not None:
+                on_chunk(None, True, running_stats())
+
+        if self.progress is not None:
+            self.progress.finish_table()
+
+        self.table_stats.append({
+            "table_name": table,
+            "row_count": total,
+            "bytes": self._table_bytes,
+            "duration_seconds": round(running_stats()["duration_seconds"], 3),
+            "checksum": f"{self.digest}:{table_hash.hexdigest()}" if table_hash is not None else None,
+            "is_estimate": False,
+        })
+        return total
+
+    def script_deletes(self, table: str, schema: Optional[str], key_columns: List[str], query: str,
+                       params=None) -> int:
+        """
+        Runs `query`, which returns primary-key values (key_columns, in
+        order), and writes DELETE statements for those rows, up to
+        rows_per_insert keys each. Returns the number of keys.
+        """
+        table_ident = f"{quote_ident(schema)}.{quote_ident(table)}" if schema else quote_ident(table)
+        columns = [quote_ident(col) for col in key_columns]
+        with self.timer.phase("query"):
+            self.cursor.execute(query, params)
+        encoders = column_encoders(self.cursor.description)
+        total = 0
+        while True:
+            with self.timer.phase("fetch"):
+                rows = self.cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            with self.timer.phase("encode"):
+                resolve_encoders(encoders, list(zip(*rows)))
+                encode = [encoder or _encode_fallback for encoder in encoders]
+                per_statement = self.rows_per_insert
+                if len(columns) == 1:
+                    terms = [encode[0](row[0]) for row in rows]
+                    conditions = [
+                        f"{columns[0]} IN (" + ",".join(terms[i:i + per_statement]) + ")"
+                        for i in range(0, len(terms), per_statement)
+                    ]
+                else:
+                    terms = [
+                        "(" + " AND ".join(f"{c} = {e(v)}" for c, e, v in zip(columns, encode, row)) + ")"
+                        for row in rows
+                    ]
+                    conditions = [" OR ".join(terms[i:i + per_statement]) for i in range(0, len(terms), per_statement)]
+                chunk = "".join(f"DELETE FROM {table_ident} WHERE {condition};\n" for condition in conditions)
+            with self.timer.phase("write"):
+                self.out.write(chunk)
+            total += len(rows)
+        return total
+
+    def _write_result(self, table_ident: str, table_hash, key_columns: Optional[List[str]] = None):
+        """
+        Scripts the rows of the executed query. Returns (row count, last row,
+        positions of key_columns in it).
+        """
+        timer = self.timer
+        description = self.cursor.description
+        col_names = ", ".join(quote_ident(col[0]) for col in description)
+        encoders = column_encoders(description)
+        key_index = []
+        if key_columns:
+            names = [col[0] for col in description]
+            key_index = [names.index(col) for col in key_columns]
+
+        prefix = f"INSERT INTO {table_ident} ({col_names}) VALUES\n("
+        per_insert = self.rows_per_insert
+
+        total = 0
+        last_row = None
+        while True:
+            with timer.phase("fetch"):
+                rows = self.cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            last_row = rows[-1]
+
+            with timer.phase("encode"):
+                encoded = encode_rows(rows, encoders)
+                chunk = "".join(
+                    prefix + "),\n(".join(encoded[i:i + per_insert]) + ");\n"
+                    for i in range(0, len(encoded), per_insert)
+                )
+            with timer.phase("write"):
+                self.out.write(chunk)
+            with timer.phase("checksum"):
+                data = chunk.encode("utf-8")
+                self._table_bytes += len(data)
+                if table_hash is not None:
+                    table_hash.update(data)
+            total += len(rows)
+            if self.progress is not None:
+                self.progress.advance(len(rows), len(data))
+        return total, last_row, key_index
@@ -0,0 +1,176 @@
+import hashlib
+import io
+import os
+from typing import Optional
+
+from app.services.compression_service import CompressionService
+
+TEXT_BUFFER_SIZE = 1024 * 1024
+
+
+def new_digest(name: str):
+    """
+    hashlib algorithm ("sha256", "blake2b", ...) or an xxhash one
+    ("xxh64", "xxh3_64", "xxh3_128") when the xxhash package is installed.
+    """
+    if name.startswith("xxh"):
+        try:
+            import xxhash
+        except ImportError:
+            raise Exception(f"Digest '{name}' requires the 'xxhash' package (pip install xxhash)")
+        return getattr(xxhash, name)()
+    return hashlib.new(name)
+
+
+class _CountingWriter(io.RawIOBase):
+    """
+    Pass-through writer that counts (and optionally hashes) the bytes that
+    reach the file, so the checksum is ready the moment the file is closed.
+    With a PhaseTimer, hashing and writing are timed as "checksum"/"store".
+    """
+
+    def __init__(self, raw, digests=(), timer=None):
+        self.raw = raw
+        self.digests = list(digests)
+        self.bytes_written = 0
+        self.timer = timer
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.timer is None:
+            for digest in self.digests:
+                digest.update(data)
+            n = self.raw.write(data)
+        else:
+            with self.timer.phase("checksum"):
+                for digest in self.digests:
+                    digest.update(data)
+            with self.timer.phase("store"):
+                n = self.raw.write(data)
+        n = len(data) if n is None else n
+        self.bytes_written += n
+        return n
+
+    def flush(self):
+        self.raw.flush()
+
+
+class BackupOutput(io.RawIOBase):
+    """
+    Binary sink for a single backup artifact:
+
+        producer -> [compressor] -> sha256/secondary digest -> file
+
+    Dump producers write plain bytes (or text through text()); compression
+    happens inline, so nothing uncompressed ever lands on disk, and the
+    digests are computed over the stored bytes in the same pass. On failure
+    call discard() to remove the partial file. An optional PhaseTimer splits
+    the time into "compress", "checksum" and "store".
+    """
+
+    def __init__(self, path: str, codec: Optional[str] = None, level: Optional[int] = None,
+                 checksum: bool = True, secondary_digest: Optional[str] = None, sink=None, timer=None):
+        self.path = path
+        self.codec = CompressionService.validate(codec)
+        self.bytes_in = 0
+        self._sha256 = hashlib.sha256() if checksum else None
+        self._secondary = new_digest(secondary_digest) if secondary_digest else None
+        self.secondary_digest = secondary_digest
+        # sink: a StorageWriter (local file / S3 multipart) that replaces the plain file at `path`
+        self._sink = sink
+        self._file = sink if sink is not None else open(path, "wb")
+        self._stored = _CountingWriter(
+            self._file, [d for d in (self._sha256, self._secondary) if d is not None], timer
+        )
+        self._stream = CompressionService.open_writer(self._stored, codec, level) if codec else self._stored
+        self._text = None
+        self._timer = timer
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self._timer is not None and self._stream is not self._stored:
+            with self._timer.phase("compress"):
+                self._stream.write(data)
+        else:
+            self._stream.write(data)
+        n = len(data)
+        self.bytes_in += n
+        return n
+
+    def text(self) -> io.TextIOWrapper:
+        """
+        UTF-8 text view for scripters. Returned once and reused.
+        """
+        if self._text is None:
+            self._text = io.TextIOWrapper(
+                io.BufferedWriter(self, buffer_size=TEXT_BUFFER_SIZE), encoding="utf-8"
+            )
+        return self._text
+
+    @property
+    def bytes_out(self) -> int:
+        return self._stored.bytes_written
+
+    @property
+    def checksum(self) -> Optional[str]:
+        return self._sha256.hexdigest() if self._sha256 is not None else None
+
+    @property
+    def secondary_checksum(self) -> Optional[str]:
+        """
+        "<algorithm>:<hex>" so the value stays self-describing if the
+        configured algorithm changes later.
+        """
+        if self._secondary is None:
+            return None
+        return f"{self.secondary_digest}:{self._secondary.hexdigest()}"
+
+    @property
+    def compression_ratio(self) -> Optional[float]:
+        if not self.codec or not self.bytes_out:
+            return None
+        return round(self.bytes_in / self.bytes_out, 3)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._text is not None:
+                self._text.flush()
+            if self._stream is not self._stored:
+                self._close_timed("compress", self._stream)
+        finally:
+            # Completing a remote upload (last part, multipart commit) counts as "store"
+            self._close_timed("store", self._file)
+            super().close()
+
+    def _close_timed(self, phase: str, f):
+        if self._timer is None:
+            f.close()
+            return
+        with self._timer.phase(phase):
+            f.close()
+
+    def discard(self):
+        if self._sink is not None:
+            # Nothing is committed until the sink closes, so just abort it
+            self._sink.abort()
+            super().close()
+            return
+        try:
+            self.close()
+        except Exception:
+            pass
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.discard()
+        else:
+            self.close()
+        return False
@@ -0,0 +1,124 @@
+import re
+import time
+from typing import List, Optional
+
+from app.services.output_service import new_digest
+
+_COPY_HEADER = b"\nCOPY "
+_COPY_END = b"\n\\.\n"
+# COPY schema.table (cols) FROM stdin;  - either part may be "quoted"
+_IDENT = r'(?:"(?:[^"]|"")*"|[^\s."(]+)'
+_COPY_TARGET = re.compile(rf'COPY ({_IDENT}(?:\.{_IDENT})?)')
+
+
+def _unquote(name: str) -> str:
+    parts = re.findall(_IDENT, name)
+    return ".".join(p[1:-1].replace('""', '"') if p.startswith('"') else p for p in parts)
+
+
+class CopyStatsParser:
+    """
+    Watches a plain-format pg_dump stream go by and records per-table
+    statistics from its COPY blocks:
+
+        COPY public.orders (id, ...) FROM stdin;
+        1\t...
+        \\.
+
+    COPY data has one row per line (newlines inside values are escaped), so
+    rows are counted with bytes.count(). Only a few bytes are carried over
+    between chunks; the data itself is never copied. Duration is the time
+    between the block's header and terminator passing through, which is
+    pg_dump's time on that table as seen by the reader. `rows` is the running
+    total across tables; `progress`, when given, is told as tables start and end.
+    """
+
+    def __init__(self, digest: Optional[str] = None, progress=None):
+        self.digest = digest
+        self.progress = progress
+        self.rows = 0
+        self.table_stats: List[dict] = []
+        self._carry = b""
+        self._table = None
+        # Inside a block: whether buf[pos] starts a line, so "\." there ends it
+        self._line_start = False
+
+    def feed(self, data: bytes):
+        buf = self._carry + data if self._carry else data
+        pos = 0
+        end = len(buf)
+        while pos < end:
+            if self._table is None:
+                # Search from the newline before pos so a header right after "\." is seen
+                i = buf.find(_COPY_HEADER, max(pos - 1, 0))
+                if i < 0:
+                    self._carry = buf[max(end - len(_COPY_HEADER) + 1, pos):]
+                    return
+                j = buf.find(b"\n", i + 1)
+                if j < 0:
+                    self._carry = buf[i:]
+                    return
+                self._start(buf[i + 1:j])
+                pos = j + 1
+                self._line_start = True
+                continue
+
+            if self._line_start:
+                if buf.startswith(b"\\.\n", pos):
+                    self._finish()
+                    pos += 3
+                    continue
+                if end - pos < 3:
+                    # Could be the start of "\." - wait for the next chunk
+                    self._carry = buf[pos:]
+                    return
+
+            k = buf.find(_COPY_END, pos)
+            if k < 0:
+                # Keep enough to see a terminator split across chunks
+                safe = max(end - len(_COPY_END) + 1, pos)
+                if safe > pos:
+                    self._consume(buf, pos, safe)
+                    self._line_start = buf[safe - 1] == 0x0A
+                self._carry = buf[safe:]
+                return
+            self._consume(buf, pos, k + 1)
+            self._finish()
+            pos = k + len(_COPY_END)
+        self._carry = b""
+
+    def _start(self, header: bytes):
+        match = _COPY_TARGET.match(header.decode("utf-8", "replace"))
+        self._table = {
+            "table_name": _unquote(match.group(1)) if match else header[5:].decode("utf-8", "replace"),
+            "row_count": 0,
+            "bytes": 0,
+            "started": time.perf_counter(),
+            "hash": new_digest(self.digest) if self.digest else None,
+        }
+        if self.progress is not None:
+            self.progress.start_table(self._table["table_name"])
+
+    def _consume(self, buf: bytes, start: int, stop: int):
+        if stop <= start:
+            return
+        table = self._table
+        rows = buf.count(b"\n", start, stop)
+        table["row_count"] += rows
+        self.rows += rows
+        table["bytes"] += stop - start
+        if table["hash"] is not None:
+            table["hash"].update(memoryview(buf)[start:stop])
+
+    def _finish(self):
+        table, self._table = self._table, None
+        self.table_stats.append({
+            "table_name": table["table_name"],
+            "row_count": table["row_count"],
+            "bytes": table["bytes"],
+            "duration_seconds": round(time.perf_counter() - table["started"], 3),
+            "checksum": f"{self.digest}:{table['hash'].hexdigest()}" if table["hash"] is not None else None,
+            "is_estimate": False,
+        })
+        if self.progress is not None:
+            self.progress.finish_table()
@@ -0,0 +1,51 @@
+import re
+from collections import deque
+
+# pg_dump: dumping contents of table "public.orders"   (quotes missing before PG 12)
+_TABLE_START = re.compile(r'^pg_dump: dumping contents of table "?(.+?)"?$')
+# Parallel dumps (--jobs) also report each item a worker finished
+_TABLE_DONE = re.compile(r'^pg_dump: finished item \d+ TABLE DATA ')
+# "pg_dump: <word>" lines are --verbose chatter unless the word is a level
+_INFO = re.compile(r'^pg_dump: (?!error:|warning:|detail:|hint:|fatal:)[a-z]')
+DIAGNOSTIC_LINES = 50
+
+
+class PgDumpLogParser:
+    """
+    Reads pg_dump --verbose stderr line by line. "dumping contents of
+    table" lines become progress.start_table(); the table counts as done
+    when the next one starts, or, in a parallel dump where several run at
+    once, on its "finished item ... TABLE DATA" line. Everything that is
+    not verbose chatter (errors, warnings, server messages) is kept in
+    `diagnostics` for the error message.
+    """
+
+    def __init__(self, progress=None, parallel: bool = False):
+        self.progress = progress
+        self.parallel = parallel
+        self.diagnostics = deque(maxlen=DIAGNOSTIC_LINES)
+        self._in_flight = False
+
+    def feed(self, line: str):
+        if not _INFO.match(line):
+            if line.strip():
+                self.diagnostics.append(line)
+            return
+        if self.progress is None:
+            return
+        match = _TABLE_START.match(line)
+        if match:
+            if self._in_flight and not self.parallel:
+                self.progress.finish_table()
+            self._in_flight = True
+            self.progress.start_table(match.group(1))
+        elif self.parallel and _TABLE_DONE.match(line):
+            self.progress.finish_table()
+
+    def close(self):
+        if self._in_flight and not self.parallel and self.progress is not None:
+            self.progress.finish_table()
+        self._in_flight = False
+
+    def error_text(self, stderr_tail: str) -> str:
+        return "\n".join(self.diagnostics) or stderr_tail
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+from app.core.config import settings
+
+READ_SIZE = 1024 * 1024
+# Last stderr lines kept for error messages; the rest only goes to on_stderr_line
+STDERR_TAIL_LINES = 200
+WATCHDOG_SECONDS = 0.5
+
+
+class ProcessRunner:
+    """
+    Runs a dump tool (pg_dump) as a child process on an asyncio loop:
+    stdout is handed to `on_stdout` chunk by chunk, stderr to
+    `on_stderr_line` line by line as it is written, and a watchdog kills
+    the process when `cancel` (threading.Event) is set, when it has run
+    longer than `timeout` seconds or when nothing happened for
+    `stall_timeout` seconds. Output, log lines and a change in what
+    `activity()` returns (e.g. bytes in an output directory) all count.
+
+    The child gets its own process group (POSIX), so the kill also stops
+    the workers a parallel dump forks. Kills go out as SIGTERM, then
+    SIGKILL after BACKUP_PROCESS_KILL_GRACE_SECONDS.
+    """
+
+    @staticmethod
+    def run(cmd: List[str], env: dict = None, on_stdout: Callable[[bytes], None] = None,
+            on_stderr_line: Callable[[str], None] = None, cancel: threading.Event = None,
+            timeout: Optional[float] = None, stall_timeout: Optional[float] = None,
+            activity: Callable[[], int] = None) -> Tuple[int, str]:
+        """
+        Returns (exit code, last STDERR_TAIL_LINES of stderr). Raises when
+        the process was killed, or with on_stdout's own exception (the
+        process is killed first). on_stdout runs on the calling thread.
+        """
+        return asyncio.run(ProcessRunner._run(
+            cmd, env, on_stdout, on_stderr_line, cancel, timeout, stall_timeout, activity
+        ))
+
+    @staticmethod
+    async def _run(cmd, env, on_stdout, on_stderr_line, cancel, timeout, stall_timeout, activity):
+        name = os.path.basename(cmd[0])
+        process = await asyncio.create_subprocess_exec(
+            *cmd, env=env,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE if on_stdout else asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            limit=READ_SIZE,
+            start_new_session=os.name == "posix"
+        )
+        tail = deque(maxlen=STDERR_TAIL_LINES)
+        started = last_activity = time.monotonic()
+
+        async def pump_stdout():
+            nonlocal last_activity
+            while True:
+                data = await process.stdout.read(READ_SIZE)
+                if not data:
+                    return
+                last_activity = time.monotonic()
+                on_stdout(data)
+
+        async def pump_stderr():
+            nonlocal last_activity
+            while True:
+                line = await process.stderr.readline()
+                if not line:
+                    return
+                last_activity = time.monotonic()
+                line = line.decode("utf-8", "replace").rstrip("\r\n")
+                tail.append(line)
+                if on_stderr_line is not None:
+                    on_stderr_line(line)
+
+        tasks = {asyncio.ensure_future(pump_stderr()), asyncio.ensure_future(process.wait())}
+        if on_stdout:
+            tasks.add(asyncio.ensure_future(pump_stdout()))
+        probed = activity() if activity is not None else None
+        try:
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=WATCHDOG_SECONDS, return_when=asyncio.FIRST_EXCEPTION
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        raise task.exception()
+                if not pending:
+                    break
+
+                now = time.monotonic()
+                if activity is not None:
+                    current = activity()
+                    if current != probed:
+                        probed, last_activity = current, now
+                if cancel is not None and cancel.is_set():
+                    raise Exception(f"{name} was cancelled")
+                if timeout and now - started > timeout:
+                    raise Exception(f"{name} timed out after {timeout:.0f}s")
+                if stall_timeout and now - last_activity > stall_timeout:
+                    raise Exception(f"{name} stalled: no progress for {stall_timeout:.0f}s")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await ProcessRunner._terminate(process)
+        return process.returncode, "\n".join(tail)
+
+    @staticmethod
+    async def _terminate(process):
+        if process.returncode is not None:
+            return
+        ProcessRunner._signal(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), settings.BACKUP_PROCESS_KILL_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            ProcessRunner._signal(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+            await process.wait()
+
+    @staticmethod
+    def _signal(process, sig):
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, sig)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
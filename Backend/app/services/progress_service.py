@@ -0,0 +1,304 @@
+"""
+Live backup progress: engines report to a ProgressReporter, which publishes
+throttled events to subscribers (the SSE endpoints) and, less often,
+persists a snapshot on the BackupHistory row.
+
+Transport follows JOB_QUEUE_BACKEND:
+
+  * celery - workers PUBLISH JSON events on a Redis channel per user and keep
+    the latest event per job under a short-lived key for late subscribers;
+  * local  - pool processes put events on a multiprocessing queue that a
+    thread in the API process fans out through the in-memory ProgressBus.
+"""
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from app.core.config import settings
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+CHANNEL = "backup:progress:{user_id}"
+LATEST_KEY = "backup:progress:latest:{history_id}"
+LATEST_TTL_SECONDS = 60 * 60
+
+
+class ProgressReporter:
+    """
+    Thread-safe progress counter for one backup. Engines call start_table()
+    and advance(); events go out at most every PROGRESS_PUBLISH_SECONDS and
+    `persist` is called at most every PROGRESS_DB_WRITE_SECONDS, so a job
+    writing millions of rows costs a handful of metadata-DB updates.
+
+    Engines report all the time, so this is also where a cancelled job
+    stops: once `cancel` (threading.Event) is set, start_table() and
+    advance() raise.
+    """
+
+    def __init__(self, history_id, user_id, persist: Optional[Callable[[dict], None]] = None,
+                 rows_total: Optional[int] = None, bytes_total: Optional[int] = None,
+                 tables_total: Optional[int] = None, cancel: Optional[threading.Event] = None):
+        self.history_id = str(history_id)
+        self.user_id = str(user_id)
+        self.persist = persist
+        self.cancel = cancel
+        self.rows_total = rows_total
+        self.bytes_total = bytes_total
+        self.tables_total = tables_total
+        self.table = None
+        self.tables_done = 0
+        self.rows = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._last_publish = 0.0
+        self._last_persist = self._started
+
+    def set_estimates(self, rows_total: Optional[int] = None, bytes_total: Optional[int] = None,
+                      tables_total: Optional[int] = None):
+        with self._lock:
+            self.rows_total = rows_total or self.rows_total
+            self.bytes_total = bytes_total or self.bytes_total
+            self.tables_total = tables_total or self.tables_total
+        self._emit(force=True)
+
+    def start_table(self, table: str):
+        self._check_cancelled()
+        with self._lock:
+            self.table = table
+        self._emit()
+
+    def finish_table(self):
+        with self._lock:
+            self.tables_done += 1
+        self._emit()
+
+    def advance(self, rows: int = 0, nbytes: int = 0):
+        self._check_cancelled()
+        with self._lock:
+            self.rows += rows
+            self.bytes += nbytes
+        self._emit()
+
+    def _check_cancelled(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise Exception("Backup was cancelled")
+
+    def finish(self, status: str, error: Optional[str] = None):
+        """
+        Final event. The task writes the final row itself, so no persist.
+        """
+        event = self.snapshot(status)
+        if error:
+            event["error_message"] = error
+        publish_progress(event)
+
+    def snapshot(self, status: str = "running") -> dict:
+        with self._lock:
+            elapsed = max(time.monotonic() - self._started, 1e-6)
+            rows_per_sec = self.rows / elapsed
+            bytes_per_sec = self.bytes / elapsed
+            percent = eta = None
+            if self.rows_total:
+                percent = self.rows / self.rows_total
+                eta = (self.rows_total - self.rows) / rows_per_sec if rows_per_sec else None
+            elif self.bytes_total:
+                percent = self.bytes / self.bytes_total
+                eta = (self.bytes_total - self.bytes) / bytes_per_sec if bytes_per_sec else None
+            if status == "completed":
+                percent, eta = 1.0, 0
+            elif percent is not None:
+                # Estimates are statistics, not counts: never claim done before it is
+                percent = min(percent, 0.99)
+                eta = max(int(eta), 0) if eta is not None else None
+            return {
+                "history_id": self.history_id,
+                "user_id": self.user_id,
+                "status": status,
+                "table": self.table,
+                "tables_done": self.tables_done,
+                "tables_total": self.tables_total,
+                "rows": self.rows,
+                "rows_total": self.rows_total,
+                "bytes": self.bytes,
+                "bytes_total": self.bytes_total,
+                "rows_per_sec": round(rows_per_sec, 1),
+                "bytes_per_sec": round(bytes_per_sec, 1),
+                "percent": round(percent * 100, 1) if percent is not None else None,
+                "eta_seconds": eta,
+                "elapsed_seconds": round(elapsed, 1),
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }
+
+    def _emit(self, force: bool = False):
+        now = time.monotonic()
+        publish = force or now - self._last_publish >= settings.PROGRESS_PUBLISH_SECONDS
+        persist = self.persist is not None and now - self._last_persist >= settings.PROGRESS_DB_WRITE_SECONDS
+        if not (publish or persist):
+            return
+        event = self.snapshot()
+        if publish:
+            self._last_publish = now
+            publish_progress(event)
+        if persist:
+            self._last_persist = now
+            try:
+                self.persist(event)
+            except Exception as e:
+                print(f"!!! Could not save progress for {self.history_id}: {e} !!!")
+
+
+class ProgressBus:
+    """
+    In-process fan-out of progress events to asyncio subscribers. publish()
+    may be called from any thread; each subscriber gets its events on its
+    own event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, set] = {}
+        self._latest: Dict[str, dict] = {}
+
+    def publish(self, event: dict):
+        with self._lock:
+            if event["status"] in TERMINAL_STATUSES:
+                self._latest.pop(event["history_id"], None)
+            else:
+                self._latest[event["history_id"]] = event
+            subscribers = list(self._subscribers.get(event["user_id"], ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                pass  # subscriber's loop already closed
+
+    def latest(self, history_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._latest.get(str(history_id))
+
+    def subscribe(self, user_id: str):
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(str(user_id), set()).add(entry)
+        return entry
+
+    def unsubscribe(self, user_id: str, entry):
+        with self._lock:
+            subscribers = self._subscribers.get(str(user_id))
+            if subscribers is not None:
+                subscribers.discard(entry)
+                if not subscribers:
+                    del self._subscribers[str(user_id)]
+
+
+bus = ProgressBus()
+
+# Set in local pool worker processes (see init_worker); None in the API process
+_forward_queue = None
+_redis = None
+
+
+def _use_redis() -> bool:
+    return settings.JOB_QUEUE_BACKEND.lower() == "celery"
+
+
+def _redis_client():
+    global _redis
+    if _redis is None:
+        import redis
+        _redis = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis
+
+
+def init_worker(queue):
+    """
+    ProcessPoolExecutor initializer: route this process's events to the API process.
+    """
+    global _forward_queue
+    _forward_queue = queue
+
+
+def forward_events(queue):
+    """
+    API-process side of init_worker: drains the pool's queue into the bus.
+    Runs forever in a daemon thread.
+    """
+    while True:
+        event = queue.get()
+        try:
+            bus.publish(event)
+        except Exception as e:
+            print(f"!!! Could not publish progress: {e} !!!")
+
+
+def publish_progress(event: dict):
+    try:
+        if _use_redis():
+            payload = json.dumps(event)
+            client = _redis_client()
+            pipe = client.pipeline(transaction=False)
+            pipe.publish(CHANNEL.format(user_id=event["user_id"]), payload)
+            pipe.set(LATEST_KEY.format(history_id=event["history_id"]), payload, ex=LATEST_TTL_SECONDS)
+            pipe.execute()
+        elif _forward_queue is not None:
+            _forward_queue.put_nowait(event)
+        else:
+            bus.publish(event)
+    except Exception as e:
+        # Progress is best effort: never fail a backup over it
+        print(f"!!! Could not publish progress: {e} !!!")
+
+
+async def latest_progress(history_id) -> Optional[dict]:
+    if not _use_redis():
+        return bus.latest(history_id)
+    import redis.asyncio as aioredis
+    client = aioredis.Redis.from_url(settings.REDIS_URL)
+    try:
+        payload = await client.get(LATEST_KEY.format(history_id=history_id))
+    finally:
+        await client.aclose()
+    return json.loads(payload) if payload else None
+
+
+@asynccontextmanager
+async def subscribe_progress(user_id):
+    """
+    Subscribes to a user's progress events for the duration of the block.
+    Yields `receive(timeout)`, which returns the next event or None after
+    `timeout` seconds of silence (callers send keep-alives then). Entering
+    before reading current state means no event falls in between.
+    """
+    if not _use_redis():
+        entry = bus.subscribe(user_id)
+
+        async def receive(timeout: float) -> Optional[dict]:
+            try:
+                return await asyncio.wait_for(entry[1].get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        try:
+            yield receive
+        finally:
+            bus.unsubscribe(user_id, entry)
+        return
+
+    import redis.asyncio as aioredis
+    client = aioredis.Redis.from_url(settings.REDIS_URL)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(CHANNEL.format(user_id=user_id))
+
+    async def receive(timeout: float) -> Optional[dict]:
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message["data"]) if message else None
+
+    try:
+        yield receive
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
@@ -0,0 +1,259 @@
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.services.backup_service import COPY_BUFFER_SIZE, BackupService
+from app.services.compression_service import CompressionService
+from app.services.mssql_replayer import MSSQLReplayer, iter_statements
+from app.services.storage_service import StorageService
+
+
+class _CountingReader(io.RawIOBase):
+    """
+    Pass-through reader that counts and SHA-256 hashes the stored bytes as
+    they are consumed, so the backup checksum is verified in the same pass
+    that restores it.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        self.sha256.update(data)
+        self.bytes_read += n
+        return n
+
+    def close(self):
+        try:
+            self.raw.close()
+        finally:
+            super().close()
+
+
+class RestoreService:
+    """
+    Restores a finished backup artifact into a database connection.
+
+    Postgres custom/directory archives go through pg_restore --jobs=N (N is
+    the connection's parallel_jobs, like pg_dump); plain SQL is piped into
+    psql as a single transaction. MSSQL scripts are replayed in batches by
+    MSSQLReplayer. Every run returns throughput figures for RestoreHistory.
+    """
+
+    @staticmethod
+    def run_pg_restore(conn_details: dict, storage, location: str, backup_format: str,
+                       codec: str = None, clean: bool = False, expected_checksum: str = None) -> dict:
+        env = os.environ.copy()
+        env["PGPASSWORD"] = conn_details['password']
+        jobs = max(1, int(conn_details.get('parallel_jobs') or 1))
+        started = time.monotonic()
+
+        target = [
+            "-h", conn_details['host'],
+            "-p", str(conn_details['port']),
+            "-U", conn_details['username'],
+            "-d", conn_details['database_name'],
+            "-w"
+        ]
+
+        if backup_format == "sql":
+            stats = RestoreService._run_psql(target, env, storage, location, codec, expected_checksum)
+            return RestoreService._result(stats, started, jobs=1)
+
+        cmd = [BackupService._get_pg_tool_path("pg_restore")] + target + [
+            f"--jobs={jobs}", "--no-owner", "--no-privileges"
+        ]
+        if clean:
+            cmd.extend(["--clean", "--if-exists"])
+
+        scratch_dir = tempfile.mkdtemp(prefix=".pg_restore_", dir=settings.RESTORE_SCRATCH_DIR)
+        try:
+            if backup_format == "directory":
+                archive, stats = RestoreService._extract_directory(storage, location, scratch_dir, expected_checksum)
+                cmd.extend(["-Fd", archive])
+            else:
+                archive, stats = RestoreService._local_archive(storage, location, scratch_dir, expected_checksum)
+                cmd.extend(["-Fc", archive])
+
+            print(f"--- pg_restore with {jobs} job(s) ---")
+            process = subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            RestoreService._check_result("pg_restore", process.returncode, process.stderr)
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        return RestoreService._result(stats, started, jobs)
+
+    @staticmethod
+    def _local_archive(storage, location: str, scratch_dir: str, expected_checksum: str = None):
+        """
+        pg_restore --jobs needs a seekable archive: plain local backups are
+        used in place (after a hashing pass when a checksum is expected),
+        the others (remote, deduplicated, encrypted) are downloaded and
+        verified into scratch_dir first.
+        """
+        if StorageService.is_readable_in_place(location):
+            if not os.path.exists(location):
+                raise Exception(f"Backup file not found: {location}")
+            if expected_checksum and BackupService._generate_checksum(location) != expected_checksum:
+                raise Exception("Backup checksum mismatch: the stored file is corrupt or was modified")
+            return location, {"bytes_read": os.path.getsize(location)}
+
+        archive = os.path.join(scratch_dir, "archive.dump")
+        reader = _CountingReader(StorageService.open_reader(storage, location))
+        with reader, open(archive, "wb") as f:
+            shutil.copyfileobj(reader, f, COPY_BUFFER_SIZE)
+        RestoreService._verify(reader, expected_checksum)
+        return archive, {"bytes_read": reader.bytes_read}
+
+    @staticmethod
+    def _extract_directory(storage, location: str, scratch_dir: str, expected_checksum: str = None):
+        """
+        Unpacks the tar written by _run_pg_dump_directory straight from
+        storage (streaming, no local copy of the tar) into scratch_dir.
+        """
+        reader = _CountingReader(StorageService.open_reader(storage, location))
+        with reader:
+            with tarfile.open(fileobj=reader, mode="r|") as tar:
+                tar.extractall(scratch_dir, filter="data")
+            # Drain tar's end-of-archive padding so the checksum covers the whole file
+            while reader.read(COPY_BUFFER_SIZE):
+                pass
+        RestoreService._verify(reader, expected_checksum)
+        archive = os.path.join(scratch_dir, "dump")
+        if not os.path.isdir(archive):
+            raise Exception("Directory backup does not contain a 'dump' folder")
+        return archive, {"bytes_read": reader.bytes_read}
+
+    @staticmethod
+    def _run_psql(target: list, env: dict, storage, location: str, codec: str = None,
+                  expected_checksum: str = None) -> dict:
+        """
+        Streams a plain SQL dump (decompressed on the fly) into psql. The
+        checksum is checked before psql's stdin is closed, so a corrupt
+        file is rolled back instead of committed.
+        """
+        cmd = [BackupService._get_pg_tool_path("psql")] + target + [
+            "-X", "-q", "-v", "ON_ERROR_STOP=1", "--single-transaction", "-f", "-"
+        ]
+        reader = _CountingReader(StorageService.open_reader(storage, location))
+        with tempfile.TemporaryFile() as stderr_file, reader:
+            process = subprocess.Popen(cmd, env=env, stdin=subprocess.PIPE,
+                                       stdout=subprocess.DEVNULL, stderr=stderr_file)
+            try:
+                stream = CompressionService.open_reader(reader, codec) if codec else reader
+                while True:
+                    chunk = stream.read(COPY_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    process.stdin.write(chunk)
+                RestoreService._verify(reader, expected_checksum)
+                process.stdin.close()
+                returncode = process.wait()
+            except BrokenPipeError:
+                # psql stopped reading (ON_ERROR_STOP); its stderr says why
+                returncode = process.wait()
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+            stderr_file.seek(0)
+            RestoreService._check_result("psql", returncode, stderr_file.read().decode("utf-8", "replace"))
+        return {"bytes_read": reader.bytes_read}
+
+    @staticmethod
+    def run_mssql_restore(conn_details: dict, storage, location: str, codec: str = None,
+                          clean: bool = False, expected_checksum: str = None) -> dict:
+        """
+        Replays a script produced by run_mssql_backup, streaming it from
+        storage through the decompressor and statement splitter.
+        """
+        started = time.monotonic()
+        conn = BackupService._connect_mssql(conn_details)
+        reader = _CountingReader(StorageService.open_reader(storage, location))
+        try:
+            stream = CompressionService.open_reader(reader, codec) if codec else io.BufferedReader(reader, COPY_BUFFER_SIZE)
+            text = io.TextIOWrapper(stream, encoding="utf-8")
+
+            def statements():
+                yield from iter_statements(text)
+                # Before the replayer's final commit, so a corrupt file rolls back its open batch
+                RestoreService._verify(reader, expected_checksum)
+
+            replayer = MSSQLReplayer(
+                conn,
+                batch_statements=settings.MSSQL_RESTORE_BATCH_STATEMENTS,
+                commit_statements=settings.MSSQL_RESTORE_COMMIT_STATEMENTS,
+                clean=clean
+            )
+            replayer.replay(statements())
+        except Exception as e:
+            raise Exception(f"MSSQL Restore Failed: {str(e)}")
+        finally:
+            reader.close()
+            conn.close()
+
+        stats = {
+            "bytes_read": reader.bytes_read,
+            "rows_restored": replayer.rows,
+            "tables_restored": replayer.tables,
+        }
+        return RestoreService._result(stats, started, jobs=1)
+
+    @staticmethod
+    def run_mssql_chain_restore(conn_details: dict, steps: list, clean: bool = False) -> dict:
+        """
+        Replays an incremental chain: the full base first (emptying the
+        tables with clean=True), then each increment in order. `steps` are
+        {"storage", "location", "codec", "expected_checksum"}, oldest first.
+        A failing step stops the chain; the steps before it stay applied.
+        """
+        started = time.monotonic()
+        stats = {"bytes_read": 0, "rows_restored": 0, "tables_restored": 0}
+        for i, step in enumerate(steps):
+            print(f"--- Replaying chain step {i + 1}/{len(steps)}: {step['location']} ---")
+            result = RestoreService.run_mssql_restore(
+                conn_details, step["storage"], step["location"], codec=step["codec"],
+                clean=clean and i == 0, expected_checksum=step["expected_checksum"]
+            )
+            stats["bytes_read"] += result["bytes_restored"]
+            stats["rows_restored"] += result["rows_restored"] or 0
+            stats["tables_restored"] = max(stats["tables_restored"], result["tables_restored"] or 0)
+        return RestoreService._result(stats, started, jobs=1)
+
+    @staticmethod
+    def _verify(reader: _CountingReader, expected_checksum: Optional[str]):
+        if expected_checksum and reader.sha256.hexdigest() != expected_checksum:
+            raise Exception("Backup checksum mismatch: the stored file is corrupt or was modified")
+
+    @staticmethod
+    def _check_result(tool: str, returncode: int, stderr: str):
+        if returncode != 0:
+            # Keep the tail: pg_restore lists every failed object before its summary
+            raise Exception(f"{tool} failed: {stderr[-4000:]}")
+
+    @staticmethod
+    def _result(stats: dict, started: float, jobs: int) -> dict:
+        duration = time.monotonic() - started
+        bytes_read = stats.get("bytes_read") or 0
+        return {
+            "bytes_restored": bytes_read,
+            "rows_restored": stats.get("rows_restored"),
+            "tables_restored": stats.get("tables_restored"),
+            "parallel_jobs": jobs,
+            "duration_seconds": round(duration, 3),
+            "throughput_bytes_per_sec": round(bytes_read / duration, 1) if duration > 0 else None,
+        }
@@ -0,0 +1,224 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, exists, func, literal, not_, or_, select, union_all, update
+
+from app.core.config import settings
+from app.models.history import BackupChunk, BackupChunkRef, BackupHistory, BackupStatus, RestoreHistory
+from app.models.schedule import BackupSchedule
+from app.models.storage import StorageConfiguration
+from app.services.storage_service import StorageService
+
+TERMINAL_STATUSES = (BackupStatus.completed, BackupStatus.failed, BackupStatus.cancelled)
+FAILED_STATUSES = (BackupStatus.failed, BackupStatus.cancelled)
+ACTIVE_STATUSES = (BackupStatus.pending, BackupStatus.running)
+
+
+class RetentionService:
+    """
+    Picks and removes backups that fall outside the retention policy:
+
+      * per connection, only the newest N successful backups are kept, where
+        N is the largest max_backups among the connection's schedules
+        (RETENTION_KEEP_SUCCESSFUL when it has none);
+      * per connection, only the newest RETENTION_KEEP_FAILED failed (and
+        cancelled) runs are kept;
+      * scheduled backups older than their schedule's retention_days go,
+        except the newest successful backup of a connection, which is
+        always kept.
+
+    Pending/running rows, backups an active restore is reading and
+    backups an incremental backup still builds on are never touched; a
+    chain is released from its newest increment down. Deleting a
+    deduplicated backup only removes its manifest; its chunks go in
+    collect_chunks() once no backup uses them.
+    """
+
+    @staticmethod
+    def expired_query(now: datetime, limit: int):
+        """
+        One statement: ROW_NUMBER() over (user, connection), newest first,
+        once for completed runs ("ok") and once for failed and cancelled
+        ones together ("failed", so RETENTION_KEEP_FAILED bounds both at
+        once), joined with the per-connection limits. The completed window
+        reads idx_backup_history_user_connection_status_created in order;
+        only the failed one, a few rows per connection, is sorted.
+        """
+        ranked = union_all(
+            RetentionService._ranked(BackupHistory.status == BackupStatus.completed, "ok"),
+            RetentionService._ranked(BackupHistory.status.in_(FAILED_STATUSES), "failed"),
+        ).subquery("ranked")
+
+        limits = select(
+            BackupSchedule.connection_id,
+            func.max(BackupSchedule.max_backups).label("max_backups")
+        ).group_by(BackupSchedule.connection_id).subquery("limits")
+
+        completed = ranked.c.outcome == "ok"
+        # Never below 1: the newest good backup survives any setting
+        keep_successful = func.greatest(func.coalesce(limits.c.max_backups, settings.RETENTION_KEEP_SUCCESSFUL), 1)
+        too_old = and_(
+            ranked.c.retention_days.isnot(None),
+            ranked.c.created_at < now - func.make_interval(0, 0, 0, ranked.c.retention_days)
+        )
+        in_use = select(RestoreHistory.backup_id).where(
+            RestoreHistory.status.in_(ACTIVE_STATUSES),
+            RestoreHistory.backup_id.isnot(None)
+        )
+        # Served by idx_backup_history_parent
+        has_increments = select(BackupHistory.parent_backup_id).where(BackupHistory.parent_backup_id.isnot(None))
+
+        return select(
+            ranked.c.id, ranked.c.file_path, ranked.c.storage_id
+        ).outerjoin(
+            limits, limits.c.connection_id == ranked.c.connection_id
+        ).where(
+            or_(
+                and_(completed, ranked.c.rn > keep_successful),
+                and_(not_(completed), ranked.c.rn > settings.RETENTION_KEEP_FAILED),
+                and_(too_old, not_(and_(completed, ranked.c.rn == 1)))
+            ),
+            ranked.c.id.notin_(in_use),
+            ranked.c.id.notin_(has_increments)
+        ).order_by(ranked.c.created_at).limit(limit)
+
+    @staticmethod
+    def _ranked(status_filter, outcome: str):
+        rank = func.row_number().over(
+            partition_by=(BackupHistory.user_id, BackupHistory.connection_id),
+            order_by=(BackupHistory.created_at.desc(), BackupHistory.id.desc())
+        )
+        return select(
+            BackupHistory.id,
+            BackupHistory.connection_id,
+            literal(outcome).label("outcome"),
+            BackupHistory.created_at,
+            BackupHistory.file_path,
+            BackupHistory.storage_id,
+            BackupSchedule.retention_days,
+            rank.label("rn")
+        ).outerjoin(
+            BackupSchedule, BackupSchedule.id == BackupHistory.schedule_id
+        ).where(status_filter)
+
+    @staticmethod
+    def prune(session_factory, now: Optional[datetime] = None, batch_size: Optional[int] = None) -> int:
+        """
+        Deletes expired backups batch by batch: select (one short read),
+        delete files in bulk with no transaction open, then delete the rows
+        whose files are gone in one short transaction. Returns rows removed.
+        """
+        now = now or datetime.now(timezone.utc)
+        batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+        removed = 0
+        while True:
+            db = session_factory()
+            try:
+                rows = db.execute(RetentionService.expired_query(now, batch_size)).all()
+                storage_ids = {row.storage_id for row in rows if row.storage_id}
+                storages = {
+                    s.id: s for s in db.query(StorageConfiguration).filter(StorageConfiguration.id.in_(storage_ids))
+                } if storage_ids else {}
+                db.rollback()
+            finally:
+                db.close()
+            if not rows:
+                return removed
+
+            gone = RetentionService._delete_files(rows, storages)
+            ids = [row.id for row in rows if not row.file_path or row.file_path in gone]
+            if ids:
+                db = session_factory()
+                try:
+                    db.query(BackupHistory).filter(
+                        BackupHistory.id.in_(ids),
+                        BackupHistory.status.in_(TERMINAL_STATUSES)
+                    ).delete(synchronize_session=False)
+                    db.commit()
+                finally:
+                    db.close()
+            removed += len(ids)
+
+            # A short batch is the last one; no progress means only undeletable files are left
+            if len(rows) < batch_size or not ids:
+                return removed
+
+    @staticmethod
+    def collect_chunks(session_factory, now: Optional[datetime] = None, batch_size: Optional[int] = None) -> int:
+        """
+        Deletes deduplicated-storage chunks (see ChunkStoreWriter) that no
+        backup refers to and none has reused for BACKUP_DEDUP_GC_GRACE_HOURS.
+        Chunks are claimed (deleting = true) before their objects go, so a
+        running backup never picks one up halfway; a claimed chunk whose
+        object could not be deleted is retried on the next pass. Returns
+        chunks removed.
+        """
+        now = now or datetime.now(timezone.utc)
+        batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+        cutoff = now - timedelta(hours=settings.BACKUP_DEDUP_GC_GRACE_HOURS)
+        unreferenced = ~exists().where(BackupChunkRef.chunk_id == BackupChunk.id)
+        removed = 0
+        while True:
+            db = session_factory()
+            try:
+                stale = select(BackupChunk.id).where(
+                    unreferenced, BackupChunk.deleting.is_(False), BackupChunk.last_used_at < cutoff
+                ).limit(batch_size)
+                db.execute(
+                    update(BackupChunk).where(
+                        BackupChunk.id.in_(stale), BackupChunk.deleting.is_(False), BackupChunk.last_used_at < cutoff
+                    ).values(deleting=True),
+                    execution_options={"synchronize_session": False}
+                )
+                db.commit()
+                rows = db.execute(
+                    select(BackupChunk.id, BackupChunk.storage_id, BackupChunk.location.label("file_path")).where(
+                        BackupChunk.deleting.is_(True)
+                    ).limit(batch_size)
+                ).all()
+                storage_ids = {row.storage_id for row in rows if row.storage_id}
+                storages = {
+                    s.id: s for s in db.query(StorageConfiguration).filter(StorageConfiguration.id.in_(storage_ids))
+                } if storage_ids else {}
+                db.rollback()
+            finally:
+                db.close()
+            if not rows:
+                return removed
+
+            gone = RetentionService._delete_files(rows, storages)
+            ids = [row.id for row in rows if row.file_path in gone]
+            if ids:
+                db = session_factory()
+                try:
+                    db.query(BackupChunk).filter(
+                        BackupChunk.id.in_(ids), BackupChunk.deleting.is_(True), unreferenced
+                    ).delete(synchronize_session=False)
+                    db.commit()
+                finally:
+                    db.close()
+            removed += len(ids)
+
+            if len(rows) < batch_size or not ids:
+                return removed
+
+    @staticmethod
+    def _delete_files(rows, storages: dict) -> set:
+        by_storage = {}
+        for row in rows:
+            if row.file_path:
+                by_storage.setdefault(row.storage_id, []).append(row.file_path)
+
+        gone = set()
+        for storage_id, locations in by_storage.items():
+            storage = storages.get(storage_id)
+            if storage is None:
+                # Storage config was deleted: its objects can't be reached any more, just drop the rows
+                unreachable = [l for l in locations if StorageService.is_remote(l)]
+                gone.update(unreachable)
+                locations = [l for l in locations if not StorageService.is_remote(l)]
+            try:
+                gone.update(StorageService.delete_many(storage, locations))
+            except Exception as e:
+                print(f"!!! Retention could not delete files from storage {storage_id}: {e} !!!")
+        return gone
@@ -0,0 +1,121 @@
+import calendar
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.models.history import BackupHistory, BackupStatus
+from app.models.schedule import BackupSchedule, ScheduleFrequency
+
+FIXED_INTERVALS = {
+    ScheduleFrequency.hourly: timedelta(hours=1),
+    ScheduleFrequency.daily: timedelta(days=1),
+    ScheduleFrequency.weekly: timedelta(weeks=1),
+}
+
+
+class ScheduleService:
+    """
+    Works out when a schedule fires next and builds the history rows it
+    produces. All datetimes are timezone-aware UTC.
+    """
+
+    @staticmethod
+    def validate(frequency, cron_expression: Optional[str]):
+        if ScheduleFrequency(frequency) != ScheduleFrequency.custom:
+            return
+        if not cron_expression:
+            raise Exception("A custom schedule needs a cron_expression")
+        croniter = ScheduleService._croniter()
+        if not croniter.is_valid(cron_expression):
+            raise Exception(f"Invalid cron expression '{cron_expression}'")
+
+    @staticmethod
+    def next_run_at(frequency, cron_expression: Optional[str] = None,
+                    previous: Optional[datetime] = None, now: Optional[datetime] = None,
+                    anchor_day: Optional[int] = None) -> Optional[datetime]:
+        """
+        First fire time strictly after `now`.
+
+        Fixed frequencies step from the previous fire time so runs don't
+        drift by however late the scheduler tick was; missed runs (scheduler
+        down for a while) are skipped rather than fired back to back.
+        Monthly runs land on `anchor_day` (see anchor_day()), clamped to
+        short months, so a run on the 31st moved to Feb 28 goes back to
+        the 31st in March. Manual schedules never fire on their own.
+        """
+        frequency = ScheduleFrequency(frequency)
+        now = now or datetime.now(timezone.utc)
+        if frequency == ScheduleFrequency.manual:
+            return None
+
+        if frequency == ScheduleFrequency.custom:
+            ScheduleService.validate(frequency, cron_expression)
+            croniter = ScheduleService._croniter()
+            return croniter(cron_expression, now).get_next(datetime)
+
+        if previous is None:
+            if frequency == ScheduleFrequency.monthly and anchor_day:
+                # e.g. re-enabled on the 15th, anchored on the 20th: this month still counts
+                this_month = now.replace(day=min(anchor_day, calendar.monthrange(now.year, now.month)[1]))
+                if this_month > now:
+                    return this_month
+            return ScheduleService._step(frequency, now, anchor_day)
+
+        next_run = previous
+        if frequency in FIXED_INTERVALS:
+            interval = FIXED_INTERVALS[frequency]
+            if next_run <= now:
+                # Jump straight past `now` instead of looping over every missed run
+                missed = (now - next_run) // interval
+                next_run += interval * missed
+        while next_run <= now:
+            next_run = ScheduleService._step(frequency, next_run, anchor_day)
+        return next_run
+
+    @staticmethod
+    def anchor_day(schedule: BackupSchedule) -> Optional[int]:
+        """
+        Day of month a monthly schedule fires on: the day it was created.
+        """
+        if schedule.created_at is None:
+            return None
+        created_at = schedule.created_at
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc)
+        return created_at.day
+
+    @staticmethod
+    def _step(frequency: ScheduleFrequency, moment: datetime, anchor_day: Optional[int] = None) -> datetime:
+        if frequency in FIXED_INTERVALS:
+            return moment + FIXED_INTERVALS[frequency]
+        # monthly: the anchor day next month, clamped to the month's last day.
+        # Never the (possibly clamped) day of `moment`, or a 31st would stick at 28.
+        year, month = (moment.year + 1, 1) if moment.month == 12 else (moment.year, moment.month + 1)
+        day = min(anchor_day or moment.day, calendar.monthrange(year, month)[1])
+        return moment.replace(year=year, month=month, day=day)
+
+    @staticmethod
+    def build_history(schedule: BackupSchedule, user_id=None) -> BackupHistory:
+        """
+        New pending BackupHistory row carrying the schedule's backup options.
+        """
+        return BackupHistory(
+            user_id=user_id or schedule.user_id,
+            connection_id=schedule.connection_id,
+            schedule_id=schedule.id,
+            storage_id=schedule.storage_id,
+            backup_type=schedule.backup_type,
+            backup_format=schedule.backup_format,
+            compression_enabled=schedule.compression_enabled,
+            compression_codec=(schedule.compression_codec or "gzip") if schedule.compression_enabled else None,
+            encryption_enabled=schedule.encryption_enabled,
+            status=BackupStatus.pending,
+            created_at=datetime.now(timezone.utc)
+        )
+
+    @staticmethod
+    def _croniter():
+        try:
+            from croniter import croniter
+        except ImportError:
+            raise Exception("Cron schedules require the 'croniter' package (pip install croniter)")
+        return croniter
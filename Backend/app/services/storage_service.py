@@ -1,27 +1,504 @@
+import io
+import json
 import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, Optional
 import boto3
 from botocore.client import Config
+from app.core.config import settings
 from app.models.storage import StorageType
+from app.services.crypto_service import decrypt
+from app.services.encryption_service import EncryptionService
+
+MIB = 1024 * 1024
+# S3 rejects non-final parts under 5 MiB and uploads over 10,000 parts
+S3_MIN_PART_SIZE = 5 * MIB
+S3_MAX_PARTS = 10000
+S3_MAX_DELETE_KEYS = 1000
+READ_CHUNK_SIZE = MIB
+S3_PREFIX = "s3://"
+# S3-compatible (XML API) endpoint used for GCS buckets with HMAC keys
+GCS_ENDPOINT = "https://storage.googleapis.com"
+# Deduplicated backups are stored as "<file name>.chunks", a manifest of their chunks
+MANIFEST_SUFFIX = ".chunks"
+# Encrypted backups are stored as "<file name>.enc", see EncryptingWriter
+ENCRYPTED_SUFFIX = ".enc"
+# Chunks of a deduplicated backup fetched ahead of the reader
+CHUNK_READ_AHEAD = 4
+
+
+class StorageWriter:
+    """
+    Write-once sink for a backup artifact. close() commits it, abort()
+    throws away whatever was written. `location` is what gets stored in
+    BackupHistory.file_path.
+
+    Deliberately not an io.IOBase: those close() themselves when garbage
+    collected, which here would commit a half-written backup.
+    """
+
+    location: str = None
+    bytes_written: int = 0
+    closed: bool = False
+
+    def write(self, data) -> int:
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        raise NotImplementedError
+
+    def abort(self):
+        raise NotImplementedError
+
+
+class LocalFileWriter(StorageWriter):
+    """
+    Writes to "<path>.part" and renames into place on close, so a crashed
+    or failed backup never leaves a truncated file under the real name.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.location = path
+        self._tmp_path = path + ".part"
+        self._file = open(self._tmp_path, "wb")
+
+    def write(self, data):
+        n = self._file.write(data)
+        self.bytes_written += n
+        return n
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self._file.close()
+        os.replace(self._tmp_path, self.location)
+        self.closed = True
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+        self.closed = True
+
+
+class S3MultipartWriter(StorageWriter):
+    """
+    Streams into an S3 multipart upload while the dump is still running.
+
+    Bytes accumulate in a part_size buffer; each full buffer is handed to a
+    thread pool as one UploadPart. At most max_in_flight parts are pending
+    at once, and write() blocks while that many are uploading, so memory
+    stays around part_size * (max_in_flight + 1) regardless of backup size.
+    Part size doubles every 1000 parts to stay under the 10,000-part limit.
+    """
+
+    def __init__(self, client, bucket: str, key: str, part_size: int = 16 * MIB, max_in_flight: int = 4):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.location = f"{S3_PREFIX}{bucket}/{key}"
+        self.part_size = max(S3_MIN_PART_SIZE, part_size)
+        self._buffer = bytearray()
+        self._parts = []
+        self._futures = []
+        self._error = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="s3-part")
+        self._upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+
+    def write(self, data):
+        self._raise_if_failed()
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit(part)
+        n = len(data)
+        self.bytes_written += n
+        return n
+
+    def _submit(self, body: bytes):
+        part_number = len(self._futures) + 1
+        if part_number > S3_MAX_PARTS:
+            raise Exception("Backup exceeds the S3 multipart part limit")
+        if part_number % 1000 == 0:
+            self.part_size *= 2
+        self._slots.acquire()
+        self._raise_if_failed()
+        self._futures.append(self._executor.submit(self._upload_part, part_number, body))
+
+    def _upload_part(self, part_number: int, body: bytes):
+        try:
+            response = self.client.upload_part(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                PartNumber=part_number, Body=body
+            )
+            with self._lock:
+                self._parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+        except Exception as e:
+            with self._lock:
+                self._error = self._error or e
+        finally:
+            self._slots.release()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise Exception(f"S3 part upload failed: {self._error}")
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            # The final part may be smaller than 5 MiB; an empty backup still needs one part
+            if self._buffer or not self._futures:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            for future in self._futures:
+                future.result()
+            self._raise_if_failed()
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": sorted(self._parts, key=lambda p: p["PartNumber"])}
+            )
+        except Exception:
+            self.abort()
+            raise
+        self._executor.shutdown(wait=True)
+        self.closed = True
+
+    def abort(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        except Exception as e:
+            print(f"!!! Could not abort multipart upload {self._upload_id}: {e} !!!")
+
+
+class ChunkedReader(io.RawIOBase):
+    """
+    Reads a deduplicated backup (see ChunkStoreWriter) from byte `start`:
+    the chunks listed in its manifest, in order, CHUNK_READ_AHEAD of them
+    fetched in the background while the current one is consumed.
+    """
+
+    def __init__(self, config, manifest: dict, start: int = 0):
+        self.config = config
+        self._client = StorageService.client_for(config)
+        self._pending = deque()
+        offset = start
+        for location, size in manifest["chunks"]:
+            if offset >= size:
+                offset -= size
+                continue
+            self._pending.append((location, offset))
+            offset = 0
+        self._executor = ThreadPoolExecutor(max_workers=CHUNK_READ_AHEAD, thread_name_prefix="chunk-read")
+        self._fetching = deque()
+        self._current = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def _fetch(self, location: str, start: int) -> bytes:
+        reader = StorageService.open_object(self.config, location, start, self._client)
+        try:
+            return reader.read()
+        finally:
+            reader.close()
+
+    def readinto(self, buffer):
+        while not self._current:
+            while self._pending and len(self._fetching) < CHUNK_READ_AHEAD:
+                self._fetching.append(self._executor.submit(self._fetch, *self._pending.popleft()))
+            if not self._fetching:
+                return 0
+            self._current = memoryview(self._fetching.popleft().result())
+        n = min(len(buffer), len(self._current))
+        buffer[:n] = self._current[:n]
+        self._current = self._current[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        super().close()
+
 
 class StorageService:
+    """
+    Backend-neutral access to where backups live. `config` is a
+    StorageConfiguration row; None means the worker's local backup folder.
+    """
+
+    @staticmethod
+    def open_writer(config, file_name: str, local_dir: str) -> StorageWriter:
+        if config is None or config.storage_type == StorageType.local:
+            # For local configs bucket_name holds the target directory
+            base_dir = (config.bucket_name if config is not None else None) or local_dir
+            return LocalFileWriter(os.path.join(base_dir, file_name))
+
+        if config.storage_type in (StorageType.s3, StorageType.gcs):
+            key = StorageService._object_key(file_name)
+            return S3MultipartWriter(
+                StorageService._s3_client(config), config.bucket_name, key,
+                part_size=settings.STORAGE_PART_SIZE_MB * MIB,
+                max_in_flight=settings.STORAGE_UPLOAD_CONCURRENCY
+            )
+
+        raise Exception(f"Storage type {config.storage_type} not implemented")
+
+    @staticmethod
+    def location_for(config, file_name: str, local_dir: str) -> str:
+        """
+        Where open_writer()/put_bytes() store `file_name`.
+        """
+        if config is None or config.storage_type == StorageType.local:
+            base_dir = (config.bucket_name if config is not None else None) or local_dir
+            return os.path.join(base_dir, file_name)
+        if config.storage_type in (StorageType.s3, StorageType.gcs):
+            return f"{S3_PREFIX}{config.bucket_name}/{StorageService._object_key(file_name)}"
+        raise Exception(f"Storage type {config.storage_type} not implemented")
+
+    @staticmethod
+    def client_for(config):
+        """
+        S3 client for `config`, to reuse across many small requests; None
+        for local storage.
+        """
+        if config is None or config.storage_type == StorageType.local:
+            return None
+        return StorageService._s3_client(config)
+
+    @staticmethod
+    def put_bytes(config, file_name: str, local_dir: str, data: bytes, client=None) -> str:
+        """
+        Stores a small object in one request (no multipart upload). Returns
+        its location.
+        """
+        location = StorageService.location_for(config, file_name, local_dir)
+        if not location.startswith(S3_PREFIX):
+            writer = LocalFileWriter(location)
+            try:
+                writer.write(data)
+            except Exception:
+                writer.abort()
+                raise
+            writer.close()
+            return location
+        bucket, key = StorageService._split_location(location)
+        (client or StorageService._s3_client(config)).put_object(Bucket=bucket, Key=key, Body=data)
+        return location
+
+    @staticmethod
+    def is_remote(location: Optional[str]) -> bool:
+        return bool(location) and location.startswith(S3_PREFIX)
+
+    @staticmethod
+    def is_chunked(location: Optional[str]) -> bool:
+        """
+        Whether `location` is a deduplicated backup's manifest rather than
+        the artifact itself.
+        """
+        return bool(location) and location.endswith(MANIFEST_SUFFIX)
+
+    @staticmethod
+    def is_encrypted(location: Optional[str]) -> bool:
+        return bool(location) and location.endswith(ENCRYPTED_SUFFIX)
+
+    @staticmethod
+    def is_readable_in_place(location: Optional[str]) -> bool:
+        """
+        Whether the backup is a local file holding exactly its bytes, so
+        tools can open the path directly instead of going through
+        open_reader().
+        """
+        return bool(location) and not (
+            StorageService.is_remote(location)
+            or StorageService.is_chunked(location)
+            or StorageService.is_encrypted(location)
+        )
+
+    @staticmethod
+    def open_reader(config, location: str, start: int = 0) -> BinaryIO:
+        """
+        Binary reader positioned at byte `start`. Deduplicated backups are
+        reassembled from their chunks and encrypted ones decrypted on the
+        fly; `start` counts their original bytes.
+        """
+        if StorageService.is_chunked(location):
+            return ChunkedReader(config, StorageService.read_manifest(config, location), start)
+        if StorageService.is_encrypted(location):
+            client = StorageService.client_for(config)
+            return EncryptionService.open_reader(
+                lambda offset: StorageService.open_object(config, location, offset, client), start
+            )
+        return StorageService.open_object(config, location, start)
+
+    @staticmethod
+    def open_object(config, location: str, start: int = 0, client=None) -> BinaryIO:
+        """
+        Reader over one stored object, as it is.
+        """
+        if not location.startswith(S3_PREFIX):
+            f = open(location, "rb")
+            f.seek(start)
+            return f
+        bucket, key = StorageService._split_location(location)
+        extra = {"Range": f"bytes={start}-"} if start else {}
+        client = client or StorageService._s3_client(config)
+        return client.get_object(Bucket=bucket, Key=key, **extra)["Body"]
+
+    @staticmethod
+    def read_manifest(config, location: str) -> dict:
+        reader = StorageService.open_object(config, location)
+        try:
+            return json.loads(reader.read())
+        finally:
+            reader.close()
+
+    @staticmethod
+    def iter_chunks(config, location: str, start: int = 0, end: Optional[int] = None,
+                    chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Yields bytes start..end (inclusive; None = to the end of the object).
+        """
+        reader = StorageService.open_reader(config, location, start)
+        remaining = None if end is None else end - start + 1
+        try:
+            while remaining is None or remaining > 0:
+                chunk = reader.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            reader.close()
+
+    @staticmethod
+    def exists(config, location: Optional[str]) -> bool:
+        if not location:
+            return False
+        if not location.startswith(S3_PREFIX):
+            return os.path.exists(location)
+        if config is None:
+            return False
+        bucket, key = StorageService._split_location(location)
+        try:
+            StorageService._s3_client(config).head_object(Bucket=bucket, Key=key)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def delete(config, location: Optional[str]):
+        if not location:
+            return
+        if not location.startswith(S3_PREFIX):
+            if os.path.exists(location):
+                os.remove(location)
+            return
+        bucket, key = StorageService._split_location(location)
+        StorageService._s3_client(config).delete_object(Bucket=bucket, Key=key)
+
+    @staticmethod
+    def delete_many(config, locations) -> list:
+        """
+        Deletes several objects of one storage configuration, batching S3
+        deletes into DeleteObjects calls (up to 1000 keys each). Missing
+        objects count as deleted. Returns the locations that are gone.
+        """
+        deleted = []
+        by_bucket = {}
+        for location in locations:
+            if not location:
+                continue
+            if location.startswith(S3_PREFIX):
+                bucket, key = StorageService._split_location(location)
+                by_bucket.setdefault(bucket, []).append((key, location))
+                continue
+            try:
+                if os.path.exists(location):
+                    os.remove(location)
+                deleted.append(location)
+            except OSError as e:
+                print(f"!!! Could not delete {location}: {e} !!!")
+
+        if by_bucket:
+            client = StorageService._s3_client(config)
+            for bucket, entries in by_bucket.items():
+                for i in range(0, len(entries), S3_MAX_DELETE_KEYS):
+                    chunk = dict(entries[i:i + S3_MAX_DELETE_KEYS])
+                    response = client.delete_objects(
+                        Bucket=bucket,
+                        Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True}
+                    )
+                    failed = {error["Key"] for error in response.get("Errors", [])}
+                    for key in failed:
+                        print(f"!!! Could not delete s3://{bucket}/{key} !!!")
+                    deleted.extend(location for key, location in chunk.items() if key not in failed)
+        return deleted
+
     @staticmethod
     def upload_file(local_path: str, remote_path: str, config):
         """
-        config: StorageConfiguration model instance
+        Copies an existing local file to `config` through the same streaming
+        writer backups use. Returns the stored location.
         """
-        if config.storage_type == StorageType.local:
-            # Already saved locally in temp folder, move to permanent local storage
+        local_dir = os.path.dirname(local_path)
+        writer = StorageService.open_writer(config, remote_path, local_dir)
+        if isinstance(writer, LocalFileWriter) and os.path.abspath(writer.location) == os.path.abspath(local_path):
+            writer.abort()
             return local_path
-            
-        elif config.storage_type == StorageType.s3:
-            s3 = boto3.client(
-                's3',
-                endpoint_url=config.endpoint_url,
-                aws_access_key_id=config.access_key_encrypted, # Assume decrypted earlier
-                aws_secret_access_key=config.secret_key_encrypted,
-                config=Config(signature_version='s3v4')
-            )
-            s3.upload_file(local_path, config.bucket_name, remote_path)
-            return f"{config.bucket_name}/{remote_path}"
-        
-        raise Exception(f"Storage type {config.storage_type} not implemented")
\ No newline at end of file
+        try:
+            with open(local_path, "rb") as f:
+                while True:
+                    chunk = f.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+        except Exception:
+            writer.abort()
+            raise
+        writer.close()
+        return writer.location
+
+    @staticmethod
+    def _object_key(file_name: str) -> str:
+        prefix = settings.STORAGE_KEY_PREFIX.strip("/")
+        return f"{prefix}/{file_name}" if prefix else file_name
+
+    @staticmethod
+    def _split_location(location: str):
+        bucket, _, key = location[len(S3_PREFIX):].partition("/")
+        return bucket, key
+
+    @staticmethod
+    def _s3_client(config):
+        if config is None:
+            raise Exception("Backup is stored in object storage but its storage configuration is gone")
+        endpoint_url = config.endpoint_url
+        if config.storage_type == StorageType.gcs and not endpoint_url:
+            endpoint_url = GCS_ENDPOINT
+        return boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=config.region,
+            aws_access_key_id=decrypt(config.access_key_encrypted) if config.access_key_encrypted else None,
+            aws_secret_access_key=decrypt(config.secret_key_encrypted) if config.secret_key_encrypted else None,
+            config=Config(signature_version='s3v4')
+        )
@@ -0,0 +1,174 @@
+import re
+from typing import Iterable, List, Optional, Tuple
+
+# Wildcards understood in every list: "*" (any run of characters) and "?"
+# (one character). Table entries are "schema.table" or a bare "table",
+# which matches that table in any schema.
+_WILDCARDS = re.compile(r"([*?])")
+
+
+def _split(pattern: str) -> Tuple[str, str]:
+    schema, dot, table = pattern.strip().partition(".")
+    return (schema, table) if dot else ("*", schema)
+
+
+def _glob_regex(pattern: str, case_sensitive: bool):
+    parts = []
+    for piece in _WILDCARDS.split(pattern):
+        if piece == "*":
+            parts.append(".*")
+        elif piece == "?":
+            parts.append(".")
+        else:
+            parts.append(re.escape(piece))
+    return re.compile("".join(parts) + r"\Z", 0 if case_sensitive else re.IGNORECASE)
+
+
+def _psql_pattern(glob: str) -> str:
+    """
+    One name's glob in pg_dump's pattern syntax: literal runs double-quoted
+    (so case and regex characters are kept as-is), wildcards left bare.
+    """
+    out = []
+    for piece in _WILDCARDS.split(glob):
+        if piece in ("*", "?"):
+            out.append(piece)
+        elif piece:
+            out.append('"' + piece.replace('"', '""') + '"')
+    return "".join(out)
+
+
+def _like_pattern(glob: str) -> str:
+    escaped = glob.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("[", "\\[")
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+class TableFilter:
+    """
+    Which tables a backup covers, from a schedule's lists:
+
+      * selected_schemas / selected_tables - include only these (either
+        list matching is enough); all tables when both are empty;
+      * excluded_schemas / excluded_tables - never these;
+      * schema_only_tables - keep the definition but skip the rows (big
+        log/audit tables).
+
+    Postgres names match case-sensitively; SQL Server follows the
+    database's collation.
+    """
+
+    def __init__(self, schemas: Optional[Iterable[str]] = None, tables: Optional[Iterable[str]] = None,
+                 exclude_schemas: Optional[Iterable[str]] = None, exclude_tables: Optional[Iterable[str]] = None,
+                 schema_only_tables: Optional[Iterable[str]] = None):
+        self.schemas = [p.strip() for p in schemas or () if p and p.strip()]
+        self.tables = [_split(p) for p in tables or () if p and p.strip()]
+        self.exclude_schemas = [p.strip() for p in exclude_schemas or () if p and p.strip()]
+        self.exclude_tables = [_split(p) for p in exclude_tables or () if p and p.strip()]
+        self.schema_only_tables = [_split(p) for p in schema_only_tables or () if p and p.strip()]
+
+    @staticmethod
+    def from_schedule(schedule) -> Optional["TableFilter"]:
+        """
+        The schedule's filter, or None when it backs up everything. Raises
+        when backup_type "tables" has no tables to back up.
+        """
+        if schedule is None:
+            return None
+        backup_type = getattr(schedule.backup_type, "value", schedule.backup_type)
+        table_filter = TableFilter(
+            schedule.selected_schemas,
+            schedule.selected_tables,
+            getattr(schedule, "excluded_schemas", None),
+            getattr(schedule, "excluded_tables", None),
+            getattr(schedule, "schema_only_tables", None)
+        )
+        if backup_type == "tables" and not table_filter.tables:
+            raise Exception("Backup type 'tables' needs at least one entry in selected_tables")
+        return None if table_filter.is_empty else table_filter
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.schemas or self.tables or self.exclude_schemas or self.exclude_tables
+                    or self.schema_only_tables)
+
+    # --- Python-side matching (catalog rows, table stats) ---
+
+    def _matches_schema(self, patterns: List[str], schema: str, case_sensitive: bool) -> bool:
+        return any(_glob_regex(p, case_sensitive).match(schema) for p in patterns)
+
+    def _matches_table(self, patterns: List[Tuple[str, str]], schema: str, table: str,
+                       case_sensitive: bool) -> bool:
+        return any(
+            _glob_regex(s, case_sensitive).match(schema) and _glob_regex(t, case_sensitive).match(table)
+            for s, t in patterns
+        )
+
+    def includes(self, schema: str, table: str, case_sensitive: bool = True) -> bool:
+        if self._matches_schema(self.exclude_schemas, schema, case_sensitive):
+            return False
+        if self._matches_table(self.exclude_tables, schema, table, case_sensitive):
+            return False
+        if not (self.schemas or self.tables):
+            return True
+        return (self._matches_schema(self.schemas, schema, case_sensitive)
+                or self._matches_table(self.tables, schema, table, case_sensitive))
+
+    def schema_only(self, schema: str, table: str, case_sensitive: bool = True) -> bool:
+        return self._matches_table(self.schema_only_tables, schema, table, case_sensitive)
+
+    def includes_data(self, schema: str, table: str, case_sensitive: bool = True) -> bool:
+        return self.includes(schema, table, case_sensitive) and not self.schema_only(schema, table, case_sensitive)
+
+    # --- Engine-side filters ---
+
+    def pg_dump_args(self) -> List[str]:
+        """
+        pg_dump switches. pg_dump ignores -n/-N once any -t is given, so with
+        selected tables the schema lists are expressed as "schema".* tables.
+        """
+        args = []
+        if self.tables:
+            for schema, table in self.tables:
+                args.extend(["-t", f"{_psql_pattern(schema)}.{_psql_pattern(table)}"])
+            for schema in self.schemas:
+                args.extend(["-t", f"{_psql_pattern(schema)}.*"])
+            for schema in self.exclude_schemas:
+                args.extend(["-T", f"{_psql_pattern(schema)}.*"])
+        else:
+            for schema in self.schemas:
+                args.extend(["-n", _psql_pattern(schema)])
+            for schema in self.exclude_schemas:
+                args.extend(["-N", _psql_pattern(schema)])
+        for schema, table in self.exclude_tables:
+            args.extend(["-T", f"{_psql_pattern(schema)}.{_psql_pattern(table)}"])
+        for schema, table in self.schema_only_tables:
+            args.append(f"--exclude-table-data={_psql_pattern(schema)}.{_psql_pattern(table)}")
+        return args
+
+    def mssql_where(self) -> Tuple[str, list]:
+        """
+        "AND ..." conditions on INFORMATION_SCHEMA.TABLES (TABLE_SCHEMA,
+        TABLE_NAME) plus their parameters. The lightweight MSSQL backup
+        scripts rows only, so schema-only tables are left out entirely.
+        """
+        like = "{} LIKE %s ESCAPE '\\'"
+        clauses, params = [], []
+
+        def table_match(schema, table):
+            params.extend([_like_pattern(schema), _like_pattern(table)])
+            return f"({like.format('TABLE_SCHEMA')} AND {like.format('TABLE_NAME')})"
+
+        includes = []
+        for schema in self.schemas:
+            includes.append(like.format("TABLE_SCHEMA"))
+            params.append(_like_pattern(schema))
+        for schema, table in self.tables:
+            includes.append(table_match(schema, table))
+        if includes:
+            clauses.append("(" + " OR ".join(includes) + ")")
+        for schema in self.exclude_schemas:
+            clauses.append(f"NOT {like.format('TABLE_SCHEMA')}")
+            params.append(_like_pattern(schema))
+        for schema, table in self.exclude_tables + self.schema_only_tables:
+            clauses.append(f"NOT {table_match(schema, table)}")
+        return "".join(f" AND {clause}" for clause in clauses), params
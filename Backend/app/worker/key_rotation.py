@@ -0,0 +1,69 @@
+"""
+Credential key rotation: rewrites stored credentials under the current key.
+
+With ENCRYPTION_KEY_ID set, API startup (or `python -m app.worker.key_rotation`)
+re-encrypts every connection password and storage access key not written
+under it yet, so a key can leave ENCRYPTION_RETIRED_KEYS once this has run
+against every database that used it. Runs are idempotent: values already
+under the current key are skipped.
+"""
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db import base  # noqa: F401  (registers every model)
+from app.models.connection import DatabaseConnection
+from app.models.storage import StorageConfiguration
+from app.services import crypto_service
+
+# (model, encrypted columns)
+ENCRYPTED_COLUMNS = (
+    (DatabaseConnection, ("password_encrypted",)),
+    (StorageConfiguration, ("access_key_encrypted", "secret_key_encrypted")),
+)
+
+
+def rotate_credentials(session_factory=SessionLocal) -> int:
+    """
+    Re-encrypts stored credentials under the current key; returns values
+    rewritten. A value that no configured key can decrypt is reported and
+    left as it is.
+    """
+    if not settings.ENCRYPTION_KEY_ID:
+        return 0
+    rotated = 0
+    for model, columns in ENCRYPTED_COLUMNS:
+        for name in columns:
+            column = getattr(model, name)
+            db = session_factory()
+            try:
+                rows = db.execute(select(model.id, column).where(column.isnot(None))).all()
+                for row_id, value in rows:
+                    if not crypto_service.needs_rotation(value):
+                        continue
+                    try:
+                        new_value = crypto_service.reencrypt(value)
+                    except Exception as e:
+                        print(f"!!! Could not re-encrypt {model.__tablename__}.{name} of {row_id}: {e} !!!")
+                        continue
+                    # Only if nobody rewrote the value meanwhile (e.g. a new password)
+                    result = db.execute(
+                        update(model).where(model.id == row_id, column == value).values({name: new_value}),
+                        execution_options={"synchronize_session": False}
+                    )
+                    db.commit()
+                    rotated += result.rowcount
+            finally:
+                db.close()
+    return rotated
+
+
+def run_key_rotation() -> int:
+    rotated = rotate_credentials()
+    if rotated:
+        print(f"--- KEY ROTATION: re-encrypted {rotated} credential(s) under '{settings.ENCRYPTION_KEY_ID}' ---")
+    return rotated
+
+
+if __name__ == "__main__":
+    run_key_rotation()
@@ -0,0 +1,262 @@
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.history import BackupHistory, BackupStatus, RestoreHistory
+from app.services import progress_service
+from app.worker.tasks import run_backup_job, run_backup_task, run_restore_job, run_restore_task
+
+BACKENDS = ("celery", "local")
+
+# Job kind -> (task run in the local pool, history model it updates)
+JOB_KINDS = {
+    "backup": (run_backup_task, BackupHistory),
+    "restore": (run_restore_task, RestoreHistory),
+}
+
+
+class LocalJobQueue:
+    """
+    Process-pool job queue for running without Redis/Celery (dev, tests).
+
+    Backups run in WORKER_CONCURRENCY spawned worker processes, never in the
+    API's request threads. Jobs wait in FIFO order and a job is only handed
+    to the pool while its connection has fewer than per_connection running
+    jobs; a later job for an idle connection can overtake a blocked one.
+    The queue itself is not durable: pending BackupHistory rows are the
+    source of truth and are re-queued by recover_pending_jobs() on startup.
+    Restores (kind="restore") share the same pool and per-connection limit.
+    """
+
+    def __init__(self, concurrency: int, per_connection: int):
+        self.concurrency = max(1, concurrency)
+        self.per_connection = max(1, per_connection)
+        self._pending = deque()
+        self._queued = set()
+        self._running = {}
+        self._running_total = 0
+        # Re-entrant: a future that finishes instantly runs _done() inside _dispatch()
+        self._lock = threading.RLock()
+        self._executor = None
+        self._progress = None
+        self._closed = False
+
+    def submit(self, history_id: str, connection_id: Optional[str] = None, reclaim: bool = False,
+               kind: str = "backup"):
+        with self._lock:
+            if history_id in self._queued:
+                return
+            self._queued.add(history_id)
+            self._pending.append((history_id, connection_id, reclaim, kind))
+            self._dispatch()
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _dispatch(self):
+        # Caller holds self._lock
+        if self._executor is None:
+            # spawn, not fork: the API process has threads and open DB sockets
+            context = multiprocessing.get_context("spawn")
+            if self._progress is None:
+                # Workers' progress events come back over this queue to the API's ProgressBus
+                self._progress = context.Queue()
+                threading.Thread(
+                    target=progress_service.forward_events, args=(self._progress,),
+                    name="progress-forwarder", daemon=True
+                ).start()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.concurrency,
+                mp_context=context,
+                initializer=progress_service.init_worker,
+                initargs=(self._progress,)
+            )
+
+        blocked = deque()
+        while self._pending and self._running_total < self.concurrency:
+            job = self._pending.popleft()
+            history_id, connection_id, reclaim, kind = job
+            if self._running.get(connection_id, 0) >= self.per_connection:
+                blocked.append(job)
+                continue
+
+            self._running[connection_id] = self._running.get(connection_id, 0) + 1
+            self._running_total += 1
+            task = JOB_KINDS[kind][0]
+            future = self._executor.submit(task, history_id, reclaim)
+            future.add_done_callback(
+                lambda f, h=history_id, c=connection_id, k=kind: self._done(h, c, f, k)
+            )
+        blocked.extend(self._pending)
+        self._pending = blocked
+
+    def _done(self, history_id: str, connection_id: Optional[str], future, kind: str = "backup"):
+        # The tasks record their own failures, so an exception here means
+        # the worker process itself died (OOM kill, segfault in a driver...)
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            print(f"!!! Worker process failed for {history_id}: {error!r} !!!")
+            _mark_failed(history_id, f"Worker process died: {error!r}", JOB_KINDS[kind][1])
+        # A backup that hit a transient error asks to run again after a delay
+        retry_in = future.result() if error is None and not future.cancelled() else None
+        with self._lock:
+            if isinstance(error, BrokenProcessPool) and self._executor is not None:
+                # A dead child breaks the whole pool; the next _dispatch() starts a fresh one
+                self._executor.shutdown(wait=False)
+                self._executor = None
+                restart = True
+            else:
+                restart = False
+            self._queued.discard(history_id)
+            self._running_total -= 1
+            self._running[connection_id] -= 1
+            if not self._running[connection_id]:
+                del self._running[connection_id]
+            if self._executor is not None or restart:
+                self._dispatch()
+        if retry_in is not None:
+            # Waits outside the pool: the worker and the connection's slot are free meanwhile
+            timer = threading.Timer(retry_in, self._resubmit, args=(history_id, connection_id, kind))
+            timer.daemon = True
+            timer.start()
+
+    def _resubmit(self, history_id: str, connection_id: Optional[str], kind: str):
+        if not self._closed:
+            self.submit(history_id, connection_id, kind=kind)
+
+
+def _mark_failed(history_id: str, message: str, model=BackupHistory):
+    db = SessionLocal()
+    try:
+        db.query(model).filter(
+            model.id == history_id,
+            model.status.in_([BackupStatus.pending, BackupStatus.running])
+        ).update({
+            "status": BackupStatus.failed,
+            "error_message": message,
+            "completed_at": datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        print(f"!!! Could not mark {history_id} as failed: {e} !!!")
+    finally:
+        db.close()
+
+
+_local_queue: Optional[LocalJobQueue] = None
+
+
+def _get_local_queue() -> LocalJobQueue:
+    global _local_queue
+    if _local_queue is None:
+        _local_queue = LocalJobQueue(settings.WORKER_CONCURRENCY, settings.WORKER_PER_CONNECTION_LIMIT)
+    return _local_queue
+
+
+def _backend() -> str:
+    backend = settings.JOB_QUEUE_BACKEND.lower()
+    if backend not in BACKENDS:
+        raise Exception(f"Unsupported JOB_QUEUE_BACKEND '{settings.JOB_QUEUE_BACKEND}'. Use one of: {', '.join(BACKENDS)}")
+    return backend
+
+
+def enqueue_backup(history_id, connection_id=None, reclaim: bool = False):
+    """
+    Hands a pending BackupHistory row to the configured worker pool.
+    Safe to call more than once for the same row: the worker claims it
+    atomically and skips rows that are no longer pending.
+    """
+    history_id = str(history_id)
+    connection_id = str(connection_id) if connection_id else None
+
+    if _backend() == "celery":
+        run_backup_job.apply_async(args=[history_id, connection_id])
+    else:
+        _get_local_queue().submit(history_id, connection_id, reclaim)
+
+
+def enqueue_restore(restore_id, connection_id=None, reclaim: bool = False):
+    """
+    Hands a pending RestoreHistory row to the worker pool. Restores count
+    against the same per-connection limit as backups of that database.
+    """
+    restore_id = str(restore_id)
+    connection_id = str(connection_id) if connection_id else None
+
+    if _backend() == "celery":
+        run_restore_job.apply_async(args=[restore_id, connection_id])
+    else:
+        _get_local_queue().submit(restore_id, connection_id, reclaim, kind="restore")
+
+
+def enqueue_backups(jobs):
+    """
+    Queues many (history_id, connection_id) pairs. On Celery they go out
+    over a single broker connection instead of one per job.
+    """
+    if not jobs:
+        return
+    if _backend() == "celery":
+        with run_backup_job.app.producer_or_acquire() as producer:
+            for history_id, connection_id in jobs:
+                run_backup_job.apply_async(
+                    args=[str(history_id), str(connection_id) if connection_id else None],
+                    producer=producer
+                )
+    else:
+        for history_id, connection_id in jobs:
+            enqueue_backup(history_id, connection_id)
+
+
+def recover_pending_jobs() -> int:
+    """
+    Re-queues jobs left behind by a restart. Returns how many were queued.
+
+    Pending rows are always re-queued. 'running' rows are only taken over
+    by the local backend, whose workers died with the previous API process;
+    with Celery a lost worker's message is redelivered by the broker
+    (acks_late + reject_on_worker_lost) and the row is reclaimed then.
+    """
+    statuses = [BackupStatus.pending]
+    reclaim_running = _backend() == "local"
+    if reclaim_running:
+        statuses.append(BackupStatus.running)
+
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            BackupHistory.id, BackupHistory.connection_id, BackupHistory.status
+        ).filter(
+            BackupHistory.status.in_(statuses)
+        ).order_by(BackupHistory.created_at).all()
+        restores = db.query(
+            RestoreHistory.id, RestoreHistory.connection_id, RestoreHistory.status
+        ).filter(
+            RestoreHistory.status.in_(statuses)
+        ).order_by(RestoreHistory.created_at).all()
+    finally:
+        db.close()
+
+    for history_id, connection_id, status in rows:
+        enqueue_backup(history_id, connection_id, reclaim=status == BackupStatus.running)
+    for restore_id, connection_id, status in restores:
+        enqueue_restore(restore_id, connection_id, reclaim=status == BackupStatus.running)
+    if rows or restores:
+        print(f"--- RECOVERED {len(rows)} QUEUED BACKUP(S), {len(restores)} RESTORE(S) ---")
+    return len(rows) + len(restores)
+
+
+def shutdown_queue():
+    if _local_queue is not None:
+        _local_queue.shutdown(wait=False)
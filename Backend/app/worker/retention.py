@@ -0,0 +1,47 @@
+"""
+Retention loop: prunes backups outside the retention policy.
+
+Runs next to the scheduler, as a daemon thread in the API process
+(SCHEDULER_ENABLED) or in the `python -m app.worker.scheduler` service,
+never on a request. Each pass deletes in RETENTION_BATCH_SIZE batches with
+short transactions, and passes are idempotent, so overlapping runs from
+several replicas only repeat work.
+"""
+import threading
+import time
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db import base  # noqa: F401  (registers every model)
+from app.services.retention_service import RetentionService
+
+
+def run_retention_pass() -> int:
+    removed = RetentionService.prune(SessionLocal)
+    if removed:
+        print(f"--- RETENTION: removed {removed} backup(s) ---")
+    chunks = RetentionService.collect_chunks(SessionLocal)
+    if chunks:
+        print(f"--- RETENTION: removed {chunks} unused chunk(s) ---")
+    return removed
+
+
+def run_retention_loop():
+    print(f"--- RETENTION STARTED (every {settings.RETENTION_INTERVAL_SECONDS}s) ---")
+    while True:
+        started = time.monotonic()
+        try:
+            run_retention_pass()
+        except Exception as e:
+            print(f"!!! Retention pass failed: {e} !!!")
+        time.sleep(max(0.0, settings.RETENTION_INTERVAL_SECONDS - (time.monotonic() - started)))
+
+
+def start_retention_thread() -> threading.Thread:
+    thread = threading.Thread(target=run_retention_loop, name="backup-retention", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    run_retention_pass()
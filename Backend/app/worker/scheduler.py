@@ -0,0 +1,135 @@
+"""
+Scheduler loop: fires due BackupSchedule rows.
+
+    python -m app.worker.scheduler
+
+(also starts the retention loop, see app.worker.retention)
+
+Every tick claims due schedules with one indexed query (partial index on
+next_run_at WHERE is_active) using FOR UPDATE SKIP LOCKED, so any number
+of scheduler replicas can run side by side: a schedule locked by one
+replica is simply skipped by the others, and its next_run_at has already
+moved on by the time the lock is released.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db import base  # noqa: F401  (registers every model)
+from app.models.schedule import BackupSchedule, ScheduleFrequency
+from app.services.schedule_service import ScheduleService
+from app.worker.queue import enqueue_backups
+
+
+def _claim_due(db, now: datetime, limit: int):
+    return db.query(BackupSchedule).filter(
+        BackupSchedule.is_active.is_(True),
+        BackupSchedule.next_run_at <= now
+    ).order_by(
+        BackupSchedule.next_run_at
+    ).limit(limit).with_for_update(skip_locked=True).all()
+
+
+def run_scheduler_tick(now: datetime = None) -> int:
+    """
+    Fires every schedule due at `now`, in batches of SCHEDULER_BATCH_SIZE.
+    Each batch creates its history rows and advances next_run_at in one
+    transaction, then the jobs are queued. Returns the number fired.
+    """
+    now = now or datetime.now(timezone.utc)
+    fired = 0
+    while True:
+        db = SessionLocal()
+        try:
+            schedules = _claim_due(db, now, settings.SCHEDULER_BATCH_SIZE)
+            histories = []
+            for schedule in schedules:
+                try:
+                    schedule.next_run_at = ScheduleService.next_run_at(
+                        schedule.frequency, schedule.cron_expression, schedule.next_run_at, now,
+                        anchor_day=ScheduleService.anchor_day(schedule)
+                    )
+                except Exception as e:
+                    # A broken cron expression must not block the rest of the batch
+                    print(f"!!! Disabling schedule {schedule.id}: {e} !!!")
+                    schedule.is_active = False
+                    schedule.next_run_at = None
+                    continue
+                schedule.last_run_at = now
+                histories.append(ScheduleService.build_history(schedule))
+
+            db.add_all(histories)
+            db.commit()
+            jobs = [(history.id, history.connection_id) for history in histories]
+        finally:
+            db.close()
+
+        enqueue_backups(jobs)
+        fired += len(jobs)
+        if len(schedules) < settings.SCHEDULER_BATCH_SIZE:
+            return fired
+
+
+def initialize_next_runs(now: datetime = None) -> int:
+    """
+    Gives active schedules that have never been planned (created before the
+    scheduler existed, or re-enabled) their first next_run_at.
+    """
+    now = now or datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        schedules = db.query(BackupSchedule).filter(
+            BackupSchedule.is_active.is_(True),
+            BackupSchedule.next_run_at.is_(None),
+            BackupSchedule.frequency != ScheduleFrequency.manual
+        ).with_for_update(skip_locked=True).all()
+        for schedule in schedules:
+            try:
+                schedule.next_run_at = ScheduleService.next_run_at(
+                    schedule.frequency, schedule.cron_expression, now=now,
+                    anchor_day=ScheduleService.anchor_day(schedule)
+                )
+            except Exception as e:
+                print(f"!!! Disabling schedule {schedule.id}: {e} !!!")
+                schedule.is_active = False
+        db.commit()
+        return len(schedules)
+    finally:
+        db.close()
+
+
+def run_scheduler_loop():
+    print(f"--- SCHEDULER STARTED (tick every {settings.SCHEDULER_TICK_SECONDS}s) ---")
+    initialized = False
+    while True:
+        started = time.monotonic()
+        try:
+            if not initialized:
+                initialize_next_runs()
+                initialized = True
+            fired = run_scheduler_tick()
+            if fired:
+                print(f"--- SCHEDULER: queued {fired} backup(s) ---")
+        except Exception as e:
+            print(f"!!! Scheduler tick failed: {e} !!!")
+        time.sleep(max(0.0, settings.SCHEDULER_TICK_SECONDS - (time.monotonic() - started)))
+
+
+def start_scheduler_thread() -> threading.Thread:
+    """
+    Runs the loop inside the API process (daemon thread), the simplest
+    setup with the local queue backend.
+    """
+    thread = threading.Thread(target=run_scheduler_loop, name="backup-scheduler", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    if settings.RETENTION_ENABLED:
+        # Pruning runs beside the loop in its own thread so a long pass never delays a tick
+        from app.worker.retention import start_retention_thread
+        start_retention_thread()
+    run_scheduler_loop()
@@ -95,88 +95,620 @@
 
 
 
-import os
 import platform
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
+import pymssql
+import redis
+from sqlalchemy import func, insert
+from sqlalchemy.orm.attributes import flag_modified
+from app.core import metrics
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.timing import PhaseTimer
 from app.db.session import SessionLocal
-from app.models.history import BackupHistory, BackupStatus
+from app.models.history import BackupChunkRef, BackupHistory, BackupStatus, BackupTableStat, RestoreHistory
 from app.models.connection import DatabaseConnection
+from app.models.schedule import BackupSchedule
+from app.models.storage import StorageConfiguration
 from app.db import base # Ensures SQLAlchemy sees all models
 from app.services.backup_service import BackupService
+from app.services.checkpoint_service import ExportCheckpoint
+from app.services.chunk_store import ChunkStore
+from app.services.compression_service import CompressionService
 from app.services.crypto_service import decrypt
+from app.services.encryption_service import EncryptionService
+from app.services.progress_service import ProgressReporter
+from app.services.restore_service import RestoreService
+from app.services.storage_service import ENCRYPTED_SUFFIX, StorageService
+from app.services.table_filter import TableFilter
+
+def _backup_extension(db_type: str, backup_format: str, codec: str) -> str:
+    # Custom/directory archives compress inside pg_dump and keep their own extension
+    if "postgres" in db_type and backup_format == "directory":
+        return ".tar"
+    if "postgres" in db_type and backup_format == "dump":
+        return ".dump"
+    return ".sql" + CompressionService.extension(codec)
 
 # Standard function (No Celery Decorator)
-def run_backup_task(history_id: str):
+def _claim(db, history_id: str, reclaim: bool = False, model=BackupHistory) -> bool:
+    """
+    Atomically moves a job from pending to running so a job that was queued
+    twice (restart recovery, broker redelivery) only ever runs once.
+    reclaim=True also takes over a 'running' row whose worker died.
+    `model` is BackupHistory or RestoreHistory.
+    """
+    statuses = [BackupStatus.pending, BackupStatus.running] if reclaim else [BackupStatus.pending]
+    values = {"status": BackupStatus.running, "started_at": datetime.utcnow()}
+    if reclaim:
+        values["retry_count"] = func.coalesce(model.retry_count, 0) + 1
+    claimed = db.query(model).filter(
+        model.id == history_id,
+        model.status.in_(statuses)
+    ).update(values, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def _conn_info(conn: DatabaseConnection, parallel_jobs: int = None) -> dict:
+    return {
+        "host": conn.host,
+        "port": conn.port,
+        "username": conn.username,
+        "password": decrypt(conn.password_encrypted),
+        "database_name": conn.database_name,
+        "parallel_jobs": parallel_jobs or conn.parallel_jobs or 1
+    }
+
+def _save_progress(history_id: str, snapshot: dict):
+    """
+    Throttled progress write (see ProgressReporter), in its own short
+    session so it never shares a transaction with the task's row.
+    """
+    db = SessionLocal()
+    try:
+        db.query(BackupHistory).filter(
+            BackupHistory.id == history_id,
+            BackupHistory.status == BackupStatus.running
+        ).update({
+            "progress_table": snapshot["table"],
+            "progress_rows": snapshot["rows"],
+            "progress_bytes": snapshot["bytes"],
+            "progress_percent": snapshot["percent"],
+            "progress_eta_seconds": snapshot["eta_seconds"],
+            "progress_updated_at": func.now()
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _save_checkpoint(history_id: str, state: dict):
+    """
+    Export checkpoint write (see ExportCheckpoint), in its own session like
+    _save_progress.
+    """
+    db = SessionLocal()
+    try:
+        db.query(BackupHistory).filter(BackupHistory.id == history_id).update(
+            {"checkpoint": state or None}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def _watch_cancel(history_id: str, cancel: threading.Event, stop: threading.Event):
+    """
+    Sets `cancel` once POST /history/{id}/cancel flagged the row. Checks
+    every BACKUP_CANCEL_POLL_SECONDS, in short sessions like _save_progress,
+    until `stop` is set.
+    """
+    while not stop.wait(settings.BACKUP_CANCEL_POLL_SECONDS):
+        db = SessionLocal()
+        try:
+            requested = db.query(BackupHistory.cancel_requested_at).filter(
+                BackupHistory.id == history_id
+            ).scalar()
+        except Exception as e:
+            print(f"!!! Could not check cancellation of {history_id}: {e} !!!")
+            requested = None
+        finally:
+            db.close()
+        if requested is not None:
+            print(f"--- CANCELLING {history_id} ---")
+            cancel.set()
+            return
+
+# Connection drops and timeouts talking to SQL Server: worth another attempt
+TRANSIENT_ERRORS = (pymssql.OperationalError, pymssql.InterfaceError, TimeoutError, ConnectionError)
+# ...except these OperationalErrors, which fail the same way every time:
+# login failed, database unavailable to the login, login from untrusted domain
+PERMANENT_MSSQL_ERRORS = {18456, 4060, 18452}
+
+def _is_transient(error: BaseException) -> bool:
+    """
+    Whether a failed MSSQL export is worth retrying. The engines re-raise
+    driver errors as Exception(...) inside their except blocks, so the
+    whole __cause__/__context__ chain is checked.
+    """
+    while error is not None:
+        if isinstance(error, TRANSIENT_ERRORS):
+            code = error.args[0] if error.args and isinstance(error.args[0], int) else None
+            return code not in PERMANENT_MSSQL_ERRORS
+        error = error.__cause__ or error.__context__
+    return False
+
+def _retry_delay(attempt: int) -> float:
+    """
+    Exponential backoff before retry number `attempt` (1-based).
+    """
+    delay = settings.BACKUP_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+    return min(delay, settings.BACKUP_RETRY_BACKOFF_MAX_SECONDS)
+
+def _chain_parent(db, history: BackupHistory):
+    """
+    Newest completed backup of the schedule's incremental chain for this
+    run to build on, or None when it must take a new full base (no chain
+    yet, or MSSQL_INCREMENTAL_MAX_CHAIN increments reached).
+    """
+    if not history.schedule_id:
+        return None
+    parent = db.query(BackupHistory).filter(
+        BackupHistory.schedule_id == history.schedule_id,
+        BackupHistory.status == BackupStatus.completed,
+        BackupHistory.chain_manifest.isnot(None)
+    ).order_by(BackupHistory.created_at.desc(), BackupHistory.id.desc()).first()
+    if parent is None or parent.chain_manifest.get("sequence", 0) >= settings.MSSQL_INCREMENTAL_MAX_CHAIN:
+        return None
+    return parent
+
+def _backup_chain(db, backup: BackupHistory) -> list:
+    """
+    The backups a restore of `backup` replays, oldest first: the chain's
+    full base and every increment up to `backup` (just `backup` itself
+    when it is not an increment).
+    """
+    chain = [backup]
+    while (chain[0].chain_manifest or {}).get("sequence"):
+        parent = None
+        if chain[0].parent_backup_id:
+            parent = db.query(BackupHistory).filter(BackupHistory.id == chain[0].parent_backup_id).first()
+        if parent is None or parent.status != BackupStatus.completed or not parent.file_path:
+            raise Exception(f"Incremental chain is broken: the parent of backup {chain[0].id} is missing")
+        chain.insert(0, parent)
+    return chain
+
+def _run_backup_engine(db_type: str, conn_info: dict, local_path: str, history: BackupHistory, codec, level,
+                       writer, progress, timer, table_filter, checkpoint, chain=None, parent=None, cancel=None):
+    # MSSQL exports stop through the ProgressReporter, which shares `cancel`
+    if "postgres" in db_type:
+        return BackupService.run_pg_dump(
+            conn_info, local_path, history.backup_type, history.backup_format,
+            compression=codec, compression_level=level, sink=writer, progress=progress, timer=timer,
+            table_filter=table_filter, cancel=cancel
+        )
+    if parent is not None:
+        return BackupService.run_mssql_incremental(
+            conn_info, local_path, parent.chain_manifest["change_state"], chain,
+            compression=codec, compression_level=level, sink=writer, progress=progress, timer=timer,
+            table_filter=table_filter
+        )
+    return BackupService.run_mssql_backup(
+        conn_info, local_path, compression=codec, compression_level=level, sink=writer,
+        progress=progress, timer=timer, table_filter=table_filter, checkpoint=checkpoint,
+        track_changes=chain is not None
+    )
+
+def _open_writer(storage, file_name: str, local_dir: str, encrypt: bool):
+    """
+    Sink a backup streams into: encrypted (stored as "<file name>.enc")
+    when its schedule asks for it, otherwise deduplicated or plain, see
+    ChunkStore.open_writer.
+    """
+    if encrypt:
+        return EncryptionService.open_writer(
+            StorageService.open_writer(storage, file_name + ENCRYPTED_SUFFIX, local_dir)
+        )
+    return ChunkStore.open_writer(storage, file_name, local_dir, SessionLocal)
+
+def _queue_wait(row):
+    """
+    Seconds between a job being queued and a worker claiming it.
+    """
+    try:
+        return (row.started_at - row.created_at).total_seconds()
+    except Exception:
+        return None
+
+def _phase_timings(timer: PhaseTimer, queue_wait) -> dict:
+    timings = timer.as_dict()
+    if queue_wait is not None:
+        timings["queue_wait"] = round(queue_wait, 3)
+    return timings
+
+def run_backup_task(history_id: str, reclaim: bool = False) -> Optional[float]:
+    """
+    Runs one attempt of a backup job. When a checkpointed MSSQL export hits
+    a transient error and retries remain, the row goes back to 'pending'
+    and the delay before the next attempt is returned: the caller re-queues
+    the job after that delay, so the worker and the connection slot are
+    free in between. Returns None otherwise.
+    """
     db = SessionLocal()
     history = db.query(BackupHistory).filter(BackupHistory.id == history_id).first()
     if not history:
         print(f"!!! Error: History record {history_id} not found !!!")
+        db.close()
         return
 
-    try:
-        # 1. Update Database to indicate processing
-        history.status = BackupStatus.running
-        history.started_at = datetime.utcnow()
-        db.commit()
+    # 1. Claim the job (marks it running)
+    if not _claim(db, history_id, reclaim):
+        print(f"--- SKIPPING {history_id}: already {history.status.value} ---")
+        db.close()
+        return
+    db.refresh(history)
 
-        # 2. Get connection and decrypt password
-        conn = db.query(DatabaseConnection).filter(DatabaseConnection.id == history.connection_id).first()
-        if not conn:
-            raise Exception("Connection details not found in database")
+    writer = None
+    checkpoint = None
+    cancel = threading.Event()
+    stop_watch = threading.Event()
+    threading.Thread(
+        target=_watch_cancel, args=(history_id, cancel, stop_watch), name="cancel-watch", daemon=True
+    ).start()
+    progress = ProgressReporter(
+        history.id, history.user_id, persist=lambda s: _save_progress(history_id, s), cancel=cancel
+    )
+    timer = PhaseTimer()
+    engine = "unknown"
+    queue_wait = _queue_wait(history)
+    started = time.perf_counter()
+    try:
+        with timer.phase("prepare"):
+            # 2. Get connection and decrypt password
+            conn = db.query(DatabaseConnection).filter(DatabaseConnection.id == history.connection_id).first()
+            if not conn:
+                raise Exception("Connection details not found in database")
 
-        decrypted_password = decrypt(conn.password_encrypted)
+            schedule = None
+            if history.schedule_id:
+                schedule = db.query(BackupSchedule).filter(BackupSchedule.id == history.schedule_id).first()
         
-        db_type = str(conn.db_type).lower() if hasattr(conn, 'db_type') else "postgresql"
+            db_type = str(conn.db_type).lower() if hasattr(conn, 'db_type') else "postgresql"
+            engine = metrics.engine_label(db_type)
         
-        conn_info = {
-            "host": conn.host,
-            "port": conn.port,
-            "username": conn.username,
-            "password": decrypted_password,
-            "database_name": conn.database_name
-        }
-
-        # 3. DYNAMIC PATH LOGIC (Universal for Mac/Windows)
-        downloads_path = Path.home() / "Downloads"
-        folder_name = "PG_Backups" if "postgres" in db_type else "MSSQL_Backups"
-        storage_dir = downloads_path / folder_name
-        storage_dir.mkdir(parents=True, exist_ok=True)
+            conn_info = _conn_info(conn, schedule and schedule.parallel_jobs)
+            table_filter = TableFilter.from_schedule(schedule)
+
+            # Incremental schedules: a new full base, or the changes since the chain's newest backup
+            chain = parent = None
+            if history.backup_type == "incremental":
+                if "postgres" in db_type:
+                    raise Exception("Incremental backups are only supported for SQL Server connections")
+                parent = _chain_parent(db, history)
+                chain = {"base_backup_id": None, "parent_backup_id": None, "sequence": 0}
+                if parent is not None:
+                    chain = {
+                        "base_backup_id": str(parent.base_backup_id or parent.id),
+                        "parent_backup_id": str(parent.id),
+                        "sequence": parent.chain_manifest["sequence"] + 1,
+                    }
+                    print(f"--- INCREMENTAL {chain['sequence']} ON TOP OF {parent.id} ---")
+
+            # 3. DYNAMIC PATH LOGIC (Universal for Mac/Windows)
+            downloads_path = Path.home() / "Downloads"
+            folder_name = "PG_Backups" if "postgres" in db_type else "MSSQL_Backups"
+            storage_dir = downloads_path / folder_name
+            storage_dir.mkdir(parents=True, exist_ok=True)
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_name = f"backup_{conn.database_name}_{timestamp}.sql"
-        local_path = str(storage_dir / file_name)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            codec = (history.compression_codec or "gzip") if history.compression_enabled else None
+            level = schedule.compression_level if schedule else None
+            extension = _backup_extension(db_type, history.backup_format, codec)
+            file_name = f"backup_{conn.database_name}_{timestamp}{extension}"
+            local_path = str(storage_dir / file_name)
+
+            # MSSQL exports checkpoint as they go, so a job reclaimed after its
+            # worker died carries on from the segments it left on this host
+            if "postgres" not in db_type and parent is None:
+                save = lambda state: _save_checkpoint(history_id, state)
+                checkpoint = ExportCheckpoint(history.checkpoint, persist=save)
+                if checkpoint.resumable and checkpoint.intact():
+                    local_path = checkpoint.output_path
+                    file_name = Path(local_path).name
+                    print(f"--- RESUMING EXPORT FROM CHECKPOINT: {checkpoint.parts_dir} ---")
+                else:
+                    checkpoint = ExportCheckpoint(persist=save)
+
+            # Backups stream straight into their storage target (local folder or
+            # an S3/GCS multipart upload, or its chunk store with
+            # BACKUP_DEDUP_ENABLED), encrypted on the way when the schedule
+            # asks for it; local_path only anchors scratch files
+            storage_id = history.storage_id or (schedule.storage_id if schedule else None)
+            storage = None
+            if storage_id:
+                storage = db.query(StorageConfiguration).filter(StorageConfiguration.id == storage_id).first()
+                history.storage_id = storage_id
+            writer = _open_writer(storage, file_name, str(storage_dir), bool(history.encryption_enabled))
 
         print(f"\n" + "="*50)
         print(f"--- BACKGROUND TASK STARTED ---")
         print(f"--- OS: {platform.system()} | DB: {db_type.upper()} ---")
-        print(f"--- SAVING TO: {local_path} ---")
+        print(f"--- SAVING TO: {writer.location} ---")
         print("="*50 + "\n")
 
-        # 4. Execute Backup Engine
-        if "postgres" in db_type:
-            checksum = BackupService.run_pg_dump(
-                conn_info, local_path, history.backup_type, history.backup_format
-            )
-        else:
-            checksum = BackupService.run_mssql_backup(conn_info, local_path)
+        # 4. Execute Backup Engine. A transient MSSQL failure is retried
+        # later from the export checkpoint (see the except branch below)
+        result = _run_backup_engine(
+            db_type, conn_info, local_path, history, codec, level, writer, progress, timer,
+            table_filter, checkpoint, chain, parent, cancel
+        )
 
         # 5. Finalize Success in DB
         history.status = BackupStatus.completed
         history.completed_at = datetime.utcnow()
-        history.checksum = checksum
+        history.error_message = None
+        history.checkpoint = None
+        # Saved from other sessions, so this row still has the value it was loaded with
+        flag_modified(history, "checkpoint")
+        history.checksum = result["checksum"]
+        history.secondary_checksum = result["secondary_checksum"]
+        history.compression_codec = result["compression_codec"]
+        history.compression_ratio = result["compression_ratio"]
+        history.uncompressed_size_bytes = result["uncompressed_size_bytes"]
         history.file_name = file_name
-        history.file_size_bytes = os.path.getsize(local_path)
-        history.file_path = local_path 
+        history.file_size_bytes = writer.bytes_written
+        history.file_path = writer.location
+        table_stats = result["table_stats"]
+        measured = [s for s in table_stats if not s["is_estimate"]]
+        history.tables_backed_up = len(measured) or progress.tables_done or None
+        final = progress.snapshot("completed")
+        history.progress_table = None
+        history.progress_rows = final["rows"]
+        history.progress_bytes = final["bytes"]
+        history.progress_percent = final["percent"]
+        history.progress_eta_seconds = 0
+        history.progress_updated_at = datetime.utcnow()
+        history.phase_timings = _phase_timings(timer, queue_wait)
+        if chain is not None:
+            history.parent_backup_id = parent.id if parent is not None else None
+            history.base_backup_id = (parent.base_backup_id or parent.id) if parent is not None else None
+            history.chain_manifest = dict(
+                chain, change_state=result["change_state"], changes=result.get("changes")
+            )
+        if table_stats:
+            # One executemany for the whole job, in the same transaction
+            db.execute(insert(BackupTableStat), [dict(s, backup_id=history.id) for s in table_stats])
+        chunk_refs = ChunkStore.references(history.id, writer)
+        if chunk_refs:
+            db.execute(insert(BackupChunkRef), chunk_refs)
         
         db.commit()
+        progress.finish("completed")
+        metrics.record_job("backup", engine, "completed", time.perf_counter() - started, queue_wait)
+        metrics.record_backup(
+            engine, timer, writer.bytes_written, result["uncompressed_size_bytes"],
+            # Archive-format pg_dumps only have catalog estimates
+            sum(s["row_count"] for s in measured) if measured else None,
+            getattr(writer, "bytes_reused", None)
+        )
         print(f"--- BACKUP SUCCESSFUL: {file_name} ---")
 
     except Exception as e:
-        print(f"--- BACKUP FAILED: {str(e)} ---")
-        history.status = BackupStatus.failed
-        history.error_message = str(e)
+        # The failure may have come from this session (the inserts or the
+        # commit above): start over from the row as last committed
+        db.rollback()
+        db.refresh(history)
+        attempt = (history.retry_count or 0) + 1
+        if (checkpoint is not None and not cancel.is_set() and _is_transient(e)
+                and attempt <= settings.BACKUP_MAX_RETRIES):
+            # Back to the queue, checkpoint kept. pg_dump failures (timeouts
+            # and stalls included) and bad credentials are never retried.
+            delay = _retry_delay(attempt)
+            print(f"!!! BACKUP ATTEMPT {attempt} FAILED: {str(e)} - RETRYING IN {delay:.0f}s !!!")
+            if writer is not None and not writer.closed:
+                writer.abort()
+            history.status = BackupStatus.pending
+            history.retry_count = attempt
+            history.error_message = str(e)
+            db.commit()
+            metrics.record_job(
+                "backup", engine, "retried", time.perf_counter() - started, queue_wait, timer.failed_phase
+            )
+            return delay
+
+        # A cancelled job ends like a failed one, partial files and all, but as 'cancelled'
+        status = BackupStatus.cancelled if cancel.is_set() else BackupStatus.failed
+        message = "Cancelled by user" if cancel.is_set() else str(e)
+        print(f"--- BACKUP {status.value.upper()}: {str(e)} ---")
+        if writer is not None and not writer.closed:
+            writer.abort()
+        if checkpoint is not None:
+            # Out of retries: nothing will resume these segments
+            BackupService.discard_checkpoint(checkpoint)
+            history.checkpoint = None
+            flag_modified(history, "checkpoint")
+        history.status = status
+        history.error_message = message
         history.completed_at = datetime.utcnow()
+        history.phase_timings = _phase_timings(timer, queue_wait)
+        db.commit()
+        progress.finish(status.value, message)
+        metrics.record_job(
+            "backup", engine, status.value, time.perf_counter() - started, queue_wait, timer.failed_phase
+        )
+        metrics.record_backup(engine, timer)
+    finally:
+        stop_watch.set()
+        db.close()
+
+def run_restore_task(restore_id: str, reclaim: bool = False):
+    db = SessionLocal()
+    restore = db.query(RestoreHistory).filter(RestoreHistory.id == restore_id).first()
+    if not restore:
+        print(f"!!! Error: Restore record {restore_id} not found !!!")
+        db.close()
+        return
+
+    if not _claim(db, restore_id, reclaim, model=RestoreHistory):
+        print(f"--- SKIPPING RESTORE {restore_id}: already {restore.status.value} ---")
+        db.close()
+        return
+    db.refresh(restore)
+
+    engine = "unknown"
+    queue_wait = _queue_wait(restore)
+    started = time.perf_counter()
+    try:
+        backup = db.query(BackupHistory).filter(BackupHistory.id == restore.backup_id).first()
+        if not backup or backup.status != BackupStatus.completed or not backup.file_path:
+            raise Exception("Backup to restore is missing or did not complete")
+        conn = db.query(DatabaseConnection).filter(DatabaseConnection.id == restore.connection_id).first()
+        if not conn:
+            raise Exception("Target connection not found in database")
+
+        storage = None
+        if backup.storage_id:
+            storage = db.query(StorageConfiguration).filter(StorageConfiguration.id == backup.storage_id).first()
+        # An incremental backup restores as its base plus every increment up to it
+        chain = _backup_chain(db, backup)
+
+        db_type = str(conn.db_type).lower() if hasattr(conn, 'db_type') else "postgresql"
+        engine = metrics.engine_label(db_type)
+        conn_info = _conn_info(conn, restore.parallel_jobs)
+
+        print(f"\n" + "="*50)
+        print(f"--- RESTORE STARTED ---")
+        print(f"--- DB: {db_type.upper()} | FROM: {backup.file_path} ---")
+        print("="*50 + "\n")
+
+        if "postgres" in db_type:
+            result = RestoreService.run_pg_restore(
+                conn_info, storage, backup.file_path, backup.backup_format,
+                codec=backup.compression_codec, clean=bool(restore.clean_target),
+                expected_checksum=backup.checksum
+            )
+        elif len(chain) > 1:
+            steps = []
+            for step in chain:
+                step_storage = storage
+                if step.storage_id != backup.storage_id:
+                    step_storage = db.query(StorageConfiguration).filter(
+                        StorageConfiguration.id == step.storage_id
+                    ).first()
+                steps.append({
+                    "storage": step_storage,
+                    "location": step.file_path,
+                    "codec": step.compression_codec,
+                    "expected_checksum": step.checksum,
+                })
+            result = RestoreService.run_mssql_chain_restore(conn_info, steps, clean=bool(restore.clean_target))
+        else:
+            result = RestoreService.run_mssql_restore(
+                conn_info, storage, backup.file_path,
+                codec=backup.compression_codec, clean=bool(restore.clean_target),
+                expected_checksum=backup.checksum
+            )
+
+        restore.status = BackupStatus.completed
+        restore.completed_at = datetime.utcnow()
+        for field, value in result.items():
+            setattr(restore, field, value)
+        db.commit()
+        metrics.record_job("restore", engine, "completed", time.perf_counter() - started, queue_wait)
+        mb_per_sec = (result["throughput_bytes_per_sec"] or 0) / (1024 * 1024)
+        print(f"--- RESTORE SUCCESSFUL: {result['duration_seconds']}s, {mb_per_sec:.1f} MiB/s ---")
+
+    except Exception as e:
+        print(f"--- RESTORE FAILED: {str(e)} ---")
+        db.rollback()
+        db.refresh(restore)
+        restore.status = BackupStatus.failed
+        restore.error_message = str(e)
+        restore.completed_at = datetime.utcnow()
         db.commit()
+        metrics.record_job("restore", engine, "failed", time.perf_counter() - started, queue_wait, "restore")
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# --- Celery entry point ---
+
+_redis = None
+
+@contextmanager
+def _connection_slot(connection_id: str, history_id: str):
+    """
+    Per-connection concurrency gate shared by all Celery workers.
+
+    Each running job is a member of a Redis sorted set scored by its start
+    time; a job holds a slot if its rank is below the limit. Ties resolve
+    deterministically, so two workers racing for the last slot can't both
+    win. Every member also has a lease key, renewed by a heartbeat thread
+    while the job runs however long it takes; members whose lease lapsed
+    for WORKER_SLOT_TTL_SECONDS (a killed worker) are dropped.
+    """
+    global _redis
+    if not connection_id:
+        yield True
+        return
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.REDIS_URL)
+
+    ttl = settings.WORKER_SLOT_TTL_SECONDS
+    key = f"backup:slots:{connection_id}"
+    for member in _redis.zrange(key, 0, -1):
+        if not _redis.exists(f"{key}:{member.decode()}"):
+            _redis.zrem(key, member)
+    # The lease goes first, so another worker's sweep never drops this member
+    _redis.set(f"{key}:{history_id}", 1, ex=ttl)
+    _redis.zadd(key, {history_id: time.time()}, nx=True)
+    _redis.expire(key, ttl)
+    rank = _redis.zrank(key, history_id)
+    acquired = rank is not None and rank < settings.WORKER_PER_CONNECTION_LIMIT
+    stop = threading.Event()
+    try:
+        if not acquired:
+            _redis.zrem(key, history_id)
+            _redis.delete(f"{key}:{history_id}")
+        else:
+            threading.Thread(
+                target=_renew_slot, args=(key, history_id, stop), name="slot-heartbeat", daemon=True
+            ).start()
+        yield acquired
+    finally:
+        stop.set()
+        if acquired:
+            _redis.zrem(key, history_id)
+            _redis.delete(f"{key}:{history_id}")
+
+def _renew_slot(key: str, member: str, stop: threading.Event):
+    ttl = settings.WORKER_SLOT_TTL_SECONDS
+    while not stop.wait(max(1, ttl // 3)):
+        try:
+            _redis.set(f"{key}:{member}", 1, ex=ttl)
+            _redis.expire(key, ttl)
+        except Exception as e:
+            print(f"!!! Could not renew connection slot {key}: {e} !!!")
+
+@celery_app.task(bind=True, name="backups.run", acks_late=True, reject_on_worker_lost=True, max_retries=None)
+def run_backup_job(self, history_id: str, connection_id: str = None):
+    with _connection_slot(connection_id, history_id) as acquired:
+        if not acquired:
+            raise self.retry(countdown=settings.WORKER_SLOT_RETRY_SECONDS)
+        # A redelivered message means the previous worker died mid-backup
+        redelivered = bool((self.request.delivery_info or {}).get("redelivered"))
+        retry_in = run_backup_task(history_id, reclaim=redelivered)
+    if retry_in is not None:
+        # A fresh message, not self.retry(): the slot and this worker are free while it waits
+        run_backup_job.apply_async(args=[history_id, connection_id], countdown=retry_in)
+
+@celery_app.task(bind=True, name="restores.run", acks_late=True, reject_on_worker_lost=True, max_retries=None)
+def run_restore_job(self, restore_id: str, connection_id: str = None):
+    # Shares the per-connection slots with backups: never dump and restore the same database at once
+    with _connection_slot(connection_id, restore_id) as acquired:
+        if not acquired:
+            raise self.retry(countdown=settings.WORKER_SLOT_RETRY_SECONDS)
+        redelivered = bool((self.request.delivery_info or {}).get("redelivered"))
+        run_restore_task(restore_id, reclaim=redelivered)
@@ -0,0 +1,99 @@
+"""
+Latency of authenticated requests with and without the principal cache.
+
+Drives the API in-process (httpx over ASGI, no network) with --clients
+concurrent clients polling GET /api/v1/auth/me, the endpoint that does
+nothing but authenticate, and prints p50/p99 with AUTH_CACHE_TTL_SECONDS=0
+(the user looked up on every request) and with the cache on:
+
+    python benchmarks/bench_auth.py --requests 5000 --clients 20
+
+Uses a scratch SQLite database unless DATABASE_URL points at a migrated
+metadata DB; a real server (network round trip, pool checkout) shows the
+difference far better than SQLite in the same process.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ENCRYPTION_KEY", "bench-encryption-key")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/bench_auth.db")
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+from app.core.auth_cache import principal_cache  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.db.session import SessionLocal, async_engine, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+ENDPOINT = "/api/v1/auth/me"
+
+
+async def load(token: str, requests: int, clients: int) -> list:
+    latencies = []
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker(n: int):
+            for _ in range(n):
+                start = time.perf_counter()
+                response = await client.get(ENDPOINT, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        await asyncio.gather(*(worker(requests // clients) for _ in range(clients)))
+    return latencies
+
+
+async def measure(token: str, requests: int, clients: int):
+    # One event loop for every run: the async engine's pool is bound to it
+    for label, ttl in (("no cache", 0), ("cached", 60)):
+        settings.AUTH_CACHE_TTL_SECONDS = ttl
+        principal_cache.clear()
+        await load(token, clients, clients)  # warm-up
+        start = time.perf_counter()
+        latencies = await load(token, requests, clients)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<9} p50={percentile(latencies, 50):7.2f} ms  p99={percentile(latencies, 99):7.2f} ms  "
+              f"throughput={len(latencies) / elapsed:8.0f} req/s")
+    await async_engine.dispose()
+
+
+def percentile(values: list, q: float) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=20)
+    args = parser.parse_args()
+
+    if engine.dialect.name == "sqlite":
+        User.__table__.create(engine, checkfirst=True)
+    db = SessionLocal()
+    user = User(email=f"bench-{time.time_ns()}@example.com", hashed_password="-")
+    db.add(user)
+    db.commit()
+    token = create_access_token(user.id)
+    print(f"{args.requests} x GET {ENDPOINT}, {args.clients} clients, {engine.dialect.name}\n")
+
+    try:
+        asyncio.run(measure(token, args.requests, args.clients))
+    finally:
+        db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
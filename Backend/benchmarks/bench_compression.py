@@ -0,0 +1,61 @@
+"""
+Throughput and ratio of each compression codec on scripter output.
+
+Generates an MSSQL-style script in memory with the fake cursor from
+bench_mssql_encoding.py, then pushes it through BackupOutput once per
+codec/level:
+
+    python benchmarks/bench_compression.py --rows 300000
+
+The synthetic rows repeat a lot, so absolute ratios are far higher than on
+real tables; compare codecs relative to each other.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.mssql_scripter import MSSQLScripter  # noqa: E402
+from app.services.output_service import BackupOutput  # noqa: E402
+from bench_mssql_encoding import FakeCursor  # noqa: E402
+
+CASES = [
+    (None, None),
+    ("gzip", 1), ("gzip", 6),
+    ("zstd", 1), ("zstd", 3), ("zstd", 9),
+    ("lz4", 0), ("lz4", 9),
+]
+CHUNK = 1024 * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=300_000)
+    args = parser.parse_args()
+
+    text = io.StringIO()
+    MSSQLScripter(FakeCursor(args.rows), text).script_table("bench")
+    payload = memoryview(text.getvalue().encode("utf-8"))
+    print(f"input: {len(payload) / 1e6:.1f} MB of INSERT script\n")
+
+    for codec, level in CASES:
+        try:
+            start = time.perf_counter()
+            with BackupOutput(os.devnull, codec, level) as out:
+                for i in range(0, len(payload), CHUNK):
+                    out.write(payload[i:i + CHUNK])
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            print(f"{codec}:{level} skipped ({e})")
+            continue
+        label = f"{codec}:{level}" if codec else "none"
+        ratio = len(payload) / out.bytes_out
+        print(f"{label:<8} in={len(payload) / 1e6:7.1f} MB  out={out.bytes_out / 1e6:7.1f} MB  "
+              f"ratio={ratio:6.2f}x  throughput={len(payload) / elapsed / 1e6:8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Per-call latency of credential encrypt/decrypt.
+
+Compares deriving the PBKDF2 key on every call (the old behaviour) with
+the process-wide key cache in crypto_service:
+
+    SECRET_KEY=x ENCRYPTION_KEY=secret python benchmarks/bench_crypto.py --calls 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ENCRYPTION_KEY", "bench-encryption-key")
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://bench@localhost/bench")
+
+from app.services import crypto_service  # noqa: E402
+
+PLAINTEXT = "correct horse battery staple"
+
+
+def per_call_us(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    token = crypto_service.encrypt(PLAINTEXT)
+
+    def uncached(fn):
+        def run():
+            crypto_service.derive_key.cache_clear()
+            fn()
+        return run
+
+    cases = [
+        ("encrypt, derive per call", uncached(lambda: crypto_service.encrypt(PLAINTEXT))),
+        ("decrypt, derive per call", uncached(lambda: crypto_service.decrypt(token))),
+        ("encrypt, cached key", lambda: crypto_service.encrypt(PLAINTEXT)),
+        ("decrypt, cached key", lambda: crypto_service.decrypt(token)),
+    ]
+    for label, fn in cases:
+        # The uncached cases are ~100 ms each; keep their run short
+        calls = max(1, args.calls // 20) if "per call" in label else args.calls
+        print(f"{label:<26} {per_call_us(fn, calls):12.1f} us/call  ({calls} calls)")
+
+
+if __name__ == "__main__":
+    main()
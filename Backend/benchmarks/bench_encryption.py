@@ -0,0 +1,117 @@
+"""
+Cost of encrypting backups on the way to storage.
+
+Generates an MSSQL-style script in memory with the fake cursor from
+bench_mssql_encoding.py (how fast the scripter produces it is printed as
+the reference), then seals and opens it with EncryptingWriter /
+DecryptingReader at several segment sizes, and times ranged reads that
+start in the middle of the stream:
+
+    python benchmarks/bench_encryption.py --rows 300000
+
+Encryption should run well ahead of the scripter, so an encrypted backup
+takes about as long as a plain one.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ENCRYPTION_KEY", "bench-encryption-key")
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://bench@localhost/bench")
+
+from app.services.encryption_service import EncryptionService  # noqa: E402
+from app.services.mssql_scripter import MSSQLScripter  # noqa: E402
+from bench_mssql_encoding import FakeCursor  # noqa: E402
+
+SEGMENT_KB = [64, 256, 1024, 4096]
+CHUNK = 1024 * 1024
+
+
+class MemorySink:
+    """
+    Stand-in StorageWriter; keeps the sealed bytes for the read side
+    unless `keep` is off (timed runs, so buffer growth isn't measured).
+    """
+
+    def __init__(self, keep: bool = True):
+        self.buffer = io.BytesIO() if keep else None
+        self.bytes_written = 0
+        self.location = "memory"
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self.buffer.write(data) if self.buffer is not None else len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+def opener(sealed: bytes):
+    return lambda offset: io.BytesIO(sealed[offset:])
+
+
+def encrypt(view, segment_kb: int, sink: MemorySink):
+    writer = EncryptionService.open_writer(sink, segment_kb * 1024)
+    for i in range(0, len(view), CHUNK):
+        writer.write(view[i:i + CHUNK])
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--seeks", type=int, default=200)
+    args = parser.parse_args()
+
+    text = io.StringIO()
+    start = time.perf_counter()
+    MSSQLScripter(FakeCursor(args.rows), text).script_table("bench")
+    payload = text.getvalue().encode("utf-8")
+    elapsed = time.perf_counter() - start
+    print(f"input: {len(payload) / 1e6:.1f} MB of INSERT script, "
+          f"scripted at {len(payload) / elapsed / 1e6:.1f} MB/s\n")
+
+    view = memoryview(payload)
+    rnd = random.Random(0)
+    # First pass pays for OpenSSL setup and faulting in the payload
+    encrypt(view, SEGMENT_KB[0], MemorySink(keep=False))
+    for kb in SEGMENT_KB:
+        start = time.perf_counter()
+        encrypt(view, kb, MemorySink(keep=False))
+        encrypted = time.perf_counter() - start
+        sink = MemorySink()
+        encrypt(view, kb, sink)
+        sealed = sink.buffer.getvalue()
+
+        start = time.perf_counter()
+        reader = io.BufferedReader(EncryptionService.open_reader(opener(sealed)), CHUNK)
+        while reader.read(CHUNK):
+            pass
+        decrypt = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.seeks):
+            ranged = EncryptionService.open_reader(opener(sealed), rnd.randrange(len(payload)))
+            ranged.read(64 * 1024)
+            ranged.close()
+        seek_ms = (time.perf_counter() - start) / args.seeks * 1e3
+
+        overhead = (len(sealed) - len(payload)) / len(payload) * 100
+        print(f"segment={kb:>5} KB  encrypt={len(payload) / encrypted / 1e6:8.1f} MB/s  "
+              f"decrypt={len(payload) / decrypt / 1e6:8.1f} MB/s  "
+              f"ranged read={seek_ms:6.2f} ms  overhead={overhead:.3f}%")
+
+
+if __name__ == "__main__":
+    main()
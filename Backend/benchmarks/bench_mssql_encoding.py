@@ -0,0 +1,95 @@
+"""
+Script size and CPU time of the MSSQL value encoders.
+
+Compares the legacy one-INSERT-per-row output (isinstance chain per cell)
+with MSSQLScripter's multi-row INSERTs and per-column encoders:
+
+    python benchmarks/bench_mssql_encoding.py --rows 500000
+"""
+import argparse
+import datetime
+import decimal
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.mssql_scripter import BINARY, DATETIME, DECIMAL, NUMBER, STRING, MSSQLScripter  # noqa: E402
+from bench_mssql_streaming import legacy_encode  # noqa: E402
+
+DESCRIPTION = [
+    ("id", NUMBER), ("name", STRING), ("price", DECIMAL), ("active", NUMBER),
+    ("created_at", DATETIME), ("row_guid", BINARY), ("payload", BINARY),
+]
+
+
+class CountingSink:
+    def __init__(self):
+        self.chars = 0
+
+    def write(self, s):
+        self.chars += len(s)
+
+
+class FakeCursor:
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.description = None
+        self._it = iter(())
+
+    def _generate(self):
+        created = datetime.datetime(2024, 1, 1, 12, 30, 15, 250000)
+        guid = uuid.UUID("6f1c1d5e-8a3b-4a9e-9d6c-2b1f0e7a4c11")
+        for i in range(self.rows):
+            yield (i, f"item {i}", decimal.Decimal("19.99"), i % 2 == 0, created, guid, b"\x00\x01\xfe")
+
+    def execute(self, sql, params=None):
+        self.description = DESCRIPTION
+        self._it = self._generate()
+
+    def fetchmany(self, size):
+        out = []
+        for row in self._it:
+            out.append(row)
+            if len(out) >= size:
+                break
+        return out
+
+
+def run_legacy(rows: int, sink):
+    cursor = FakeCursor(rows)
+    cursor.execute("SELECT * FROM [bench]")
+    col_names = ", ".join(f"[{c[0]}]" for c in cursor.description)
+    while True:
+        chunk = cursor.fetchmany(5000)
+        if not chunk:
+            break
+        for row in chunk:
+            values = [legacy_encode(v) for v in row]
+            sink.write(f"INSERT INTO [bench] ({col_names}) VALUES ({', '.join(values)});\n")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args()
+
+    cases = [
+        ("legacy per-row", lambda sink: run_legacy(args.rows, sink)),
+        ("scripter x1", lambda sink: MSSQLScripter(FakeCursor(args.rows), sink, rows_per_insert=1).script_table("bench")),
+        ("scripter x1000", lambda sink: MSSQLScripter(FakeCursor(args.rows), sink).script_table("bench")),
+    ]
+    for name, fn in cases:
+        sink = CountingSink()
+        start = time.process_time()
+        written = fn(sink)
+        cpu = time.process_time() - start
+        print(f"{name:<15} rows={written:>9,}  script={sink.chars / 1e6:8.1f} MB  "
+              f"cpu={cpu:6.2f}s  us/row={cpu / written * 1e6:6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Peak RSS and throughput of the MSSQL scripter against a fake cursor.
+
+Each mode runs in its own subprocess so ru_maxrss reflects only that mode:
+
+    python benchmarks/bench_mssql_streaming.py --rows 2000000
+    python benchmarks/bench_mssql_streaming.py --rows 2000000 --batch-size 1000
+
+"fetchall" reproduces the old behaviour (whole table materialised as dicts)
+as a baseline; "stream" is MSSQLScripter with fetchmany().
+"""
+import argparse
+import datetime
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.mssql_scripter import MSSQLScripter  # noqa: E402
+
+DESCRIPTION = [
+    ("id", 3), ("name", 1), ("amount", 3), ("active", 3), ("created_at", 4),
+]
+
+
+class FakeCursor:
+    """
+    Generates rows lazily, like a server-side result set would.
+    """
+
+    def __init__(self, rows: int, as_dict: bool = False):
+        self.rows = rows
+        self.as_dict = as_dict
+        self.description = None
+        self._it = iter(())
+
+    def _generate(self):
+        created = datetime.datetime(2024, 1, 1)
+        names = [c[0] for c in DESCRIPTION]
+        for i in range(self.rows):
+            row = (i, f"customer-{i} o'brien", i * 1.25, i % 2 == 0, created)
+            yield dict(zip(names, row)) if self.as_dict else row
+
+    def execute(self, sql, params=None):
+        self.description = DESCRIPTION
+        self._it = self._generate()
+
+    def fetchmany(self, size):
+        out = []
+        for row in self._it:
+            out.append(row)
+            if len(out) >= size:
+                break
+        return out
+
+    def fetchall(self):
+        return list(self._it)
+
+
+def legacy_encode(val):
+    if val is None:
+        return "NULL"
+    if isinstance(val, (int, float, bool)):
+        return str(int(val) if isinstance(val, bool) else val)
+    clean_val = str(val).replace("'", "''")
+    return f"N'{clean_val}'"
+
+
+def run_fetchall(rows: int, out):
+    cursor = FakeCursor(rows, as_dict=True)
+    cursor.execute("SELECT * FROM [bench]")
+    data = cursor.fetchall()
+    columns = data[0].keys()
+    col_names = ", ".join(f"[{c}]" for c in columns)
+    for row in data:
+        values = [legacy_encode(row[col]) for col in columns]
+        out.write(f"INSERT INTO [bench] ({col_names}) VALUES ({', '.join(values)});\n")
+    return len(data)
+
+
+def run_stream(rows: int, out, batch_size: int):
+    return MSSQLScripter(FakeCursor(rows), out, batch_size=batch_size).script_table("bench")
+
+
+def child(mode: str, rows: int, batch_size: int):
+    with open(os.devnull, "w", encoding="utf-8") as out:
+        start = time.perf_counter()
+        if mode == "fetchall":
+            written = run_fetchall(rows, out)
+        else:
+            written = run_stream(rows, out, batch_size)
+        elapsed = time.perf_counter() - start
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    print(f"{mode:<9} rows={written:>10,}  peak_rss={peak_mb:8.1f} MiB  "
+          f"elapsed={elapsed:6.2f}s  rows/sec={written / elapsed:>12,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--mode", choices=["fetchall", "stream"])
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args.rows, args.batch_size)
+        return
+
+    for mode in ("fetchall", "stream"):
+        subprocess.run([
+            sys.executable, __file__, "--mode", mode,
+            "--rows", str(args.rows), "--batch-size", str(args.batch_size),
+        ], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Many dashboards polling the history list at once.
+
+Drives the API in-process (httpx over ASGI, no network) with --clients
+concurrent clients each polling GET /api/v1/history/ and prints latency,
+throughput and failed requests. Sync handlers each held a threadpool
+thread and a pooled connection for the whole request; async ones only
+hold a connection while a query runs:
+
+    python benchmarks/bench_polling.py --requests 4000 --clients 200
+
+Uses a scratch SQLite database (aiosqlite) unless DATABASE_URL points at a
+migrated metadata DB; run it against Postgres to see asyncpg, and with
+DATABASE_PGBOUNCER=true against a PgBouncer port.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ENCRYPTION_KEY", "bench-encryption-key")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/bench_polling.db")
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.db.session import SessionLocal, async_engine, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.connection import DatabaseConnection  # noqa: E402
+from app.models.history import BackupHistory, BackupStatus  # noqa: E402
+from app.models.schedule import BackupFormat, BackupType  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+ENDPOINT = "/api/v1/history/?limit=20"
+
+
+async def load(token: str, requests: int, clients: int):
+    latencies, failures = [], 0
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def worker(n: int):
+            nonlocal failures
+            for _ in range(n):
+                start = time.perf_counter()
+                try:
+                    response = await client.get(ENDPOINT, headers=headers)
+                    response.raise_for_status()
+                except Exception:
+                    failures += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker(requests // clients) for _ in range(clients)))
+    return latencies, failures
+
+
+async def measure(token: str, requests: int, clients: int):
+    # One event loop for every run: the async engine's pool is bound to it
+    await load(token, clients, clients)  # warm-up
+    start = time.perf_counter()
+    latencies, failures = await load(token, requests, clients)
+    elapsed = time.perf_counter() - start
+    if latencies:
+        print(f"p50={percentile(latencies, 50):8.2f} ms  p99={percentile(latencies, 99):8.2f} ms  "
+              f"throughput={len(latencies) / elapsed:6.0f} req/s  failed={failures}")
+    else:
+        print(f"all {failures} requests failed")
+    await async_engine.dispose()
+
+
+def percentile(values: list, q: float) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=100, help="History rows of the polling user")
+    args = parser.parse_args()
+
+    if engine.dialect.name == "sqlite":
+        for model in (User, DatabaseConnection, BackupHistory):
+            model.__table__.create(engine, checkfirst=True)
+    db = SessionLocal()
+    user = User(email=f"bench-{time.time_ns()}@example.com", hashed_password="-")
+    db.add(user)
+    db.flush()
+    db.add_all(
+        BackupHistory(user_id=user.id, status=BackupStatus.completed,
+                      backup_type=BackupType.full, backup_format=BackupFormat.sql)
+        for _ in range(args.rows)
+    )
+    db.commit()
+    token = create_access_token(user.id)
+    pool = "NullPool" if settings.DATABASE_PGBOUNCER else f"pool {settings.DATABASE_POOL_SIZE}+{settings.DATABASE_MAX_OVERFLOW}"
+    print(f"{args.requests} x GET {ENDPOINT}, {args.clients} clients, {async_engine.dialect.driver}, {pool}\n")
+
+    try:
+        asyncio.run(measure(token, args.requests, args.clients))
+    finally:
+        db.query(BackupHistory).filter(BackupHistory.user_id == user.id).delete(synchronize_session=False)
+        db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
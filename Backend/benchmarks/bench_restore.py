@@ -0,0 +1,158 @@
+"""
+Restore throughput against a local database.
+
+MSSQL: scripts a synthetic table with MSSQLScripter, then loads it back
+into a scratch table two ways and reports rows/sec:
+
+  * "per-line"  - the naive replay: one execute + commit per statement,
+                  one row per INSERT
+  * "batched"   - MSSQLReplayer: 1000-row INSERTs, MSSQL_RESTORE_BATCH_STATEMENTS
+                  per round trip, commit every MSSQL_RESTORE_COMMIT_STATEMENTS
+
+    python benchmarks/bench_restore.py mssql --host localhost --port 1433 \\
+        --user sa --password '...' --database bench --rows 200000
+
+Postgres: restores an existing custom-format dump with pg_restore at
+each --jobs value (the target database is cleaned each run):
+
+    python benchmarks/bench_restore.py pg --host localhost --user postgres \\
+        --password '...' --database bench_restore --dump /path/to/db.dump --jobs 1 2 4 8
+
+Without a server, "split" measures the statement splitter alone:
+
+    python benchmarks/bench_restore.py split --rows 2000000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ENCRYPTION_KEY", "bench-encryption-key")
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://bench@localhost/bench")
+
+from app.core.config import settings  # noqa: E402
+from app.services.backup_service import BackupService  # noqa: E402
+from app.services.mssql_replayer import MSSQLReplayer, iter_statements  # noqa: E402
+from app.services.mssql_scripter import MSSQLScripter  # noqa: E402
+from app.services.restore_service import RestoreService  # noqa: E402
+
+TABLE = "bench_restore"
+DESCRIPTION = [("id", 3), ("name", 1), ("amount", 3), ("note", 1)]
+
+
+class FakeCursor:
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.description = DESCRIPTION
+        self._it = iter(())
+
+    def execute(self, sql, params=None):
+        self._it = ((i, f"customer-{i} o'brien", i * 1.25, "a;b -- not a comment") for i in range(self.rows))
+
+    def fetchmany(self, size):
+        out = []
+        for row in self._it:
+            out.append(row)
+            if len(out) >= size:
+                break
+        return out
+
+
+def make_script(rows: int, rows_per_insert: int) -> str:
+    out = io.StringIO()
+    MSSQLScripter(FakeCursor(rows), out, batch_size=5000, rows_per_insert=rows_per_insert).script_table(TABLE)
+    return out.getvalue()
+
+
+def report(label: str, rows: int, elapsed: float, size: int = None):
+    extra = f"  {size / elapsed / (1024 * 1024):8.1f} MiB/s" if size else ""
+    print(f"{label:<10} rows={rows:>10,}  elapsed={elapsed:7.2f}s  rows/sec={rows / elapsed:>12,.0f}{extra}")
+
+
+def bench_split(args):
+    script = make_script(args.rows, settings.MSSQL_INSERT_BATCH_ROWS)
+    start = time.perf_counter()
+    statements = sum(1 for _ in iter_statements(io.StringIO(script)))
+    elapsed = time.perf_counter() - start
+    report("split", args.rows, elapsed, len(script.encode()))
+    print(f"{'':<10} statements={statements:,}")
+
+
+def bench_mssql(args):
+    conn_details = {
+        "host": args.host, "port": args.port or 1433, "username": args.user,
+        "password": args.password, "database_name": args.database,
+    }
+    conn = BackupService._connect_mssql(conn_details)
+    cursor = conn.cursor()
+
+    def reset():
+        cursor.execute(f"IF OBJECT_ID('{TABLE}') IS NOT NULL DROP TABLE [{TABLE}]")
+        cursor.execute(f"CREATE TABLE [{TABLE}] (id INT PRIMARY KEY, name NVARCHAR(100), amount FLOAT, note NVARCHAR(50))")
+        conn.commit()
+
+    try:
+        reset()
+        script = make_script(args.rows, 1)
+        start = time.perf_counter()
+        for statement in iter_statements(io.StringIO(script)):
+            cursor.execute(statement)
+            conn.commit()
+        report("per-line", args.rows, time.perf_counter() - start)
+
+        reset()
+        script = make_script(args.rows, settings.MSSQL_INSERT_BATCH_ROWS)
+        replayer = MSSQLReplayer(
+            conn,
+            batch_statements=settings.MSSQL_RESTORE_BATCH_STATEMENTS,
+            commit_statements=settings.MSSQL_RESTORE_COMMIT_STATEMENTS
+        )
+        start = time.perf_counter()
+        rows = replayer.replay(iter_statements(io.StringIO(script)))
+        report("batched", rows, time.perf_counter() - start)
+    finally:
+        cursor.execute(f"IF OBJECT_ID('{TABLE}') IS NOT NULL DROP TABLE [{TABLE}]")
+        conn.commit()
+        conn.close()
+
+
+def bench_pg(args):
+    size = os.path.getsize(args.dump)
+    for jobs in args.jobs:
+        conn_details = {
+            "host": args.host, "port": args.port or 5432, "username": args.user,
+            "password": args.password, "database_name": args.database, "parallel_jobs": jobs,
+        }
+        result = RestoreService.run_pg_restore(conn_details, None, args.dump, "dump", clean=True)
+        print(f"jobs={jobs:<3} elapsed={result['duration_seconds']:7.2f}s  "
+              f"{size / result['duration_seconds'] / (1024 * 1024):8.1f} MiB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("target", choices=["split", "mssql", "pg"])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--user")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database")
+    parser.add_argument("--dump", help="custom-format (-Fc) dump for the pg benchmark")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    if args.target == "split":
+        bench_split(args)
+    elif args.target == "mssql":
+        bench_mssql(args)
+    else:
+        if not args.dump:
+            parser.error("pg needs --dump")
+        bench_pg(args)
+
+
+if __name__ == "__main__":
+    main()
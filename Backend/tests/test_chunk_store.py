@@ -0,0 +1,110 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.history import BackupChunk
+from app.services import chunk_store
+from app.services.chunk_store import ChunkStoreWriter, ContentChunker
+from app.services.storage_service import StorageService
+
+SIZES = (1024, 4096, 16384)
+
+
+def payload(size: int, seed: int = 1) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def chunk(data: bytes, pieces=None) -> list:
+    chunker = ContentChunker(*SIZES)
+    chunks = []
+    if pieces is None:
+        chunks += chunker.push(data)
+    else:
+        rnd = random.Random(pieces)
+        i = 0
+        while i < len(data):
+            n = rnd.randint(1, 3 * SIZES[2])
+            chunks += chunker.push(data[i:i + n])
+            i += n
+    return chunks + chunker.finish()
+
+
+def test_chunks_reassemble_within_bounds():
+    data = payload(300_000)
+    chunks = chunk(data)
+    assert b"".join(chunks) == data
+    assert all(SIZES[0] <= len(c) <= SIZES[2] for c in chunks[:-1])
+    assert len(chunks[-1]) <= SIZES[2]
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_cuts_do_not_depend_on_write_sizes(seed):
+    data = payload(300_000)
+    assert chunk(data, pieces=seed) == chunk(data)
+
+
+def test_edit_only_changes_nearby_chunks():
+    data = payload(300_000)
+    edited = data[:150_000] + b"inserted" + data[150_000:]
+    before, after = set(chunk(data)), chunk(edited)
+    changed = [c for c in after if c not in before]
+    assert sum(len(c) for c in changed) <= 3 * SIZES[2]
+
+
+def test_invalid_sizes():
+    with pytest.raises(Exception):
+        ContentChunker(32, 1024, 4096)
+    with pytest.raises(Exception):
+        ContentChunker(4096, 1024, 16384)
+
+
+def test_python_fallback_cuts_like_fastcdc(monkeypatch):
+    compiled = pytest.importorskip("fastcdc.fastcdc_cy").fastcdc_cy
+    data = payload(300_000, seed=7)
+    monkeypatch.setattr(chunk_store, "_fastcdc", compiled)
+    with_fastcdc = chunk(data, pieces=4)
+    monkeypatch.setattr(chunk_store, "_fastcdc", None)
+    assert chunk(data, pieces=4) == with_fastcdc
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chunks.db'}", connect_args={"check_same_thread": False})
+    BackupChunk.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def store(data: bytes, name: str, local_dir: str, session_factory, batch_size: int) -> ChunkStoreWriter:
+    # One batch at a time: concurrent batches may each upload a chunk new to both
+    writer = ChunkStoreWriter(
+        None, name, local_dir, session_factory, ContentChunker(*SIZES), max_in_flight=1, batch_size=batch_size
+    )
+    for i in range(0, len(data), 10_000):
+        writer.write(data[i:i + 10_000])
+    writer.close()
+    return writer
+
+
+@pytest.mark.parametrize("batch_size", [1, 50_000, 10_000_000])
+def test_writer_dedupes_across_backups(tmp_path, session_factory, batch_size):
+    block = payload(40_000, seed=3)
+    data = block * 3 + payload(100_000, seed=4)
+    first = store(data, "a.sql", str(tmp_path), session_factory, batch_size)
+    # Repeats inside one backup are stored once
+    assert first.bytes_new < len(data) - len(block)
+
+    edited = data[:120_000] + b"changed" + data[120_000:]
+    second = store(edited, "b.sql", str(tmp_path), session_factory, batch_size)
+    assert second.bytes_reused > len(edited) - 3 * SIZES[2]
+    assert second.bytes_new + second.bytes_reused == len(edited)
+
+    reader = StorageService.open_reader(None, second.location)
+    assert reader.read() == edited
+    reader.close()
+    db = session_factory()
+    stored = {row.id for row in db.query(BackupChunk)}
+    db.close()
+    assert set(first.chunk_ids) | set(second.chunk_ids) == stored
@@ -0,0 +1,66 @@
+import io
+import os
+
+import pytest
+
+from app.services.compression_service import CODECS, CompressionService
+
+
+def codec_available(codec: str):
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    elif codec == "lz4":
+        pytest.importorskip("lz4.frame")
+
+
+def compress(parts: list, codec: str, level=None) -> bytes:
+    # Each part is its own frame, as a resumed export appends them
+    raw = io.BytesIO()
+    for part in parts:
+        writer = CompressionService.open_writer(raw, codec, level)
+        writer.write(part)
+        writer.close()
+        assert not raw.closed
+    return raw.getvalue()
+
+
+def decompress(data: bytes, codec: str, read_size: int = -1) -> bytes:
+    reader = CompressionService.open_reader(io.BytesIO(data), codec)
+    out = b""
+    while True:
+        block = reader.read(read_size)
+        if not block:
+            break
+        out += block
+        if read_size < 0:
+            break
+    reader.close()
+    return out
+
+
+@pytest.mark.parametrize("codec", list(CODECS))
+def test_round_trip(codec):
+    codec_available(codec)
+    data = os.urandom(50_000) + b"row\n" * 50_000
+    assert decompress(compress([data], codec), codec) == data
+
+
+@pytest.mark.parametrize("codec", list(CODECS))
+@pytest.mark.parametrize("read_size", [-1, 1000, 1 << 20])
+def test_concatenated_frames(codec, read_size):
+    codec_available(codec)
+    parts = [b"first frame\n" * 1000, b"", os.urandom(3000), b"last frame\n" * 2000]
+    assert decompress(compress(parts, codec), codec, read_size) == b"".join(parts)
+
+
+def test_gzip_is_deterministic():
+    data = b"row\n" * 1000
+    assert compress([data], "gzip") == compress([data], "gzip")
+
+
+def test_unknown_codec():
+    with pytest.raises(Exception, match="Unsupported compression codec 'brotli'"):
+        CompressionService.validate("brotli")
+    assert CompressionService.validate(None) is None
+    assert CompressionService.extension(None) == ""
+    assert CompressionService.extension("zstd") == ".zst"
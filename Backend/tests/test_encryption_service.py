@@ -0,0 +1,142 @@
+import io
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.services.encryption_service import HEADER, TAG_SIZE, EncryptionService
+
+SEGMENT = 64
+
+
+class MemoryWriter:
+    """
+    StorageWriter stand-in keeping the artifact in memory.
+    """
+
+    location = "memory"
+
+    def __init__(self):
+        self.data = b""
+        self.closed = False
+        self.aborted = False
+
+    def write(self, data):
+        self.data += bytes(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def abort(self):
+        self.aborted = True
+
+
+def encrypt(plaintext: bytes, pieces: int = 7) -> bytes:
+    raw = MemoryWriter()
+    writer = EncryptionService.open_writer(raw, SEGMENT)
+    for i in range(0, len(plaintext), pieces):
+        writer.write(plaintext[i:i + pieces])
+    writer.close()
+    assert raw.closed and writer.bytes_written == len(plaintext)
+    return raw.data
+
+
+def decrypt(artifact: bytes, start: int = 0) -> bytes:
+    reader = EncryptionService.open_reader(lambda offset: io.BytesIO(artifact[offset:]), start)
+    try:
+        return reader.read()
+    finally:
+        reader.close()
+
+
+@pytest.mark.parametrize("size", [0, 1, SEGMENT - 1, SEGMENT, SEGMENT + 1, 5 * SEGMENT, 5 * SEGMENT + 17])
+def test_round_trip(size):
+    plaintext = os.urandom(size)
+    assert decrypt(encrypt(plaintext)) == plaintext
+
+
+def test_decrypt_from_any_start():
+    plaintext = os.urandom(4 * SEGMENT + 9)
+    artifact = encrypt(plaintext)
+    for start in range(len(plaintext) + 1):
+        assert decrypt(artifact, start) == plaintext[start:], start
+
+
+def test_ranged_read_skips_earlier_segments():
+    plaintext = os.urandom(10 * SEGMENT)
+    artifact = encrypt(plaintext)
+    opened = []
+
+    def open_at(offset):
+        opened.append(offset)
+        return io.BytesIO(artifact[offset:])
+
+    reader = EncryptionService.open_reader(open_at, 7 * SEGMENT + 3)
+    assert reader.read(10) == plaintext[7 * SEGMENT + 3:7 * SEGMENT + 13]
+    reader.close()
+    header = len(artifact) - 10 * (SEGMENT + TAG_SIZE)
+    assert opened == [0, header + 7 * (SEGMENT + TAG_SIZE)]
+
+
+def test_same_plaintext_encrypts_differently():
+    plaintext = b"x" * (3 * SEGMENT)
+    assert encrypt(plaintext) != encrypt(plaintext)
+
+
+@pytest.mark.parametrize("cut", [1, TAG_SIZE, SEGMENT + TAG_SIZE])
+def test_truncation_fails(cut):
+    artifact = encrypt(os.urandom(4 * SEGMENT))
+    with pytest.raises(Exception, match="truncated|authentication"):
+        decrypt(artifact[:-cut])
+
+
+def test_truncation_at_a_segment_boundary_fails():
+    # Dropping whole segments leaves a segment that wasn't sealed as the last one
+    plaintext = os.urandom(4 * SEGMENT + 5)
+    artifact = encrypt(plaintext)
+    header = len(artifact) - 4 * (SEGMENT + TAG_SIZE) - (5 + TAG_SIZE)
+    with pytest.raises(Exception, match="authentication"):
+        decrypt(artifact[:header + 2 * (SEGMENT + TAG_SIZE)])
+
+
+def test_tampering_fails():
+    artifact = bytearray(encrypt(os.urandom(3 * SEGMENT)))
+    artifact[-(SEGMENT + TAG_SIZE) // 2] ^= 1
+    with pytest.raises(Exception, match="authentication"):
+        decrypt(bytes(artifact))
+
+
+def test_reordered_segments_fail():
+    artifact = encrypt(os.urandom(3 * SEGMENT + 1))
+    sealed = SEGMENT + TAG_SIZE
+    header = len(artifact) - 3 * sealed - (1 + TAG_SIZE)
+    body = artifact[header:]
+    swapped = artifact[:header] + body[sealed:2 * sealed] + body[:sealed] + body[2 * sealed:]
+    with pytest.raises(Exception, match="authentication"):
+        decrypt(swapped)
+
+
+def test_damaged_header_fails():
+    artifact = encrypt(b"data")
+    with pytest.raises(Exception, match="header"):
+        decrypt(b"XXXX" + artifact[4:])
+    with pytest.raises(Exception, match="header"):
+        decrypt(artifact[:HEADER.size - 1])
+
+
+def test_retired_key_still_decrypts(monkeypatch):
+    monkeypatch.setattr(settings, "ENCRYPTION_KEY_ID", "old")
+    monkeypatch.setattr(settings, "ENCRYPTION_KEY", "old-secret")
+    plaintext = os.urandom(2 * SEGMENT)
+    artifact = encrypt(plaintext)
+    monkeypatch.setattr(settings, "ENCRYPTION_KEY_ID", "new")
+    monkeypatch.setattr(settings, "ENCRYPTION_KEY", "new-secret")
+    monkeypatch.setattr(settings, "ENCRYPTION_RETIRED_KEYS", {"old": "old-secret"})
+    assert decrypt(artifact) == plaintext
+    monkeypatch.setattr(settings, "ENCRYPTION_RETIRED_KEYS", {})
+    with pytest.raises(Exception, match="Unknown encryption key id"):
+        decrypt(artifact)
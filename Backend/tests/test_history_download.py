@@ -0,0 +1,34 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.history import _parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("BYTES = 5-5", (5, 5)),
+])
+def test_single_ranges(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-6", "items=0-10", "bytes=a-b", "bytes=5"])
+def test_whole_file_for_unsupported_ranges(header):
+    assert _parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),
+    ("bytes=20-10", 1000),
+    ("bytes=0-", 0),
+    ("bytes=-0", 1000),
+])
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(HTTPException) as exc:
+        _parse_range(header, size)
+    assert exc.value.status_code == 416
+    assert exc.value.headers == {"Content-Range": f"bytes */{size}"}
@@ -0,0 +1,134 @@
+import io
+
+import pytest
+
+from app.services.mssql_replayer import MSSQLReplayer, StatementSplitter, insert_target, iter_statements
+
+SCRIPT = (
+    "-- Backup of [db]; generated\n"
+    "INSERT INTO [dbo].[we]];ird;] ([a;b], [c]) VALUES\n"
+    "(N'semi;colon', N'it''s;'),\n"
+    "(N'', N'--not a comment;');\n"
+    "/* block; comment */ SET IDENTITY_INSERT [x] ON;\n"
+    "-- Data for table: y; more\n"
+    "INSERT INTO [y] ([v]) VALUES\n"
+    "(N'/*;*/'), (N'];[');\n"
+    "DELETE FROM [z]"
+)
+EXPECTED = [
+    "-- Backup of [db]; generated\n"
+    "INSERT INTO [dbo].[we]];ird;] ([a;b], [c]) VALUES\n"
+    "(N'semi;colon', N'it''s;'),\n"
+    "(N'', N'--not a comment;')",
+    "/* block; comment */ SET IDENTITY_INSERT [x] ON",
+    "-- Data for table: y; more\n"
+    "INSERT INTO [y] ([v]) VALUES\n"
+    "(N'/*;*/'), (N'];[')",
+    "DELETE FROM [z]",
+]
+
+
+def split(text: str, size: int) -> list:
+    splitter = StatementSplitter()
+    statements = []
+    for i in range(0, len(text), size):
+        statements += splitter.feed(text[i:i + size])
+    return statements + splitter.finish()
+
+
+def test_whole_script():
+    assert split(SCRIPT, len(SCRIPT)) == EXPECTED
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 16])
+def test_every_chunk_boundary(size):
+    # Cuts land inside N'..;..' literals, escaped '' and ]] and comment openers
+    assert split(SCRIPT, size) == EXPECTED
+
+
+def test_split_at_each_offset():
+    for cut in range(1, len(SCRIPT)):
+        splitter = StatementSplitter()
+        statements = splitter.feed(SCRIPT[:cut]) + splitter.feed(SCRIPT[cut:]) + splitter.finish()
+        assert statements == EXPECTED, cut
+
+
+def test_comment_only_tail_is_dropped():
+    assert split("SELECT 1;\n-- trailing; comment\n", 4) == ["SELECT 1"]
+
+
+def test_iter_statements_reads_in_chunks():
+    assert list(iter_statements(io.StringIO(SCRIPT), chunk_chars=3)) == EXPECTED
+
+
+def test_insert_target():
+    assert insert_target(EXPECTED[0]) == "[dbo].[we]];ird;]"
+    assert insert_target(EXPECTED[2]) == "[y]"
+    assert insert_target(EXPECTED[1]) is None
+
+
+class FakeCursor:
+    def __init__(self, log, violating):
+        self.log = log
+        self.violating = violating
+        self.rows = []
+
+    def execute(self, sql):
+        self.log.append(sql)
+        if "INFORMATION_SCHEMA" in sql:
+            self.rows = [("dbo", "a"), ("dbo", "b")]
+        elif "sys.identity_columns" in sql:
+            self.rows = []
+        elif "WITH CHECK" in sql and any(t in sql for t in self.violating):
+            raise Exception("The ALTER TABLE statement conflicted with the FOREIGN KEY constraint")
+        elif sql.startswith("INSERT") and "fail" in sql:
+            raise Exception("insert failed")
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, violating=()):
+        self.log = []
+        self._cursor = FakeCursor(self.log, violating)
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+
+def alters(conn):
+    return [sql for sql in conn.log if sql.startswith("ALTER TABLE")]
+
+
+def test_replay_revalidates_constraints():
+    conn = FakeConnection()
+    MSSQLReplayer(conn).replay(["INSERT INTO [dbo].[a] ([v]) VALUES\n(1)"])
+    assert alters(conn)[1:] == [
+        "ALTER TABLE [dbo].[a] WITH CHECK CHECK CONSTRAINT ALL",
+        "ALTER TABLE [dbo].[b] WITH CHECK CHECK CONSTRAINT ALL",
+    ]
+
+
+def test_constraint_violation_fails_the_restore():
+    conn = FakeConnection(violating=("[b]",))
+    with pytest.raises(Exception, match=r"violates constraints: \[dbo\]\.\[b\]"):
+        MSSQLReplayer(conn).replay(["INSERT INTO [dbo].[a] ([v]) VALUES\n(1)"])
+    # Still re-enabled, just not trusted
+    assert alters(conn)[-1] == "ALTER TABLE [dbo].[b] CHECK CONSTRAINT ALL"
+
+
+def test_failed_replay_keeps_its_error():
+    conn = FakeConnection(violating=("[a]", "[b]"))
+    with pytest.raises(Exception, match="insert failed"):
+        MSSQLReplayer(conn).replay(["INSERT INTO [dbo].[a] ([v]) VALUES\n(N'fail')"])
+    assert alters(conn)[1:] == [
+        "ALTER TABLE [dbo].[a] CHECK CONSTRAINT ALL",
+        "ALTER TABLE [dbo].[b] CHECK CONSTRAINT ALL",
+    ]